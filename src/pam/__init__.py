@@ -48,3 +48,7 @@ class PAMVehicleTypeError(PAMValidationError):
 
 class InvalidMATSimError(PAMValidationError):
     """Custom exception raised for invalid MATSim."""
+
+
+class PAMSnapshotError(Exception):
+    """Custom exception raised for an unreadable or unsupported population snapshot."""
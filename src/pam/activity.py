@@ -4,9 +4,11 @@ import json
 import logging
 from collections.abc import Iterator
 from copy import copy
-from datetime import timedelta
+from datetime import datetime, timedelta
 from typing import Any, Literal, Optional, Union
 
+import numpy as np
+from lxml import etree as et
 from numpy import datetime64
 
 import pam.utils as utils
@@ -17,12 +19,151 @@ from pam import (
     PAMSequenceValidationError,
     PAMValidationLocationsError,
 )
+from pam.categories import CategoryRegistry
 from pam.location import Location
 from pam.plot import plans as plot
 from pam.variables import END_OF_DAY
 
+# route attributes with values repeated across routes, interned by `LazyRoute.from_xml`
+ROUTE_INTERNED_ATTRIBUTES = ("type", "start_link", "end_link", "vehicleRefId")
+
+
+class ModificationTracked:
+    """Mixin for the owners of population data (plans, persons, households and populations), used
+    to invalidate cached population aggregates (see `core.Population.stats`).
+
+    Modifications are passed up from plan components to their plan, person, household and
+    population with `mark_modified`. Assigning any of the `_tracked` attributes marks the object as
+    modified, the values of `_owned` attributes (or, for dictionaries, their values) are owned by the
+    object. Dictionaries assigned to tracked attributes are held as `TrackedDict`s, so that in place
+    edits (eg `del population.households[hid]` or `person.attributes["subpopulation"] = "low"`) are
+    also recorded. Lists are not tracked, in place edits of plan lists (`Plan.day`) outside of the
+    `Plan` methods should be followed by `plan.mark_modified()`. Objects are owned by the last object
+    they were added to, owners are not copied or pickled with the objects they own.
+    """
+
+    _tracked = frozenset()
+    _owned = frozenset()
+    _transient = ("_owner",)
+    _owner = None
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name in self._tracked:
+            object.__setattr__(self, name, _own(self, value, name in self._owned))
+            self.mark_modified()
+        else:
+            object.__setattr__(self, name, value)
+
+    def mark_modified(self) -> None:
+        """Record a modification, passed up to the owning object (if any)."""
+        owner = self._owner
+        if owner is not None:
+            owner.mark_modified()
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        for name in self._transient:
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        # take ownership of the (copied or unpickled) owned values
+        for name in self._tracked & state.keys():
+            object.__setattr__(self, name, _own(self, state[name], name in self._owned))
+
+
+class TrackedDict(dict):
+    """Dictionary recording in place modifications with its owner's `mark_modified`, and (if
+    `owned`) taking ownership of its values.
+    """
+
+    __slots__ = ("owner", "owned")
+
+    def __init__(self, *args, owner=None, owned: bool = False, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.owner = owner
+        self.owned = owned
+        if owned:
+            for value in self.values():
+                _adopt(value, owner)
+
+    def _modified(self, values=()) -> None:
+        owner = getattr(self, "owner", None)
+        if owner is None:
+            return
+        if self.owned:
+            for value in values:
+                _adopt(value, owner)
+        owner.mark_modified()
+
+    def __setitem__(self, key, value) -> None:
+        super().__setitem__(key, value)
+        self._modified((value,))
+
+    def __delitem__(self, key) -> None:
+        super().__delitem__(key)
+        self._modified()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def update(self, *args, **kwargs) -> None:
+        other = dict(*args, **kwargs)
+        super().update(other)
+        self._modified(other.values())
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self[key]
+        self[key] = default
+        return default
+
+    def pop(self, *args):
+        value = super().pop(*args)
+        self._modified()
+        return value
+
+    def popitem(self):
+        item = super().popitem()
+        self._modified()
+        return item
+
+    def clear(self) -> None:
+        super().clear()
+        self._modified()
+
+    def __reduce__(self):
+        # copied and unpickled as a plain dictionary, owners take ownership when restored
+        return dict, (dict(self),)
+
+
+def _adopt(value: Any, owner: Any) -> None:
+    if isinstance(value, ModificationTracked):
+        object.__setattr__(value, "_owner", owner)
+    elif isinstance(value, PlanComponent):
+        value._owner = owner
+
+
+def _own(owner: Any, value: Any, owned: bool) -> Any:
+    if isinstance(value, dict) and not isinstance(value, EmptyAttributes):
+        if isinstance(value, TrackedDict) and value.owner is owner:
+            return value
+        return TrackedDict(value, owner=owner, owned=owned)
+    if owned:
+        if isinstance(value, list):
+            for item in value:
+                _adopt(item, owner)
+        else:
+            _adopt(value, owner)
+    return value
+
+
+class Plan(ModificationTracked):
+    _tracked = frozenset({"day"})
+    _owned = frozenset({"day"})
 
-class Plan:
     def __init__(
         self, home_area=None, home_location: Optional[Location] = None, home_loc=None, freq=None
     ):
@@ -317,6 +458,7 @@ class Plan:
           p (Union[Activity, Leg, Trip, list[Activity, Leg, Trip]]): component to add.
 
         """
+        self.mark_modified()
         if isinstance(p, list):
             for c in p:
                 self.add(c)
@@ -327,6 +469,7 @@ class Plan:
                     "Failed to add to plan, next component must be a Trip or Leg."
                 )
             self.day.append(p)
+            p._owner = self
 
         elif isinstance(p, Leg) or isinstance(p, Trip):
             if not self.day:
@@ -338,6 +481,7 @@ class Plan:
                     "Failed to add to plan, next component must be Activity instance."
                 )
             self.day.append(p)
+            p._owner = self
 
         else:
             raise UserWarning(f"Cannot add type: {type(p)} to plan.")
@@ -376,7 +520,7 @@ class Plan:
             bool:
 
         """
-        if not self.day[0].start_time == pam.variables.START_OF_DAY:
+        if not self.day[0].start_s == 0:
             return False
         return True
 
@@ -389,7 +533,7 @@ class Plan:
 
         """
         for i in range(self.length - 1):
-            if not self.day[i].end_time == self.day[i + 1].start_time:
+            if not self.day[i].end_s == self.day[i + 1].start_s:
                 return False
         return True
 
@@ -401,7 +545,7 @@ class Plan:
             bool:
 
         """
-        if not self.day[-1].end_time == pam.variables.END_OF_DAY:
+        if not self.day[-1].end_s == pam.variables.SECONDS_PER_DAY:
             return False
         return True
 
@@ -440,6 +584,41 @@ class Plan:
         else:
             return False
 
+    def violations(self) -> list[str]:
+        """Check sequence, times and locations of the plan, as per `validate`, without raising.
+
+        Locations are only checked for plans with a valid sequence.
+
+        Returns:
+            list[str]: failed checks, any of "sequence", "times" and "locations".
+        """
+        day = self.day
+        if not day:
+            return ["sequence"]
+        errors = []
+        acts, legs = day[::2], day[1::2]
+        sequence = (
+            isinstance(day[-1], Activity)
+            and all(isinstance(act, Activity) for act in acts)
+            and all(isinstance(leg, Leg) for leg in legs)
+        )
+        if not sequence:
+            errors.append("sequence")
+        if any(a.end_s != b.start_s for a, b in zip(day, day[1:])):
+            errors.append("times")
+        if sequence:
+            try:
+                locations = all(
+                    leg.start_location == origin.location
+                    and leg.end_location == destination.location
+                    for origin, leg, destination in zip(acts, legs, acts[1:])
+                )
+            except UserWarning:
+                locations = False
+            if not locations:
+                errors.append("locations")
+        return errors
+
     def validate(self):
         self.validate_sequence()
         self.validate_times()
@@ -504,9 +683,10 @@ class Plan:
         is a Leg, this leg is removed and the previous activity extended.
 
         """
+        self.mark_modified()
         # crop plan beyond end of day
         for idx, component in list(self.reversed()):
-            if component.start_time > pam.variables.END_OF_DAY:
+            if component.start_s > pam.variables.SECONDS_PER_DAY:
                 self.logger.debug("Cropping plan components")
                 self.day = self.day[:idx]
             else:
@@ -514,27 +694,27 @@ class Plan:
 
         # crop plan that is out of sequence
         for idx in range(1, self.length):
-            if self[idx].start_time < self[idx - 1].end_time:
+            if self[idx].start_s < self[idx - 1].end_s:
                 self.logger.debug("Cropping plan components")
                 self.day = self.day[:idx]
                 break
-            if self[idx].start_time > self[idx].end_time:
+            if self[idx].start_s > self[idx].end_s:
                 self.logger.debug("Cropping plan components")
                 self.day = self.day[: idx + 1]
                 break
 
         # deal with last component
         if isinstance(self.day[-1], Activity):
-            self.day[-1].end_time = pam.variables.END_OF_DAY
+            self.day[-1].end_s = pam.variables.SECONDS_PER_DAY
         else:
             self.logger.debug("Cropping plan ending in Leg")
             self.day.pop(-1)
-            self.day[-1].end_time = pam.variables.END_OF_DAY
+            self.day[-1].end_s = pam.variables.SECONDS_PER_DAY
 
     def fix_time_consistency(self):
         """Force plan component time consistency."""
         for i in range(self.length - 1):
-            self.day[i + 1].start_time = self.day[i].end_time
+            self.day[i + 1].start_s = self.day[i].end_s
 
     def fix_location_consistency(self):
         """Force plan locations consistency by adjusting leg locations."""
@@ -689,8 +869,8 @@ class Plan:
         """Add activity end times based on start time of next activity."""
         if len(self.day) > 1:
             for seq in range(0, len(self.day) - 1, 2):  # activities excluding last one
-                self.day[seq].end_time = self.day[seq + 1].start_time
-        self.day[-1].end_time = pam.variables.END_OF_DAY
+                self.day[seq].end_s = self.day[seq + 1].start_s
+        self.day[-1].end_s = pam.variables.SECONDS_PER_DAY
 
     def set_leg_purposes(self) -> None:
         """Set leg purposes to destination activity.
@@ -737,6 +917,7 @@ class Plan:
 
         """
         assert isinstance(self.day[seq], Activity)
+        self.mark_modified()
 
         if seq == 0 and seq == self.length - 1:  # remove activity that is entire plan
             self.logger.debug(
@@ -827,6 +1008,7 @@ class Plan:
 
         """
         self.logger.debug(f" fill_plan, {idx_start}->{idx_end}")
+        self.mark_modified()
 
         if idx_start is None and idx_end is None:  # Assume stay at home
             self.stay_at_home()
@@ -916,6 +1098,7 @@ class Plan:
           idx_end (int):
 
         """
+        self.mark_modified()
         self.day[idx_start + 1].end_location = self.day[idx_end - 1].end_location
         self.day[idx_start + 1].purp = self.day[idx_end - 1].purp
         self.day.pop(idx_end - 1)  # remove second leg
@@ -939,6 +1122,7 @@ class Plan:
           idx_end (int):
 
         """
+        self.mark_modified()
         self.day[idx_start].end_time = self.day[idx_end].end_time  # extend proceeding act
         self.day.pop(idx_end)  # remove subsequent activity
         self.day.pop(idx_end - 1)  # remove subsequent leg
@@ -952,6 +1136,7 @@ class Plan:
           idx_end (int):
 
         """
+        self.mark_modified()
         # extend proceeding act to end of day
         self.day[idx_start].end_time = pam.variables.END_OF_DAY
         # extend subsequent act to start of day
@@ -1076,14 +1261,149 @@ class Plan:
                     return tour
 
 
+class EmptyAttributes(dict):
+    """Read-only empty dictionary, shared as the attributes of legs without any (`EMPTY_ATTRIBUTES`).
+
+    Rather than each leg holding its own empty dictionary, legs share a single instance, which
+    cannot be modified. Legs return their shared attributes as a `NewAttributes` dictionary, which
+    the leg takes as its own attributes once modified.
+    """
+
+    __slots__ = ()
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError(
+            "Shared empty leg attributes are read-only, assign a new dictionary instead."
+        )
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __reduce__(self) -> str:
+        # pickle and copy as the shared instance
+        return "EMPTY_ATTRIBUTES"
+
+
+EMPTY_ATTRIBUTES = EmptyAttributes()
+
+
+class NewAttributes(dict):
+    """Empty dictionary returned as the attributes of a leg sharing `EMPTY_ATTRIBUTES`, set as the
+    attributes of the leg when first modified (eg `leg.attributes["routingMode"] = "car"`).
+    """
+
+    __slots__ = ("leg",)
+
+    def __init__(self, leg: Leg) -> None:
+        super().__init__()
+        self.leg = leg
+
+    def _adopt(self) -> None:
+        leg, self.leg = self.leg, None
+        if leg is not None and leg._attributes is EMPTY_ATTRIBUTES:
+            leg.attributes = self
+
+    def __setitem__(self, key, value) -> None:
+        super().__setitem__(key, value)
+        self._adopt()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def update(self, *args, **kwargs) -> None:
+        super().update(*args, **kwargs)
+        if self:
+            self._adopt()
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def __reduce__(self):
+        # copied and unpickled as a plain dictionary
+        return dict, (dict(self),)
+
+
+def _seconds(time: Union[datetime, int, None]) -> Optional[int]:
+    if time is None:
+        return None
+    if isinstance(time, (int, np.integer)):
+        return int(time)
+    return utils.datetime_to_seconds(time)
+
+
 class PlanComponent:
+    # times are held as integer seconds since `pam.variables.START_OF_DAY` (`start_s` and `end_s`,
+    # None if unknown), `start_time` and `end_time` convert to and from datetimes (or accept seconds).
+    # `next` and `previous` (and the activity and leg pointers below) are set by
+    # `pam.operations.cropping.link_plan`. `_owner` is the plan holding the component, assigning
+    # frequencies, activity types and modes is recorded with the plan's `mark_modified`
+    # (invalidating cached population aggregates).
+    __slots__ = ("seq", "start_s", "end_s", "_freq", "next", "previous", "_owner")
+
+    @property
+    def freq(self):
+        return self._freq
+
+    @freq.setter
+    def freq(self, freq) -> None:
+        self._freq = freq
+        self.mark_modified()
+
+    def mark_modified(self) -> None:
+        owner = getattr(self, "_owner", None)
+        if owner is not None:
+            owner.mark_modified()
+
+    def __getstate__(self) -> tuple[None, dict]:
+        # the owning plan is not copied (or pickled) with the component
+        state = {}
+        for cls in type(self).__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                if name != "_owner" and hasattr(self, name):
+                    state[name] = getattr(self, name)
+        return None, state
+
+    def __setstate__(self, state: Union[tuple[None, dict], dict]) -> None:
+        # components pickled before `__slots__` were added have their instance dictionary as state
+        if isinstance(state, tuple):
+            state = state[1]
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    @property
+    def start_time(self) -> Optional[datetime]:
+        if self.start_s is None:
+            return None
+        return utils.seconds_to_datetime(self.start_s)
+
+    @start_time.setter
+    def start_time(self, start_time: Optional[datetime]) -> None:
+        self.start_s = _seconds(start_time)
+
+    @property
+    def end_time(self) -> Optional[datetime]:
+        if self.end_s is None:
+            return None
+        return utils.seconds_to_datetime(self.end_s)
+
+    @end_time.setter
+    def end_time(self, end_time: Optional[datetime]) -> None:
+        self.end_s = _seconds(end_time)
+
+    @property
+    def duration_s(self) -> int:
+        return self.end_s - self.start_s
+
     @property
     def duration(self):
-        return self.end_time - self.start_time
+        return timedelta(seconds=self.end_s - self.start_s)
 
     @property
     def hours(self):
-        return pam.utils.timedelta_to_hours(self.end_time - self.start_time)
+        return (self.end_s - self.start_s) / 3600
 
     def shift_start_time(self, new_start_time: datetime64) -> datetime64:
         """Given a new start time, set start time & end time based on previous duration.
@@ -1095,9 +1415,9 @@ class PlanComponent:
             datetime64: new end time
 
         """
-        duration = self.duration
+        duration = self.end_s - self.start_s
         self.start_time = new_start_time
-        self.end_time = new_start_time + duration
+        self.end_s = self.start_s + duration
         return self.end_time
 
     def shift_end_time(self, new_end_time: datetime64) -> datetime64:
@@ -1110,9 +1430,9 @@ class PlanComponent:
           datetime64: new start time.
 
         """
-        duration = self.duration
+        duration = self.end_s - self.start_s
         self.end_time = new_end_time
-        self.start_time = new_end_time - duration
+        self.start_s = self.end_s - duration
         return self.start_time
 
     def shift_duration(
@@ -1135,6 +1455,8 @@ class PlanComponent:
 
 
 class Activity(PlanComponent):
+    __slots__ = ("_act", "location", "next_act", "previous_act")
+
     def __init__(
         self,
         seq=None,
@@ -1146,6 +1468,7 @@ class Activity(PlanComponent):
         end_time=None,
         freq=None,
     ):
+        self._owner = None
         self.seq = seq
         self.act = act
         self.location = Location(loc=loc, link=link, area=area)
@@ -1168,8 +1491,8 @@ class Activity(PlanComponent):
         return (
             (self.location == other.location)
             and (self.act == other.act)
-            and (self.start_time == other.start_time)
-            and (self.end_time == other.end_time)
+            and (self.start_s == other.start_s)
+            and (self.end_s == other.end_s)
         )
 
     def isin_exact(self, activities: list):
@@ -1187,8 +1510,29 @@ class Activity(PlanComponent):
         if self.location.loc is None and self.location.link is None:
             raise InvalidMATSimError("Activity requires link id or x,y coordinates.")
 
+    @property
+    def act(self):
+        return self._act
+
+    @act.setter
+    def act(self, act) -> None:
+        self._act = act
+        self.mark_modified()
+
 
 class Leg(PlanComponent):
+    __slots__ = (
+        "purp",
+        "_mode",
+        "start_location",
+        "end_location",
+        "_distance",
+        "_attributes",
+        "route",
+        "start_hour",
+        "next_leg",
+        "previous_leg",
+    )
     act = "travel"
 
     def __init__(
@@ -1206,9 +1550,10 @@ class Leg(PlanComponent):
         distance=None,
         purp=None,
         freq=None,
-        attributes={},
+        attributes=None,
         route=None,
     ):
+        self._owner = None
         self.seq = seq
         self.purp = purp
         self.mode = mode
@@ -1219,7 +1564,7 @@ class Leg(PlanComponent):
         self.freq = freq
         self._distance = distance
         # relevant for simulated plans
-        self.attributes = attributes
+        self.attributes = EMPTY_ATTRIBUTES if attributes is None else attributes
         if route is not None:
             self.route = route
         else:
@@ -1237,10 +1582,32 @@ class Leg(PlanComponent):
             self.start_location == other.start_location
             and self.end_location == other.end_location
             and self.mode == other.mode
-            and self.start_time == other.start_time
-            and self.end_time == other.end_time
+            and self.start_s == other.start_s
+            and self.end_s == other.end_s
         )
 
+    @property
+    def mode(self):
+        return self._mode
+
+    @mode.setter
+    def mode(self, mode) -> None:
+        self._mode = mode
+        self.mark_modified()
+
+    @property
+    def attributes(self) -> dict:
+        """Leg attributes, legs without any share `EMPTY_ATTRIBUTES` until modified."""
+        if self._attributes is EMPTY_ATTRIBUTES:
+            return NewAttributes(self)
+        return self._attributes
+
+    @attributes.setter
+    def attributes(self, attributes: dict) -> None:
+        if isinstance(attributes, NewAttributes) and not attributes:
+            attributes = EMPTY_ATTRIBUTES
+        self._attributes = attributes
+
     @property
     def distance(self):
         """Distance, assumed to be in m in either case."""
@@ -1303,7 +1670,7 @@ class Route:
 
     @property
     def type(self):
-        return self.xml.get("type", None)
+        return self.get("type", None)
 
     @property
     def is_transit(self) -> bool:
@@ -1317,21 +1684,46 @@ class Route:
     def is_teleported(self) -> bool:
         return self.type == "generic"
 
+    @property
+    def text(self) -> Optional[str]:
+        return self.xml.text
+
+    @property
+    def attrib(self) -> dict:
+        if self.exists:
+            return dict(self.xml.attrib)
+        return {}
+
     @property
     def network_route(self) -> list:
         if self.is_routed:
-            return self.xml.text.split(" ")
+            return self.text.split(" ")
         return []
 
     @property
     def transit(self) -> dict:
         if self.is_transit:
-            return json.loads(self.xml.text.strip())
+            return json.loads(self.text.strip())
         return {}
 
     def get(self, key, default=None) -> str:
         return self.xml.get(key, default)
 
+    def __getstate__(self) -> dict:
+        # lxml elements cannot be pickled (eg for multiprocessing), so serialise them to bytes
+        state = self.__dict__.copy()
+        if self.exists:
+            state["xml"] = et.tostring(self.xml, with_tail=False)
+            state["tail"] = self.xml.tail
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        tail = state.pop("tail", None)
+        if isinstance(state["xml"], bytes):
+            state["xml"] = et.fromstring(state["xml"])
+            state["xml"].tail = tail
+        self.__dict__.update(state)
+
     def __getitem__(self, key):
         return self.xml[key]
 
@@ -1354,7 +1746,7 @@ class RouteV11(Route):
     @property
     def transit(self) -> dict:
         if self.is_transit:
-            pt_details = self.xml.text.split("===")
+            pt_details = self.text.split("===")
             return {
                 "accessFacilityId": pt_details[1],
                 "transitLineId": pt_details[2],
@@ -1364,5 +1756,72 @@ class RouteV11(Route):
         return {}
 
 
-class Trip(Leg):
+class LazyRoute(Route):
+    """Compact route, holding only the attributes and text of a route xml element.
+
+    The network route and transit details are decoded from the text on access as for `Route`, the
+    xml element itself is only built when required, eg when writing to MATSim xml.
+    """
+
+    def __init__(self, attrib: dict, text: Optional[str] = None) -> None:
+        self._attrib = attrib
+        self._text = text
+        self._xml = None
+
+    @classmethod
+    def from_xml(cls, xml_elem, categories: Optional[CategoryRegistry] = None) -> LazyRoute:
+        if categories is None:
+            return cls(dict(xml_elem.attrib), xml_elem.text)
+        attrib = categories.attributes(xml_elem.attrib, values=ROUTE_INTERNED_ATTRIBUTES)
+        return cls(attrib, xml_elem.text)
+
+    @property
+    def xml(self):
+        if self._xml is None:
+            self._xml = et.Element("route", self._attrib)
+            self._xml.text = self._text
+        return self._xml
+
+    @xml.setter
+    def xml(self, xml) -> None:
+        self._xml = xml
+
+    @property
+    def exists(self) -> bool:
+        return self._xml is None or super().exists
+
+    @property
+    def text(self) -> Optional[str]:
+        if self._xml is None:
+            return self._text
+        return super().text
+
+    @property
+    def attrib(self) -> dict:
+        if self._xml is None:
+            return dict(self._attrib)
+        return super().attrib
+
+    def get(self, key, default=None) -> str:
+        if self._xml is None:
+            return self._attrib.get(key, default)
+        return super().get(key, default)
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        if self._xml is not None and not isinstance(self._xml, dict):
+            state["_xml"] = et.tostring(self._xml, with_tail=False)
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        if isinstance(state["_xml"], bytes):
+            state["_xml"] = et.fromstring(state["_xml"])
+        self.__dict__.update(state)
+
+
+class LazyRouteV11(LazyRoute, RouteV11):
     pass
+
+
+class Trip(Leg):
+    __slots__ = ()
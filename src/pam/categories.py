@@ -0,0 +1,100 @@
+"""Interned string tables for the values repeated across a population.
+
+Activity types, modes, purposes, zones, links and attribute names (and many attribute values) are
+repeated for every plan component or person, but readers create a new string for each. A
+`CategoryRegistry` maps each distinct value to a single (canonical) string so that components share
+storage, eg:
+
+``` python
+categories = CategoryRegistry()
+act = categories.intern("act", "home")
+assert categories.intern("act", "".join(["ho", "me"])) is act
+```
+
+Registries are held by `core.Population.categories` and used by the population readers.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Container, Mapping
+from typing import Any, Union
+
+
+class CategoryRegistry:
+    """Tables of interned strings, keyed by field (eg "act", "mode", "zone", "link", "key").
+
+    Non-string values (eg `None` or numeric zones) are returned unchanged.
+    """
+
+    def __init__(self) -> None:
+        self.tables = {}
+
+    def table(self, field: str) -> dict:
+        """Interning table of a field, mapping each value to its canonical string.
+
+        For use in tight loops, eg `table.setdefault(value, value)`.
+
+        Args:
+            field (str): field name.
+
+        Returns:
+            dict:
+        """
+        table = self.tables.get(field)
+        if table is None:
+            table = self.tables[field] = {}
+        return table
+
+    def intern(self, field: str, value: Any) -> Any:
+        """Canonical (shared) copy of a string value.
+
+        Args:
+            field (str): field name, eg "act".
+            value (Any): value to intern, non-string values are returned unchanged.
+
+        Returns:
+            Any:
+        """
+        if not isinstance(value, str):
+            return value
+        return self.table(field).setdefault(value, value)
+
+    def attributes(self, mapping: Mapping, values: Union[bool, Container[str]] = True) -> dict:
+        """Copy of an attributes mapping with interned keys and (string) values.
+
+        Keys are interned as "key" and values as "value".
+
+        Args:
+            mapping (Mapping): attributes.
+            values (Union[bool, Container[str]], optional):
+                intern all values, no values or only the values of the given keys. Defaults to True.
+
+        Returns:
+            dict:
+        """
+        keys = self.table("key")
+        interned = {}
+        for key, value in mapping.items():
+            key = keys.setdefault(key, key)
+            if values is True or (values is not False and key in values):
+                value = self.intern("value", value)
+            interned[key] = value
+        return interned
+
+    def values(self, field: str) -> set:
+        """Distinct values interned for a field.
+
+        Args:
+            field (str): field name.
+
+        Returns:
+            set:
+        """
+        return set(self.tables.get(field, ()))
+
+    def __len__(self) -> int:
+        return sum(len(table) for table in self.tables.values())
+
+    def __repr__(self) -> str:
+        sizes = ", ".join(f"{field}: {len(table)}" for field, table in self.tables.items())
+        return f"<CategoryRegistry {{{sizes}}}>"
@@ -7,7 +7,8 @@ import geopandas as gp
 from rich.console import Console
 
 from pam import read, write
-from pam.operations.combine import pop_combine
+from pam.operations.combine import stream_pop_combine
+from pam.operations.convert import matsim_selected_plans, matsim_to_diary, matsim_to_parquet
 from pam.operations.cropping import simplify_population
 from pam.operations.snap import run_facility_link_snapping
 from pam.report.benchmarks import benchmarks as bms
@@ -309,6 +310,7 @@ def crop(
             leg_attributes=leg_attributes,
             leg_route=leg_route,
             keep_non_selected=keep_non_selected,
+            keep_raw=True,
         )
 
     with Console().status("[bold green]Applying simplification...", spinner="aesthetic") as _:
@@ -340,6 +342,19 @@ def crop(
     default="combined_population.xml",
     help="Specify outpath for combined_population.xml, default is cwd",
 )
+@click.option(
+    "--workers",
+    "-w",
+    type=int,
+    default=1,
+    help="Number of worker processes used to parse each population, default 1.",
+)
+@click.option(
+    "--prefix",
+    "-p",
+    multiple=True,
+    help="Prefix added to the person and household ids of each population, one per population.",
+)
 @click.option("--force", "-f", is_flag=True, help="Forces overwrite of existing file.")
 def combine(
     population_paths: str,
@@ -353,10 +368,12 @@ def combine(
     leg_route: bool,
     keep_non_selected: bool,
     comment: str,
+    workers: int,
+    prefix: tuple,
     force: bool,
     debug: bool,
 ):
-    """Combine multiple populations (e.g. household, freight.. etc)."""
+    """Combine multiple populations (e.g. household, freight.. etc), streaming them to a single output."""
     if debug:
         logger.setLevel(logging.DEBUG)
 
@@ -378,10 +395,11 @@ def combine(
             raise UserWarning(f"Aborting to avoid overwrite of {population_output}")
 
     with Console().status(
-        "[bold green]Loading and combining populations...", spinner="aesthetic"
+        "[bold green]Combining and writing populations...", spinner="aesthetic"
     ) as _:
-        combined_population = pop_combine(
+        stats = stream_pop_combine(
             inpaths=population_paths,
+            outpath=population_output,
             matsim_version=matsim_version,
             household_key=household_key,
             simplify_pt_trips=simplify_pt_trips,
@@ -390,17 +408,13 @@ def combine(
             leg_attributes=leg_attributes,
             leg_route=leg_route,
             keep_non_selected=keep_non_selected,
-        )
-
-    logger.debug(f"Writing combinined population to {population_output}.")
-
-    with Console().status("[bold green]Writing population...", spinner="aesthetic") as _:
-        write.write_matsim(
-            population=combined_population,
-            plans_path=population_output,
             comment=comment,
-            keep_non_selected=keep_non_selected,
+            workers=workers,
+            prefixes=list(prefix) or None,
+            fast=True,
+            lazy_routes=True,
         )
+    logger.debug(f"Combined population: {stats}")
     logger.info("Population combiner complete")
     logger.info(f"Output saved at {population_output}")
 
@@ -650,6 +664,7 @@ def wipe_links(
                 keep_non_selected=keep_non_selected,
                 leg_attributes=leg_attributes,
                 leg_route=True,
+                keep_raw=True,
             ):
                 if plan_filter(person.plan):
                     for leg in person.legs:
@@ -694,3 +709,162 @@ def snap_facilities(
         path_network_geometry=path_network_geometry,
         link_id_field=link_id_field,
     )
+
+
+@cli.command()
+@common_options
+@common_matsim_options
+@click.argument("path_population_input", type=click.Path(exists=True))
+@click.argument("dir_parquet_output", type=click.Path(exists=False, writable=True))
+@click.option(
+    "--batch_size",
+    "-b",
+    type=int,
+    default=100000,
+    help="Number of persons written to each parquet part file, default 100000.",
+)
+def to_parquet(
+    path_population_input: str,
+    dir_parquet_output: str,
+    matsim_version: int,
+    household_key: Optional[str],
+    simplify_pt_trips: bool,
+    autocomplete: bool,
+    crop: bool,
+    leg_attributes: bool,
+    leg_route: bool,
+    keep_non_selected: bool,
+    batch_size: int,
+    debug: bool,
+):
+    """Convert a MATSim population to parquet tables (persons, plans, activities, legs and routes)."""
+    if debug:
+        logger.setLevel(logging.DEBUG)
+
+    logger.info("Starting parquet conversion")
+    logger.debug(f"Loading plans from {path_population_input}.")
+    logger.debug(f"Writing parquet tables to {dir_parquet_output}.")
+    logger.debug(f"MATSim version set to {matsim_version}.")
+    logger.debug(f"'household_key' set to {household_key}.")
+    logger.debug(f"Batch size = {batch_size}")
+
+    with Console().status("[bold green]Converting population...", spinner="aesthetic") as _:
+        matsim_to_parquet(
+            path_population_input,
+            dir_parquet_output,
+            household_key=household_key,
+            batch_size=batch_size,
+            weight=1,
+            version=matsim_version,
+            simplify_pt_trips=simplify_pt_trips,
+            autocomplete=autocomplete,
+            crop=crop,
+            leg_attributes=leg_attributes,
+            leg_route=leg_route,
+            keep_non_selected=keep_non_selected,
+            lazy_routes=True,
+        )
+
+    logger.info("Parquet conversion complete")
+    logger.info(f"Output saved at {dir_parquet_output}")
+
+
+@cli.command()
+@common_options
+@common_matsim_options
+@click.argument("path_population_input", type=click.Path(exists=True))
+@click.argument("dir_diary_output", type=click.Path(exists=False, writable=True))
+@click.option(
+    "--format",
+    "-f",
+    type=click.Choice(["csv", "parquet"]),
+    default="csv",
+    help="Output table format, default csv.",
+)
+@click.option(
+    "--batch_size",
+    "-b",
+    type=int,
+    default=100000,
+    help="Number of persons written at a time, default 100000.",
+)
+@click.option("--no_trips", is_flag=True, default=False, help="Do not write the trips table.")
+@click.option(
+    "--workers", "-w", type=int, default=1, help="Number of parallel parsing processes, default 1."
+)
+def to_diary(
+    path_population_input: str,
+    dir_diary_output: str,
+    matsim_version: int,
+    household_key: Optional[str],
+    simplify_pt_trips: bool,
+    autocomplete: bool,
+    crop: bool,
+    leg_attributes: bool,
+    leg_route: bool,
+    keep_non_selected: bool,
+    format: str,
+    batch_size: int,
+    no_trips: bool,
+    workers: int,
+    debug: bool,
+):
+    """Convert a MATSim population to travel diary tables (legs, trips and activities)."""
+    if debug:
+        logger.setLevel(logging.DEBUG)
+
+    logger.info("Starting travel diary conversion")
+    logger.debug(f"Loading plans from {path_population_input}.")
+    logger.debug(f"Writing {format} tables to {dir_diary_output}.")
+    logger.debug(f"MATSim version set to {matsim_version}.")
+    logger.debug(f"'household_key' set to {household_key}.")
+    logger.debug(f"Batch size = {batch_size}")
+
+    with Console().status("[bold green]Converting population...", spinner="aesthetic") as _:
+        matsim_to_diary(
+            path_population_input,
+            dir_diary_output,
+            format=format,
+            household_key=household_key,
+            batch_size=batch_size,
+            trips=not no_trips,
+            weight=1,
+            version=matsim_version,
+            simplify_pt_trips=simplify_pt_trips,
+            autocomplete=autocomplete,
+            crop=crop,
+            leg_attributes=leg_attributes,
+            leg_route=leg_route,
+            workers=workers,
+        )
+
+    logger.info("Travel diary conversion complete")
+    logger.info(f"Output saved at {dir_diary_output}")
+
+
+@cli.command()
+@common_options
+@comment_option
+@click.argument("path_population_input", type=click.Path(exists=True))
+@click.argument("path_population_output", type=click.Path(exists=False, writable=True))
+def selected_plans(
+    path_population_input: str, path_population_output: str, comment: str, debug: bool
+):
+    """Remove non-selected plans from a MATSim population, copying selected plans unchanged.
+
+    Plans are copied as xml rather than read into pam, so this is fast and uses little memory.
+    """
+    if debug:
+        logger.setLevel(logging.DEBUG)
+
+    logger.info("Starting selected plans extraction")
+    logger.debug(f"Loading plans from {path_population_input}.")
+    logger.debug(f"Writing selected plans to {path_population_output}.")
+
+    with Console().status("[bold green]Extracting selected plans...", spinner="aesthetic") as _:
+        removed = matsim_selected_plans(
+            path_population_input, path_population_output, comment=comment
+        )
+
+    logger.info(f"Removed {removed} non-selected plans")
+    logger.info(f"Output saved at {path_population_output}")
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import copy
+import functools
 import logging
+import operator
 import pickle
 import random
 from collections import defaultdict
@@ -19,14 +21,40 @@ from pam import (
     PAMSequenceValidationError,
     PAMValidationLocationsError,
     PAMVehicleIdError,
+    snapshot,
+    store,
     variables,
     write,
 )
+from pam.categories import CategoryRegistry
 from pam.location import Location
 from pam.vehicles import ElectricVehicle, Vehicle, VehicleManager, VehicleType
 
 
-class Population:
+def cached_aggregate(method):
+    """Cache a population aggregate until the population's plans, persons or households are
+    modified (see `pam.activity.ModificationTracked`), returning copies so that cached sets and
+    dictionaries are not modified by callers.
+    """
+    name = method.__name__
+
+    @functools.wraps(method)
+    def cached(self):
+        values = self.__dict__.get("_aggregates")
+        if values is None:
+            values = self._aggregates = {}
+        if name not in values:
+            values[name] = method(self)
+        return copy.copy(values[name])
+
+    return cached
+
+
+class Population(activity.ModificationTracked):
+    _tracked = frozenset({"households"})
+    _owned = frozenset({"households"})
+    _transient = ("_owner", "_aggregates")
+
     def __init__(self, name: str = None) -> None:
         """Class to define a population.
 
@@ -37,6 +65,8 @@ class Population:
         self.logger = logging.getLogger(__name__)
         self.households = {}
         self._vehicles_manager = VehicleManager()
+        # interned activity types, modes, zones etc shared by the population readers
+        self.categories = CategoryRegistry()
 
     def add(self, target: list[Union[Household, Person, list]]) -> None:
         """Add houeshold/person, or a list of households/persons to the population.
@@ -70,6 +100,10 @@ class Population:
     def get(self, hid, default=None):
         return self.households.get(hid, default)
 
+    def mark_modified(self) -> None:
+        """Record a modification of the population, clearing cached aggregates (eg `stats`)."""
+        self.__dict__.pop("_aggregates", None)
+
     def __getitem__(self, hid):
         return self.households[hid]
 
@@ -90,6 +124,7 @@ class Population:
                 yield person.plan
 
     @property
+    @cached_aggregate
     def population(self):
         self.logger.info("Returning un weighted person count.")
         return len([1 for hid, pid, person in self.people()])
@@ -134,14 +169,16 @@ class Population:
         return True
 
     @property
+    @cached_aggregate
     def num_households(self):
-        return len([1 for hid, hh in self.households.items()])
+        return len(self.households)
 
     @property
     def size(self):
         return self.freq
 
     @property
+    @cached_aggregate
     def freq(self):
         frequencies = [hh.freq for hh in self.households.values()]
         if None in frequencies:
@@ -149,6 +186,7 @@ class Population:
         return sum(frequencies)
 
     @property
+    @cached_aggregate
     def activity_classes(self):
         acts = set()
         for _, _, p in self.people():
@@ -156,6 +194,7 @@ class Population:
         return acts
 
     @property
+    @cached_aggregate
     def mode_classes(self):
         modes = set()
         for _, _, p in self.people():
@@ -163,6 +202,7 @@ class Population:
         return modes
 
     @property
+    @cached_aggregate
     def subpopulations(self):
         subpopulations = set()
         for _, _, p in self.people():
@@ -311,6 +351,7 @@ class Population:
         return hh.random_person()
 
     @property
+    @cached_aggregate
     def stats(self):
         num_households = 0
         num_people = 0
@@ -500,8 +541,42 @@ class Population:
         with open(path, "wb") as file:
             pickle.dump(self, file)
 
-    def to_csv(self, dir: str, crs=None, to_crs: str = "EPSG:4326"):
-        write.to_csv(self, dir, crs, to_crs)
+    def save_snapshot(self, path: str):
+        """Save population as a binary snapshot, see `pam.snapshot`.
+
+        Snapshots are faster to save and load than pickles and can be memory-mapped.
+
+        Args:
+            path (str): snapshot path.
+        """
+        snapshot.save_snapshot(self, path)
+
+    @classmethod
+    def load_snapshot(cls, path: str, mmap: bool = False) -> Population:
+        """Load population from a binary snapshot, see `pam.snapshot`.
+
+        Args:
+            path (str): snapshot path.
+            mmap (bool, optional): Memory-map the snapshot rather than reading it into memory. Defaults to False.
+
+        Returns:
+            Population:
+        """
+        return snapshot.load_snapshot(path, mmap=mmap)
+
+    def to_store(self) -> store.PopulationStore:
+        """Build a columnar store of the population's selected plans, see `pam.store`.
+
+        Stores use a fraction of the memory of a population and vectorise aggregate queries
+        such as `stats`, `legs_df` and `trips_df`.
+
+        Returns:
+            store.PopulationStore:
+        """
+        return store.PopulationStore.from_population(self)
+
+    def to_csv(self, dir: str, crs=None, to_crs: str = "EPSG:4326", geojson: bool = True):
+        write.to_csv(self, dir, crs, to_crs, geojson=geojson)
 
     def __str__(self):
         return f"Population: {self.population} people in {self.num_households} households."
@@ -717,8 +792,10 @@ class Population:
                         component.end_location = person.plan[idx + 1].location
 
 
-class Household:
+class Household(activity.ModificationTracked):
     logger = logging.getLogger(__name__)
+    _tracked = frozenset({"people", "hh_freq"})
+    _owned = frozenset({"people"})
 
     def __init__(
         self,
@@ -1006,8 +1083,10 @@ class Household:
             pickle.dump(self, file)
 
 
-class Person:
+class Person(activity.ModificationTracked):
     logger = logging.getLogger(__name__)
+    _tracked = frozenset({"plan", "attributes", "person_freq"})
+    _owned = frozenset({"plan"})
 
     def __init__(
         self,
@@ -1106,6 +1185,78 @@ class Person:
             mode: manager.pop(vid) for mode, vid in self.attributes.pop("vehicles", {}).items()
         }
 
+    def keep_raw_xml(self, raw: bytes) -> None:
+        """Keep the (MATSim) xml the person was read from, to be written verbatim while unmodified.
+
+        A shallow record of the person's current state (attributes, vehicles, plans, components,
+        times, locations and routes) is kept alongside, see `raw_xml`.
+
+        Args:
+            raw (bytes): serialised (utf-8) person element.
+        """
+        self._raw_xml = raw
+        self._raw_state = self._state()
+
+    @property
+    def raw_xml(self) -> Optional[bytes]:
+        """Return the xml the person was read from if the person is unmodified, else None.
+
+        Modification is detected by comparing the current state to the state recorded by
+        `keep_raw_xml`: plans and components (including locations and routes) are compared by
+        identity, and attributes, times, modes, activity types and links by value. In-place changes
+        to route xml elements are not detected, use `mark_dirty` after making them.
+        """
+        raw = getattr(self, "_raw_xml", None)
+        if raw is None:
+            return None
+        values, objects = self._state()
+        kept_values, kept_objects = self._raw_state
+        if (
+            values == kept_values
+            and len(objects) == len(kept_objects)
+            and all(map(operator.is_, objects, kept_objects))
+        ):
+            return raw
+        self.mark_dirty()
+        return None
+
+    def mark_dirty(self) -> None:
+        """Drop the xml the person was read from, so that it is serialised from its current state."""
+        self._raw_xml = None
+        self._raw_state = None
+
+    def _state(self) -> tuple[list, list]:
+        values = [self.pid, dict(self.attributes), {k: v.vid for k, v in self.vehicles.items()}]
+        objects = []
+        for plan in [self.plan, *self.plans_non_selected]:
+            values.append(plan.score)
+            objects.append(plan)
+            for component in plan.day:
+                values.extend([component.start_time, component.end_time])
+                objects.append(component)
+                if isinstance(component, activity.Activity):
+                    values.extend([component.act, component.location.link])
+                    objects.extend([component.location, component.location.loc])
+                else:
+                    values.extend([component.mode, dict(component.attributes or {})])
+                    objects.append(component.route)
+                    objects.extend(vars(component.route).values())
+        return values, objects
+
+    def __getstate__(self) -> dict:
+        # the raw xml state refers to unpicklable route elements, it is rebuilt on load, so the
+        # raw xml of a modified person is dropped rather than recorded against its modified state
+        state = super().__getstate__()
+        state.pop("_raw_state", None)
+        if state.get("_raw_xml") is not None and self.raw_xml is None:
+            state["_raw_xml"] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        super().__setstate__(state)
+        if getattr(self, "_raw_xml", None) is not None:
+            self._raw_state = self._state()
+
     @property
     def activities(self):
         if self.plan:
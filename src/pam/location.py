@@ -1,4 +1,6 @@
 class Location:
+    __slots__ = ("loc", "link", "area")
+
     def __init__(self, loc=None, link=None, area=None):
         self.loc = loc
         self.link = link
@@ -57,3 +59,10 @@ class Location:
 
     def copy(self):
         return Location(loc=self.loc, link=self.link, area=self.area)
+
+    def __setstate__(self, state):
+        # locations pickled before `__slots__` were added have their instance dictionary as state
+        if isinstance(state, tuple):
+            state = state[1]
+        for name, value in state.items():
+            setattr(self, name, value)
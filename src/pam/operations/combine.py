@@ -1,4 +1,9 @@
-from pam import core, read
+import logging
+from typing import Optional
+
+from pam import core, read, write
+
+logger = logging.getLogger(__name__)
 
 
 def pop_combine(
@@ -36,3 +41,106 @@ def pop_combine(
         combined_population += population
 
     return combined_population
+
+
+def stream_pop_combine(
+    inpaths: list[str],
+    outpath: str,
+    matsim_version: int = 12,
+    household_key: Optional[str] = "hid",
+    simplify_pt_trips: bool = False,
+    autocomplete: bool = True,
+    crop: bool = False,
+    leg_attributes: bool = True,
+    leg_route: bool = True,
+    keep_non_selected: bool = True,
+    comment: Optional[str] = None,
+    workers: int = 1,
+    prefixes: Optional[list[str]] = None,
+    fast: bool = False,
+    **kwargs,
+) -> dict[str, int]:
+    """Combine two or more populations (e.g. household, freight... etc), streaming persons straight to a MATSim output.
+
+    Unlike `pop_combine`, populations are never held in memory, only their person and household ids.
+    Persons with a person id already written from an earlier input are skipped (the first is kept),
+    optional per input `prefixes` can be used to keep ids unique instead. Household ids shared
+    between inputs are warned of. As for `pam.write.write_matsim`, persons are written with their
+    household id as the "hid" attribute.
+
+    Args:
+        inpaths (list[str]): paths to matsim format xml inputs.
+        outpath (str): output path (.xml or .xml.gz).
+        matsim_version (int, optional): Defaults to 12.
+        household_key (Optional[str], optional): Person attribute used as household id, persons without it are given their own household. Defaults to "hid".
+        simplify_pt_trips (bool, optional): simplify legs in multi-leg trips. Defaults to False.
+        autocomplete (bool, optional): fills missing leg and activity attributes. Defaults to True.
+        crop (bool, optional): crop plans that go beyond 24 hours. Defaults to False.
+        leg_attributes (bool, optional): Parse leg attributes such as routing mode. Defaults to True.
+        leg_route (bool, optional): Parse leg route. Defaults to True.
+        keep_non_selected (bool, optional): Read and write non-selected plans. Defaults to True.
+        comment (Optional[str], optional): optionally add a comment string to the xml output. Defaults to None.
+        workers (int, optional): Number of worker processes used to parse each input. Defaults to 1.
+        prefixes (Optional[list[str]], optional): prefix added to the person and household ids of each input. Defaults to None.
+        fast (bool, optional): serialise persons using string templates (see `pam.write.Writer`). Defaults to False.
+
+    Keyword Args:
+        Additional keyword arguments are passed to `pam.read.stream_matsim_persons`, eg `lazy_routes` or `keep_raw`.
+
+    Returns:
+        dict[str, int]: numbers of households and persons written, and of skipped (duplicate) persons.
+    """
+    if prefixes is not None and len(prefixes) != len(inpaths):
+        raise UserWarning(f"Expected {len(inpaths)} prefixes, one per input, got {len(prefixes)}.")
+    pids = set()
+    hids = {}
+    duplicates = 0
+    with write.Writer(
+        outpath,
+        household_key="hid",
+        comment=comment,
+        keep_non_selected=keep_non_selected,
+        fast=fast,
+    ) as writer:
+        for idx, inpath in enumerate(inpaths):
+            prefix = "" if prefixes is None else str(prefixes[idx])
+            for person in read.stream_matsim_persons(
+                inpath,
+                weight=1,
+                version=matsim_version,
+                simplify_pt_trips=simplify_pt_trips,
+                autocomplete=autocomplete,
+                crop=crop,
+                keep_non_selected=keep_non_selected,
+                leg_attributes=leg_attributes,
+                leg_route=leg_route,
+                workers=workers,
+                **kwargs,
+            ):
+                if prefix:
+                    person.reindex(prefix)
+                if person.pid in pids:
+                    duplicates += 1
+                    logger.warning(
+                        f"Skipping duplicate person id '{person.pid}' found in {inpath}."
+                    )
+                    continue
+                pids.add(person.pid)
+
+                hid = None
+                if household_key:
+                    hid = person.attributes.get(household_key)
+                if not hid:
+                    hid = person.pid
+                elif prefix:
+                    hid = prefix + str(hid)
+                if hids.setdefault(hid, idx) != idx:
+                    logger.warning(
+                        f"Household id '{hid}' in {inpath} is already used by {inpaths[hids[hid]]}."
+                    )
+
+                household = core.Household(hid)
+                household.add(person)
+                writer.add_hh(household)
+
+    return {"num_households": len(hids), "num_people": len(pids), "duplicates": duplicates}
@@ -0,0 +1,125 @@
+from typing import Optional
+
+from lxml import etree as et
+
+from pam import read, store, utils, write
+
+
+def matsim_to_parquet(
+    plans_path: str,
+    dir: str,
+    household_key: Optional[str] = None,
+    batch_size: int = 100000,
+    **kwargs,
+) -> None:
+    """Convert a MATSim population to partitioned parquet tables, streaming persons in bounded memory.
+
+    Each table (persons, plans, activities, legs and routes) is written to a sub directory of `dir`
+    as a sequence of parquet part files of (at most) `batch_size` persons. Tables can be read with
+    `pam.read.read_parquet` or as parquet datasets, eg `pd.read_parquet(os.path.join(dir, "legs"))`.
+
+    Args:
+        plans_path (str): path to matsim format xml.
+        dir (str): path to output directory.
+        household_key (Optional[str], optional): Person attribute used as household id, if not given persons are given their own household. Defaults to None.
+        batch_size (int, optional): Number of persons written to each part file. Defaults to 100000.
+        **kwargs: Passed to `pam.read.stream_matsim_persons`, eg `version`, `keep_non_selected` or `leg_route`.
+    """
+    with write.ParquetWriter(dir, household_key=household_key, batch_size=batch_size) as writer:
+        for person in read.stream_matsim_persons(plans_path, **kwargs):
+            writer.add_person(person)
+
+
+def matsim_selected_plans(plans_path: str, out_path: str, comment: Optional[str] = None) -> int:
+    """Copy a MATSim population keeping only selected plans, without parsing plans into pam objects.
+
+    The population is streamed as xml, person elements (and any population attributes) are copied
+    verbatim apart from the removal of their non-selected plans. Memory use is independent of file size.
+
+    Args:
+        plans_path (str): path to matsim format xml (.xml or .xml.gz).
+        out_path (str): output path (.xml or .xml.gz).
+        comment (Optional[str], optional): optionally add a comment string to the xml output. Defaults to None.
+
+    Returns:
+        int: number of non-selected plans removed.
+    """
+    removed = 0
+    with utils.open_xml(plans_path) as target, utils.open_output(out_path) as output, et.xmlfile(
+        output, encoding="utf-8"
+    ) as xf:
+        doc = et.iterparse(target, events=("start", "end"))
+        _, root = next(doc)
+        xf.write_declaration()
+        doctype = root.getroottree().docinfo.doctype
+        if doctype:
+            xf.write_doctype(doctype)
+        if comment:
+            xf.write(et.Comment(comment), pretty_print=True)
+        with xf.element(root.tag, root.attrib, nsmap=root.nsmap):
+            xf.write(root.text or "\n")
+            for event, element in doc:
+                if event != "end" or element.getparent() is not root:
+                    continue
+                if et.QName(element).localname == "person":
+                    for plan in element.findall("{*}plan"):
+                        if plan.get("selected") != "yes":
+                            element.remove(plan)
+                            removed += 1
+                xf.write(element)
+                element.clear()
+                while element.getprevious() is not None:
+                    del root[0]
+    return removed
+
+
+def matsim_to_diary(
+    plans_path: str,
+    dir: str,
+    format: str = "csv",
+    household_key: Optional[str] = None,
+    batch_size: int = 100000,
+    trips: bool = True,
+    **kwargs,
+) -> None:
+    """Convert a MATSim population to legs, trips and activities tables, streaming persons in bounded memory.
+
+    Tables are written in batches of `batch_size` persons, as csv files or as parquet part files
+    (see `pam.write.DiaryWriter`).
+
+    Args:
+        plans_path (str): path to matsim format xml.
+        dir (str): path to output directory.
+        format (str, optional): "csv" or "parquet". Defaults to "csv".
+        household_key (Optional[str], optional): Person attribute used as household id, if not given persons are given their own household. Defaults to None.
+        batch_size (int, optional): Number of persons written at a time. Defaults to 100000.
+        trips (bool, optional): write the trips table. Defaults to True.
+        **kwargs: Passed to `pam.read.stream_matsim_persons`, eg `version`, `simplify_pt_trips` or `workers`.
+    """
+    kwargs.setdefault("lazy_routes", True)
+    with write.DiaryWriter(
+        dir, format=format, household_key=household_key, batch_size=batch_size, trips=trips
+    ) as writer:
+        for person in read.stream_matsim_persons(plans_path, **kwargs):
+            writer.add_person(person)
+
+
+def matsim_to_store(
+    plans_path: str, household_key: Optional[str] = None, **kwargs
+) -> store.PopulationStore:
+    """Read a MATSim population into a columnar store, streaming persons so that the full population is never built.
+
+    Leg routes are not stored (leg distances and links are), so are read as compact lazy routes by default.
+
+    Args:
+        plans_path (str): path to matsim format xml.
+        household_key (Optional[str], optional): Person attribute used as household id, if not given persons are given their own household. Defaults to None.
+        **kwargs: Passed to `pam.read.stream_matsim_persons`, eg `version`, `simplify_pt_trips` or `workers`.
+
+    Returns:
+        store.PopulationStore:
+    """
+    kwargs.setdefault("lazy_routes", True)
+    return store.PopulationStore.from_persons(
+        read.stream_matsim_persons(plans_path, **kwargs), household_key=household_key
+    )
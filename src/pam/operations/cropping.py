@@ -7,7 +7,7 @@ from shapely.geometry import LineString, Polygon
 import pam
 from pam.activity import Activity, Leg, Plan
 from pam.core import Population
-from pam.variables import END_OF_DAY, START_OF_DAY
+from pam.variables import SECONDS_PER_DAY
 
 
 def simplify_population(
@@ -158,21 +158,19 @@ def infill_legs(plan: Plan) -> None:
     """Infill missing legs.
     If there is no leg between two activities, a new one is created linking them.
     """
-    i = 0
-    while i < len(plan.day) - 1:
-        component1 = plan.day[i]
-        component2 = plan.day[i + 1]
-        if isinstance(component1, Activity) and isinstance(component2, Activity):
-            leg = create_leg(component1, component2)
-            plan.day.insert(i + 1, leg)
-            i += 1
-        i += 1
+    day = []
+    for component in plan.day:
+        if day and isinstance(day[-1], Activity) and isinstance(component, Activity):
+            day.append(create_leg(day[-1], component))
+        day.append(component)
+    # assigned once, recording the modification and taking ownership of the new legs
+    plan.day = day
 
 
 def stretch_times(plan: Plan) -> None:
     """Extend start/end activity times to the start/end of day."""
-    plan.day[0].start_time = START_OF_DAY
-    plan.day[-1].end_time = END_OF_DAY
+    plan.day[0].start_s = 0
+    plan.day[-1].end_s = SECONDS_PER_DAY
 
 
 def rename_external(plan: Plan, boundary: Polygon) -> None:
@@ -207,7 +205,7 @@ def link_plan(plan: Plan) -> None:
         p.previous_act = list_get(act_list, i - 1)
 
     for i, p in enumerate(leg_list):
-        p.start_hour = p.start_time.hour
+        p.start_hour = p.start_s // 3600 % 24
         p.next_leg = list_get(leg_list, i + 1)
         p.previous_leg = list_get(leg_list, i - 1)
         p.start_location = p.previous.location
@@ -50,7 +50,7 @@ def run_facility_link_snapping(
         path_network_geometry (str): Path to the network geometry file.
         link_id_field (str, optional): The link ID field to use in the network shapefile. Defaults to "id".
     """
-    population = read_matsim(path_population_in)
+    population = read_matsim(path_population_in, keep_raw=True)
     if ".parquet" in Path(path_network_geometry).suffixes:
         network = gp.read_parquet(path_network_geometry)
     else:
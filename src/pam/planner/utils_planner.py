@@ -67,7 +67,7 @@ def apply_mode_to_home_chain(act: Activity, trmode: str) -> None:
         act (Activity): The activity that is part of the trip chain.
         trmode (str): The mode to apply to each leg of the chain.
     """
-    if "next" not in act.__dict__:
+    if not hasattr(act, "next"):
         raise KeyError(
             "Plan is not linked. Please use `pam.operations.cropping.link_plan` to link activities and legs."
         )
@@ -4,7 +4,7 @@ import numpy as np
 import pandas as pd
 from matplotlib import pyplot as plt
 
-from pam.utils import dt_to_s, td_to_s
+from pam.variables import SECONDS_PER_DAY
 
 
 def extract_activity_log(population):
@@ -14,9 +14,10 @@ def extract_activity_log(population):
             log.append(
                 {
                     "act": activity.act,
-                    "start": dt_to_s(activity.start_time),
-                    "end": dt_to_s(activity.end_time),
-                    "duration": td_to_s(activity.duration),
+                    # time of day
+                    "start": activity.start_s % SECONDS_PER_DAY,
+                    "end": activity.end_s % SECONDS_PER_DAY,
+                    "duration": activity.duration_s,
                 }
             )
 
@@ -30,9 +31,10 @@ def extract_leg_log(population):
             log.append(
                 {
                     "mode": leg.mode,
-                    "start": dt_to_s(leg.start_time),
-                    "end": dt_to_s(leg.end_time),
-                    "duration": td_to_s(leg.duration),
+                    # time of day
+                    "start": leg.start_s % SECONDS_PER_DAY,
+                    "end": leg.end_s % SECONDS_PER_DAY,
+                    "duration": leg.duration_s,
                 }
             )
 
@@ -1,5 +1,6 @@
 import pickle
 
+from pam import snapshot
 from pam.read.diary import (
     add_hhs_from_hhs_attributes,
     add_hhs_from_persons_attributes,
@@ -14,21 +15,29 @@ from pam.read.diary import (
     trip_based_travel_diary_read,
 )
 from pam.read.matsim import (
+    build_person_index,
     get_attributes_from_legs,
     get_attributes_from_person,
     load_attributes_map,
     load_attributes_map_from_v12,
+    load_person_index,
     parse_matsim_plan,
     parse_veh_attribute,
     read_matsim,
+    read_matsim_persons,
     selected_plans,
     stream_matsim_persons,
     unpack_leg,
     unpack_leg_v12,
     unpack_route_v11,
 )
+from pam.read.parquet import load_parquet_legs, load_parquet_table, load_parquet_trips, read_parquet
 
 
 def load_pickle(path):
     with open(path, "rb") as file:
         return pickle.load(file)
+
+
+def load_snapshot(path, mmap: bool = False):
+    return snapshot.load_snapshot(path, mmap=mmap)
@@ -517,6 +517,9 @@ def tour_based_travel_diary_read(
     if sort_by_seq:
         trips = trips.sort_index()
 
+    # share activity types, modes and zones between persons
+    intern = population.categories.intern
+
     for hid, household in population:
         for pid, person in household:
             try:
@@ -535,7 +538,7 @@ def tour_based_travel_diary_read(
                 activity.Activity(
                     seq=0,
                     act=None,
-                    area=person_trips.ozone.iloc[0],
+                    area=intern("zone", person_trips.ozone.iloc[0]),
                     loc=loc,
                     start_time=utils.parse_time(0),
                 )
@@ -552,10 +555,10 @@ def tour_based_travel_diary_read(
                 person.add(
                     activity.Leg(
                         seq=seq,
-                        purp=trip.purp.lower(),
-                        mode=trip["mode"].lower(),
-                        start_area=trip.ozone,
-                        end_area=trip.dzone,
+                        purp=intern("act", trip.purp.lower()),
+                        mode=intern("mode", trip["mode"].lower()),
+                        start_area=intern("zone", trip.ozone),
+                        end_area=intern("zone", trip.dzone),
                         start_loc=start_loc,
                         end_loc=end_loc,
                         start_time=utils.parse_time(trip.tst),
@@ -569,7 +572,7 @@ def tour_based_travel_diary_read(
                     activity.Activity(
                         seq=seq + 1,
                         act=None,
-                        area=trip.dzone,
+                        area=intern("zone", trip.dzone),
                         loc=end_loc,
                         start_time=utils.parse_time(trip.tet),
                     )
@@ -623,6 +626,9 @@ def trip_based_travel_diary_read(
     if sort_by_seq:
         trips = trips.sort_index()
 
+    # share activity types, modes and zones between persons
+    intern = population.categories.intern
+
     for hid, household in population:
         for pid, person in household:
             try:
@@ -632,7 +638,7 @@ def trip_based_travel_diary_read(
                 continue
 
             household.location.area or person_trips.hzone.iloc[0]
-            origin_area = person_trips.ozone.iloc[0]
+            origin_area = intern("zone", person_trips.ozone.iloc[0])
 
             loc = None
             if include_loc:
@@ -650,15 +656,15 @@ def trip_based_travel_diary_read(
                 if include_loc:
                     start_loc = trip.start_loc
                     end_loc = trip.end_loc
-                purpose = trip.purp.lower()
+                purpose = intern("act", trip.purp.lower())
 
                 person.add(
                     activity.Leg(
                         seq=seq,
                         purp=purpose,
-                        mode=trip["mode"].lower(),
-                        start_area=trip.ozone,
-                        end_area=trip.dzone,
+                        mode=intern("mode", trip["mode"].lower()),
+                        start_area=intern("zone", trip.ozone),
+                        end_area=intern("zone", trip.dzone),
                         start_loc=start_loc,
                         end_loc=end_loc,
                         start_time=utils.parse_time(trip.tst),
@@ -671,7 +677,7 @@ def trip_based_travel_diary_read(
                     activity.Activity(
                         seq=seq + 1,
                         act=purpose,
-                        area=trip.dzone,
+                        area=intern("zone", trip.dzone),
                         loc=end_loc,
                         start_time=utils.parse_time(trip.tet),
                     )
@@ -726,6 +732,9 @@ def from_to_travel_diary_read(
     if sort_by_seq:
         trips = trips.sort_index()
 
+    # share activity types, modes and zones between persons
+    intern = population.categories.intern
+
     for hid, household in population:
         for pid, person in household:
             try:
@@ -734,7 +743,7 @@ def from_to_travel_diary_read(
                 person.stay_at_home()
                 continue
 
-            first_act = person_trips.iloc[0].oact.lower()
+            first_act = intern("act", person_trips.iloc[0].oact.lower())
             if not first_act == "home":
                 logger.warning(
                     f" Person pid:{pid} hid:{hid} plan does not start with 'home' activity: {first_act}"
@@ -748,7 +757,7 @@ def from_to_travel_diary_read(
                 activity.Activity(
                     seq=0,
                     act=first_act,
-                    area=person_trips.iloc[0].ozone,
+                    area=intern("zone", person_trips.iloc[0].ozone),
                     loc=loc,
                     start_time=utils.parse_time(0),
                 )
@@ -760,15 +769,15 @@ def from_to_travel_diary_read(
                 if include_loc:
                     start_loc = trip.start_loc
                     end_loc = trip.end_loc
-                purpose = trip.dact.lower()
+                purpose = intern("act", trip.dact.lower())
 
                 person.add(
                     activity.Leg(
                         seq=seq,
                         purp=purpose,
-                        mode=trip["mode"].lower(),
-                        start_area=trip.ozone,
-                        end_area=trip.dzone,
+                        mode=intern("mode", trip["mode"].lower()),
+                        start_area=intern("zone", trip.ozone),
+                        end_area=intern("zone", trip.dzone),
                         start_loc=start_loc,
                         end_loc=end_loc,
                         start_time=utils.parse_time(trip.tst),
@@ -781,7 +790,7 @@ def from_to_travel_diary_read(
                     activity.Activity(
                         seq=seq + 1,
                         act=purpose,
-                        area=trip.dzone,
+                        area=intern("zone", trip.dzone),
                         loc=end_loc,
                         start_time=utils.parse_time(trip.tet),
                     )
@@ -1,20 +1,51 @@
 from __future__ import annotations
 
+import io
 import json
 import logging
-from collections.abc import Iterator
+import pickle
+import re
+from collections.abc import Iterable, Iterator
 from datetime import timedelta
-from typing import Literal, Optional
+from functools import partial
+from multiprocessing import Pool
+from typing import Literal, NamedTuple, Optional, Union
 
+from lxml import etree as et
 from shapely.geometry import Point
 
 import pam.activity as activity
 import pam.core as core
 import pam.utils as utils
-from pam.activity import Route, RouteV11
+from pam.activity import LazyRoute, LazyRouteV11, Route, RouteV11
+from pam.categories import CategoryRegistry
 from pam.variables import START_OF_DAY
 from pam.vehicles import VehicleManager
 
+# approximate size (uncompressed bytes) of the chunks of persons parsed by each worker
+PERSON_CHUNK_SIZE = 2**22
+PERSON_START = re.compile(rb"<person[\s>/]")
+# person opening tag, attribute values may include (unescaped) ">"
+PERSON_TAG = re.compile(rb"<person(?:[^>\"']|\"[^\"]*\"|'[^']*')*>")
+PERSON_END = b"</person>"
+# name of the root element of a document prologue (skipping the declaration and doctype)
+ROOT_START = re.compile(rb"<([^\s/>?!]+)")
+# fields that can be selected with the `fields` projection of `stream_matsim_persons`, person
+# fields are attribute names so are not restricted
+PROJECTION_FIELDS = {
+    "act": {"type", "x", "y", "link", "start_time", "end_time"},
+    "leg": {"mode", "route", "attributes", "start_time", "end_time"},
+}
+
+
+class Projection(NamedTuple):
+    """Normalised `fields` projection (see `stream_matsim_persons`)."""
+
+    person: Optional[frozenset]  # person attributes to keep, None for all
+    act: frozenset
+    leg: frozenset
+    complete: bool  # all fields are parsed
+
 
 def read_matsim(
     plans_path: str,
@@ -30,6 +61,9 @@ def read_matsim(
     keep_non_selected: bool = False,
     leg_attributes: bool = True,
     leg_route: bool = True,
+    lazy_routes: bool = False,
+    keep_raw: bool = False,
+    workers: int = 1,
 ) -> core.Population:
     """Load a MATSim format population into core population format.
     It is possible to maintain the unity of housholds using a household uid in
@@ -52,6 +86,10 @@ def read_matsim(
         keep_non_selected (bool, optional): Whether to parse non-selected plans (storing them in person.plans_non_selected). Defaults to False.
         leg_attributes (bool, optional): Parse leg attributes such as routing mode. Defaults to True.
         leg_route (bool, optional): Parse leg route. Defaults to True.
+        lazy_routes (bool, optional): Keep a compact copy of leg routes, decoded on access. Defaults to False.
+        keep_raw (bool, optional): Keep the xml of each person, unmodified persons are then written verbatim, see `stream_matsim_persons`. Defaults to False.
+        workers (int, optional):
+            Number of processes used to parse persons. Output is identical to (and in the same order as) the serial parser. Defaults to 1.
 
     Returns:
         core.Population:
@@ -107,6 +145,10 @@ have attributes or be able to use a household attribute id. Check this is intend
         keep_non_selected=keep_non_selected,
         leg_attributes=leg_attributes,
         leg_route=leg_route,
+        lazy_routes=lazy_routes,
+        keep_raw=keep_raw,
+        workers=workers,
+        categories=population.categories,
     ):
         # Check if using households, then update population accordingly.
         if household_key and person.attributes.get(household_key):  # using households
@@ -137,6 +179,11 @@ def stream_matsim_persons(
     keep_non_selected: bool = False,
     leg_attributes: bool = True,
     leg_route: bool = True,
+    lazy_routes: bool = False,
+    fields: Optional[dict[str, list[str]]] = None,
+    keep_raw: bool = False,
+    workers: int = 1,
+    categories: Optional[CategoryRegistry] = None,
 ) -> Iterator[core.Person]:
     """Stream a MATSim format population into core.Person objects.
     Expects agent attributes (and vehicles) to be supplied as optional dictionaries.
@@ -167,9 +214,35 @@ def stream_matsim_persons(
             Parse leg attributes such as routing mode. Defaults to True.
         leg_route (bool, optional):
             Parse leg route. Defaults to True.
+        lazy_routes (bool, optional):
+            Keep a compact copy (attributes and text) of leg routes rather than the xml element,
+            network and transit routes are decoded on access. Defaults to False.
+        fields (Optional[dict[str, list[str]]], optional):
+            Projection of the fields to parse, eg
+            `{"person": ["subpopulation"], "act": ["type", "x", "y"], "leg": ["mode"]}`.
+            "person" lists the person attributes to keep, "act" any of type, x, y and link, and
+            "leg" any of mode, route and attributes. Unselected fields are not parsed and are left
+            empty. Activity types, leg modes and times are always parsed as they define the plan
+            sequence (and are required by the writers and `core.Population.trips_df`). Missing keys
+            keep all fields. Defaults to None.
+        keep_raw (bool, optional):
+            Keep the xml of each person (see `core.Person.keep_raw_xml`), so that persons left
+            unmodified are written verbatim by `pam.write.matsim.Writer` rather than re-serialised.
+            Only v12 persons parsed without loss are kept, ie without `simplify_pt_trips`, `crop`
+            or `fields` and with leg attributes, leg routes and (if present) non-selected plans.
+            Defaults to False.
+        workers (int, optional):
+            Number of processes used to parse persons. The document is split into chunks of
+            complete `<person>` elements which are parsed in a process pool, persons are yielded in
+            file order. Defaults to 1.
+        categories (Optional[CategoryRegistry], optional):
+            Registry used to intern activity types, modes, links and attribute names and values,
+            so that they are shared between persons (eg `core.Population.categories`). With
+            `workers`, values are shared within each chunk of persons. Defaults to None.
 
     Raises:
         UserWarning: `version` must be set to 11 or 12.
+        UserWarning: Unknown `fields` projection.
 
     Yields:
         Iterator[core.Person]:
@@ -177,29 +250,118 @@ def stream_matsim_persons(
     if version not in [11, 12]:
         raise UserWarning("Version must be set to 11 or 12.")
 
+    fields = _projection(fields)
+
     if vehicles_manager is None:
         vehicles_manager = VehicleManager()
 
+    options = dict(
+        weight=weight,
+        version=version,
+        simplify_pt_trips=simplify_pt_trips,
+        autocomplete=autocomplete,
+        crop=crop,
+        keep_non_selected=keep_non_selected,
+        leg_attributes=leg_attributes,
+        leg_route=leg_route,
+        lazy_routes=lazy_routes,
+        fields=fields,
+        keep_raw=keep_raw,
+    )
+
+    if categories is None:
+        categories = CategoryRegistry()
+
+    if workers > 1:
+        yield from _stream_matsim_persons_parallel(
+            plans_path,
+            attributes=attributes,
+            vehicles_manager=vehicles_manager,
+            workers=workers,
+            categories=categories,
+            **options,
+        )
+        return
+
     for person_xml in utils.get_elems(plans_path, "person"):
-        if version == 11:
-            person_id = person_xml.xpath("@id")[0]
-            agent_attributes = attributes.get(person_id, {})
-        else:
-            person_id, agent_attributes = get_attributes_from_person(person_xml)
+        yield parse_matsim_person(
+            person_xml,
+            attributes=attributes,
+            vehicles_manager=vehicles_manager,
+            categories=categories,
+            **options,
+        )
 
-        # remove vehicle attribute from agent and create person vehicles dictionary
-        person_vehs = {}
-        if vehicles_manager.len():
-            agent_vehs = agent_attributes.pop("vehicles", {})
-            person_vehs = {mode: vehicles_manager.pop(vid) for mode, vid in agent_vehs.items()}
 
-        person = core.Person(
-            person_id, attributes=agent_attributes, freq=weight, vehicles=person_vehs
+def parse_matsim_person(
+    person_xml,
+    attributes: dict = {},
+    vehicles_manager: Optional[VehicleManager] = None,
+    weight: int = 100,
+    version: Literal[11, 12] = 12,
+    simplify_pt_trips: bool = False,
+    autocomplete: bool = True,
+    crop: bool = False,
+    keep_non_selected: bool = False,
+    leg_attributes: bool = True,
+    leg_route: bool = True,
+    lazy_routes: bool = False,
+    fields: Optional[Union[dict, Projection]] = None,
+    keep_raw: bool = False,
+    categories: Optional[CategoryRegistry] = None,
+) -> core.Person:
+    """Parse a MATSim person xml element, see `stream_matsim_persons` for arguments."""
+    if not isinstance(fields, Projection):
+        fields = _projection(fields)
+    if categories is None:
+        categories = CategoryRegistry()
+    keep_raw = (
+        keep_raw
+        and version == 12
+        and leg_attributes
+        and leg_route
+        and not (simplify_pt_trips or crop)
+        and fields.complete
+    )
+    if version == 11:
+        person_id = person_xml.xpath("@id")[0]
+        agent_attributes = attributes.get(person_id, {})
+        if fields.person is not None:
+            agent_attributes = {k: v for k, v in agent_attributes.items() if k in fields.person}
+    else:
+        person_id, agent_attributes = get_attributes_from_person(
+            person_xml, fields.person, categories
         )
 
-        for plan_xml in person_xml:
-            if plan_xml.get("selected") == "yes":
-                person.plan = parse_matsim_plan(
+    # remove vehicle attribute from agent and create person vehicles dictionary
+    person_vehs = {}
+    if vehicles_manager is not None and vehicles_manager.len():
+        agent_vehs = agent_attributes.pop("vehicles", {})
+        person_vehs = {mode: vehicles_manager.pop(vid) for mode, vid in agent_vehs.items()}
+
+    person = core.Person(person_id, attributes=agent_attributes, freq=weight, vehicles=person_vehs)
+
+    for plan_xml in person_xml:
+        if plan_xml.get("selected") == "yes":
+            person.plan = parse_matsim_plan(
+                plan_xml=plan_xml,
+                person_id=person_id,
+                version=version,
+                simplify_pt_trips=simplify_pt_trips,
+                crop=crop,
+                autocomplete=autocomplete,
+                leg_attributes=leg_attributes,
+                leg_route=leg_route,
+                lazy_routes=lazy_routes,
+                fields=fields,
+                categories=categories,
+            )
+        elif plan_xml.get("selected") == "no":
+            if not keep_non_selected:
+                keep_raw = False
+                continue
+            person.plans_non_selected.append(
+                parse_matsim_plan(
                     plan_xml=plan_xml,
                     person_id=person_id,
                     version=version,
@@ -208,21 +370,307 @@ def stream_matsim_persons(
                     autocomplete=autocomplete,
                     leg_attributes=leg_attributes,
                     leg_route=leg_route,
+                    lazy_routes=lazy_routes,
+                    fields=fields,
+                    categories=categories,
                 )
-            elif keep_non_selected and plan_xml.get("selected") == "no":
-                person.plans_non_selected.append(
-                    parse_matsim_plan(
-                        plan_xml=plan_xml,
-                        person_id=person_id,
-                        version=version,
-                        simplify_pt_trips=simplify_pt_trips,
-                        crop=crop,
-                        autocomplete=autocomplete,
-                        leg_attributes=leg_attributes,
-                        leg_route=leg_route,
-                    )
-                )
-        yield person
+            )
+
+    if keep_raw:
+        person.keep_raw_xml(et.tostring(person_xml, encoding="utf-8", with_tail=False))
+    return person
+
+
+def _stream_matsim_persons_parallel(
+    plans_path: str,
+    attributes: dict,
+    vehicles_manager: VehicleManager,
+    workers: int,
+    categories: CategoryRegistry,
+    chunk_size: int = PERSON_CHUNK_SIZE,
+    **options,
+) -> Iterator[core.Person]:
+    """Parse chunks of persons in a process pool, yielding persons in file order.
+
+    Attributes (v11) and vehicles are assigned in the main process so that large lookups are not
+    copied to the workers. Values interned by the workers are re-interned with `categories`.
+    """
+    parse_chunk = partial(_parse_person_chunk, **options)
+    with Pool(workers) as pool:
+        for data in pool.imap(parse_chunk, _person_chunks(plans_path, chunk_size)):
+            for person in _load_persons(data, categories):
+                if options["version"] == 11:
+                    person.attributes = attributes.get(person.pid, {})
+                if vehicles_manager.len():
+                    raw = person.raw_xml
+                    person.assign_vehicles_from_manager(vehicles_manager)
+                    if raw is not None:
+                        person.keep_raw_xml(raw)
+                yield person
+
+
+def _parse_person_chunk(chunk: bytes, **options) -> bytes:
+    """Parse a chunk of persons, pickled with references to the values interned in the chunk
+    (see `_load_persons`).
+    """
+    root = et.fromstring(chunk)
+    categories = CategoryRegistry()
+    persons = [
+        parse_matsim_person(person_xml, categories=categories, **options)
+        for person_xml in root.iterchildren("person")
+    ]
+    # interned values and their fields, persons refer to them by index
+    interned = {}
+    values = []
+    for field, table in categories.tables.items():
+        for value in table.values():
+            idx = interned.setdefault(id(value), len(values))
+            if idx == len(values):
+                values.append((value, []))
+            values[idx][1].append(field)
+
+    def persistent_id(obj):
+        if isinstance(obj, str):
+            return interned.get(id(obj))
+        return None
+
+    data = io.BytesIO()
+    pickle.dump(values, data, protocol=pickle.HIGHEST_PROTOCOL)
+    pickler = pickle.Pickler(data, protocol=pickle.HIGHEST_PROTOCOL)
+    pickler.persistent_id = persistent_id
+    pickler.dump(persons)
+    return data.getvalue()
+
+
+def _load_persons(data: bytes, categories: CategoryRegistry) -> list[core.Person]:
+    """Unpickle the persons of a chunk (see `_parse_person_chunk`), interning their values with
+    `categories` so that they are shared with persons from other chunks.
+    """
+    data = io.BytesIO(data)
+    values = []
+    for value, fields in pickle.load(data):
+        value = categories.table(fields[0]).setdefault(value, value)
+        for field in fields[1:]:
+            categories.table(field).setdefault(value, value)
+        values.append(value)
+    unpickler = pickle.Unpickler(data)
+    unpickler.persistent_load = values.__getitem__
+    return unpickler.load()
+
+
+def _person_chunks(plans_path: str, chunk_size: int = PERSON_CHUNK_SIZE) -> Iterator[bytes]:
+    """Split a MATSim plans xml into byte chunks of complete `<person>` elements.
+
+    Each chunk is a complete document, the persons are wrapped with the content before the first
+    person (declaration, doctype and root start tag, keeping any namespaces and entities) and
+    the matching root end tag.
+
+    Args:
+        plans_path (str): path to matsim format xml.
+        chunk_size (int, optional): approximate chunk size in (uncompressed) bytes.
+
+    Yields:
+        Iterator[bytes]: xml documents of one or more consecutive persons.
+    """
+    buffer = b""
+    prologue = None
+    with utils.open_xml(plans_path) as f:
+        while True:
+            block = f.read(chunk_size)
+            if not block:
+                break
+            buffer += block
+            if prologue is None:
+                start = PERSON_START.search(buffer)
+                if start is None:
+                    continue
+                prologue, buffer = buffer[: start.start()], buffer[start.start() :]
+                root = ROOT_START.search(re.sub(rb"<!--.*?-->", b"", prologue, flags=re.DOTALL))
+                root_end = b"</" + root.group(1) + b">"
+            end = buffer.rfind(PERSON_END)
+            if end != -1:
+                end += len(PERSON_END)
+                yield prologue + buffer[:end] + root_end
+                buffer = buffer[end:]
+    if prologue is not None:
+        # remaining (self closing) persons
+        end = buffer.rfind(root_end)
+        if end != -1:
+            buffer = buffer[:end]
+        if PERSON_START.search(buffer):
+            yield prologue + buffer + root_end
+
+
+def build_person_index(
+    plans_path: str, household_key: Optional[str] = None, index_path: Optional[str] = None
+) -> dict[str, dict]:
+    """Build an index of the position of each `<person>` element in a MATSim plans xml.
+
+    Offsets are given in uncompressed bytes, so the same index can be used for plain and gzipped
+    plans. The index can be saved as a json sidecar file and passed to `read_matsim_persons`.
+
+    Args:
+        plans_path (str): path to matsim format xml.
+        household_key (Optional[str], optional):
+            Optionally record the household id of each person from the given person attribute (v12 only). Defaults to None.
+        index_path (Optional[str], optional): Optionally write the index to this json path. Defaults to None.
+
+    Returns:
+        dict[str, dict]: `{pid: {"offset": int, "length": int, "hid": Optional[str]}}`, in file order.
+    """
+    index = {}
+    for offset, person_bytes in _person_elements(plans_path):
+        if household_key is None:
+            pid, hid = _person_id(person_bytes), None
+        else:
+            pid, person_attributes = get_attributes_from_person(et.fromstring(person_bytes))
+            hid = person_attributes.get(household_key)
+        index[pid] = {"offset": offset, "length": len(person_bytes), "hid": hid}
+
+    if index_path is not None:
+        with open(index_path, "w") as f:
+            json.dump(index, f)
+    return index
+
+
+def load_person_index(index_path: str) -> dict[str, dict]:
+    """Load a person index written by `build_person_index`."""
+    with open(index_path) as f:
+        return json.load(f)
+
+
+def read_matsim_persons(
+    plans_path: str,
+    pids: Iterable[str],
+    index: Optional[Union[dict, str]] = None,
+    attributes: dict = {},
+    vehicles_manager: Optional[VehicleManager] = None,
+    weight: int = 100,
+    version: Literal[11, 12] = 12,
+    simplify_pt_trips: bool = False,
+    autocomplete: bool = True,
+    crop: bool = False,
+    keep_non_selected: bool = False,
+    leg_attributes: bool = True,
+    leg_route: bool = True,
+    lazy_routes: bool = False,
+) -> Iterator[core.Person]:
+    """Read selected persons from a MATSim plans xml, seeking directly to each of them using a person index.
+
+    Persons are yielded in file order. Gzipped plans are supported but cannot be seeked into
+    directly, requested persons are therefore read in a single forward pass, decompressing (but
+    not parsing) the content in between.
+
+    Args:
+        plans_path (str): path to matsim format xml.
+        pids (Iterable[str]): ids of the persons to read.
+        index (Optional[Union[dict, str]], optional):
+            Person index from `build_person_index`, or a path to a saved index. If None, the index is built first. Defaults to None.
+        attributes (dict, optional): Map of person attributes, only required for v11. Defaults to {}.
+        vehicles_manager (Optional[VehicleManager], optional): Vehicles to assign to persons. Defaults to None.
+        weight (int, optional): Person frequency. Defaults to 100.
+        version (Literal[11, 12], optional): MATSim plans xml version. Defaults to 12.
+        simplify_pt_trips (bool, optional): Simplifies complex transit routes. Defaults to False.
+        autocomplete (bool, optional): Fills missing leg and activity attributes. Defaults to True.
+        crop (bool, optional): Crop plans that go beyond 24 hours. Defaults to False.
+        keep_non_selected (bool, optional): Whether to parse non-selected plans (storing them in person.plans_non_selected). Defaults to False.
+        leg_attributes (bool, optional): Parse leg attributes such as routing mode. Defaults to True.
+        leg_route (bool, optional): Parse leg route. Defaults to True.
+        lazy_routes (bool, optional): Keep a compact copy of leg routes, decoded on access. Defaults to False.
+
+    Raises:
+        KeyError: Requested pids are missing from the index.
+
+    Yields:
+        Iterator[core.Person]:
+    """
+    if index is None:
+        index = build_person_index(plans_path)
+    elif not isinstance(index, dict):
+        index = load_person_index(index)
+
+    pids = set(pids)
+    missing = [pid for pid in pids if pid not in index]
+    if missing:
+        raise KeyError(f"Persons not found in index of {plans_path}: {missing}")
+    entries = sorted((index[pid] for pid in pids), key=lambda entry: entry["offset"])
+
+    with utils.open_xml(plans_path) as f:
+        for entry in entries:
+            f.seek(entry["offset"])
+            person_xml = et.fromstring(f.read(entry["length"]))
+            yield parse_matsim_person(
+                person_xml,
+                attributes=attributes,
+                vehicles_manager=vehicles_manager,
+                weight=weight,
+                version=version,
+                simplify_pt_trips=simplify_pt_trips,
+                autocomplete=autocomplete,
+                crop=crop,
+                keep_non_selected=keep_non_selected,
+                leg_attributes=leg_attributes,
+                leg_route=leg_route,
+                lazy_routes=lazy_routes,
+            )
+
+
+def _person_elements(
+    plans_path: str, block_size: int = PERSON_CHUNK_SIZE
+) -> Iterator[tuple[int, bytes]]:
+    """Scan a MATSim plans xml for `<person>` elements, without parsing them.
+
+    Args:
+        plans_path (str): path to matsim format xml.
+        block_size (int, optional): number of (uncompressed) bytes read per step.
+
+    Yields:
+        Iterator[tuple[int, bytes]]: offset (in uncompressed bytes) and content of each person element.
+    """
+    buffer = b""
+    buffer_offset = 0  # file offset of the start of the buffer
+    pos = 0
+    with utils.open_xml(plans_path) as f:
+        while True:
+            start = PERSON_START.search(buffer, pos)
+            if start is not None:
+                end = _person_end(buffer, start.start())
+                if end is not None:
+                    yield buffer_offset + start.start(), buffer[start.start() : end]
+                    pos = end
+                    continue
+                pos = start.start()
+            else:
+                # keep enough of the buffer to match a person tag split across blocks
+                pos = max(pos, len(buffer) - len(PERSON_END))
+
+            block = f.read(block_size)
+            if not block:
+                return
+            buffer_offset += pos
+            buffer = buffer[pos:] + block
+            pos = 0
+
+
+def _person_end(buffer: bytes, start: int) -> Optional[int]:
+    tag = PERSON_TAG.match(buffer, start)
+    if tag is None:
+        return None
+    tag_end = tag.end()
+    if buffer[tag_end - 2 : tag_end] == b"/>":
+        return tag_end
+    end = buffer.find(PERSON_END, tag_end)
+    if end == -1:
+        return None
+    return end + len(PERSON_END)
+
+
+def _person_id(person_bytes: bytes) -> str:
+    # parse only the opening tag
+    tag = PERSON_TAG.match(person_bytes).group()
+    if not tag.endswith(b"/>"):
+        tag += PERSON_END
+    return et.fromstring(tag).get("id")
 
 
 def parse_matsim_plan(
@@ -234,9 +682,25 @@ def parse_matsim_plan(
     autocomplete: bool,
     leg_attributes: bool = True,
     leg_route: bool = True,
+    lazy_routes: bool = False,
+    fields: Optional[Union[dict, Projection]] = None,
+    categories: Optional[CategoryRegistry] = None,
 ) -> activity.Plan:
-    """Parse a MATSim plan."""
+    """Parse a MATSim plan, optionally only parsing the activity and leg fields selected by the
+    `fields` projection (see `stream_matsim_persons`, normalised once per stream as a
+    `Projection`), interning activity types, modes and links with the `categories` registry.
+    """
     logger = logging.getLogger(__name__)
+    if categories is None:
+        categories = CategoryRegistry()
+    act_types = categories.table("act")
+    modes = categories.table("mode")
+    links = categories.table("link")
+    if not isinstance(fields, Projection):
+        fields = _projection(fields)
+    act_fields = fields.act
+    leg_route = leg_route and "route" in fields.leg
+    leg_attributes = leg_attributes and "attributes" in fields.leg
     act_seq = 0
     leg_seq = 0
     arrival_dt = START_OF_DAY
@@ -250,11 +714,13 @@ def parse_matsim_plan(
         if stage.tag in ["act", "activity"]:
             act_seq += 1
             act_type = stage.get("type")
+            act_type = act_types.setdefault(act_type, act_type)
 
             loc = None
-            x, y = stage.get("x"), stage.get("y")
-            if x and y:
-                loc = Point(int(float(x)), int(float(y)))
+            if "x" in act_fields and "y" in act_fields:
+                x, y = stage.get("x"), stage.get("y")
+                if x and y:
+                    loc = Point(int(float(x)), int(float(y)))
 
             if act_type == "pt interaction":
                 departure = stage.get("end_time")
@@ -274,16 +740,21 @@ def parse_matsim_plan(
                     seq=act_seq,
                     act=act_type,
                     loc=loc,
-                    link=stage.get("link"),
+                    link=_intern(links, stage.get("link")) if "link" in act_fields else None,
                     start_time=arrival_dt,
                     end_time=departure_dt,
                 )
             )
 
         if stage.tag == "leg":
-            mode, route, attributes = unpack_leg(stage, version)
-            if not leg_attributes:
-                attributes = {}
+            if leg_route or leg_attributes:
+                mode, route, attributes = unpack_leg(stage, version, lazy_routes, categories)
+                if not leg_attributes or not attributes:
+                    # legs without attributes share a read-only empty dictionary
+                    attributes = activity.EMPTY_ATTRIBUTES
+            else:
+                mode, route, attributes = stage.get("mode"), None, activity.EMPTY_ATTRIBUTES
+            mode = _intern(modes, mode)
 
             leg_seq += 1
             trav_time = stage.get("trav_time")
@@ -310,8 +781,8 @@ def parse_matsim_plan(
                     activity.Leg(
                         seq=leg_seq,
                         mode=mode,
-                        start_link=route.get("start_link"),
-                        end_link=route.get("end_link"),
+                        start_link=_intern(links, route.get("start_link")),
+                        end_link=_intern(links, route.get("end_link")),
                         start_time=departure_dt,
                         end_time=arrival_dt,
                         distance=route.distance,
@@ -338,31 +809,74 @@ def parse_matsim_plan(
     return plan
 
 
-def unpack_leg(leg, version):
+def _intern(table: dict, value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    return table.setdefault(value, value)
+
+
+def _projection(fields: Optional[dict] = None) -> Projection:
+    """Normalise a `fields` projection, None (or missing keys) meaning all fields are parsed."""
+    if fields is None:
+        fields = {}
+    unknown = set(fields) - {"person", *PROJECTION_FIELDS}
+    if unknown:
+        raise UserWarning(f"Unknown fields projection key(s): {unknown}")
+    projection = {}
+    for key in ["person", *PROJECTION_FIELDS]:
+        selected = fields.get(key)
+        if selected is not None:
+            selected = set(selected)
+            if key in PROJECTION_FIELDS and not selected <= PROJECTION_FIELDS[key]:
+                raise UserWarning(
+                    f"Unknown {key} fields {selected - PROJECTION_FIELDS[key]}, expected a subset of {PROJECTION_FIELDS[key]}"
+                )
+        projection[key] = selected
+    return Projection(
+        person=None if projection["person"] is None else frozenset(projection["person"]),
+        act=frozenset(PROJECTION_FIELDS["act"] if projection["act"] is None else projection["act"]),
+        leg=frozenset(PROJECTION_FIELDS["leg"] if projection["leg"] is None else projection["leg"]),
+        complete=all(selected is None for selected in projection.values()),
+    )
+
+
+def unpack_leg(
+    leg, version, lazy_routes: bool = False, categories: Optional[CategoryRegistry] = None
+):
     if version == 12:
-        return unpack_leg_v12(leg)
-    return unpack_route_v11(leg)
+        return unpack_leg_v12(leg, lazy_routes, categories)
+    return unpack_route_v11(leg, lazy_routes, categories)
 
 
-def unpack_route_v11(leg) -> tuple[str, RouteV11, dict]:
+def unpack_route_v11(
+    leg, lazy_routes: bool = False, categories: Optional[CategoryRegistry] = None
+) -> tuple[str, RouteV11, dict]:
     """Extract mode, network route and transit route as available.
 
     Args:
         leg (xml_leg_element):
+        lazy_routes (bool, optional): Return a compact `LazyRouteV11`. Defaults to False.
+        categories (Optional[CategoryRegistry], optional): Registry interning lazy route attributes. Defaults to None.
 
     Returns:
         tuple[str, RouteV11, dict]: mode, route, attributes
     """
     mode = leg.get("mode")
+    if lazy_routes:
+        return mode, _lazy_route(leg, LazyRouteV11, categories), {}
     route = RouteV11(leg.xpath("route"))
     return mode, route, {}
 
 
-def unpack_leg_v12(leg) -> tuple[str, Route, dict]:
+def unpack_leg_v12(
+    leg, lazy_routes: bool = False, categories: Optional[CategoryRegistry] = None
+) -> tuple[str, Route, dict]:
     """Extract mode, route and attributes as available.
 
     Args:
         leg (xml_leg_element):
+        lazy_routes (bool, optional): Return a compact `LazyRoute`. Defaults to False.
+        categories (Optional[CategoryRegistry], optional): Registry interning lazy route and leg attributes. Defaults to None.
 
     Returns:
         tuple[str, Route, dict]: mode, route, attributes
@@ -445,23 +959,41 @@ def unpack_leg_v12(leg) -> tuple[str, Route, dict]:
         The network route is empty.
     """
     mode = leg.get("mode")
-    route = Route(leg.xpath("route"))
-    attributes = get_attributes_from_legs(leg)
+    if lazy_routes:
+        route = _lazy_route(leg, LazyRoute, categories)
+    else:
+        route = Route(leg.xpath("route"))
+    attributes = get_attributes_from_legs(leg, categories)
     return mode, route, attributes
 
 
+def _lazy_route(
+    leg, route_class: type[LazyRoute], categories: Optional[CategoryRegistry] = None
+) -> Route:
+    route_xml = leg.find("route")
+    if route_xml is None:
+        return Route()
+    return route_class.from_xml(route_xml, categories)
+
+
 def load_attributes_map_from_v12(plans_path):
     return dict(
         [get_attributes_from_person(elem) for elem in utils.get_elems(plans_path, "person")]
     )
 
 
-def get_attributes_from_person(elem):
+def get_attributes_from_person(
+    elem, names: Optional[set[str]] = None, categories: Optional[CategoryRegistry] = None
+):
     ident = elem.xpath("@id")[0]
     attributes = {}
+    if names is not None and not names:
+        return ident, attributes
     for attr in elem.xpath("./attributes/attribute"):
         attribute_type = attr.get("class")
         attribute_name = attr.get("name")
+        if names is not None and attribute_name not in names:
+            continue
         if attribute_type == "java.lang.String":
             attributes[attribute_name] = attr.text
         elif attribute_type == "java.lang.Boolean":
@@ -475,6 +1007,8 @@ def get_attributes_from_person(elem):
         # last try:
         else:
             attributes[attribute_name] = attr.text
+    if categories is not None:
+        attributes = categories.attributes(attributes)
     return ident, attributes
 
 
@@ -482,10 +1016,13 @@ def parse_veh_attribute(text) -> dict:
     return json.loads(text)
 
 
-def get_attributes_from_legs(elem):
+def get_attributes_from_legs(elem, categories: Optional[CategoryRegistry] = None):
     attributes = {}
     for attr in elem.xpath("./attributes/attribute"):
         attributes[attr.get("name")] = attr.text
+    if categories is not None and attributes:
+        # routing modes are repeated, other leg attribute values (eg times) are mostly unique
+        attributes = categories.attributes(attributes, values=("routingMode",))
     return attributes
 
 
@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import json
+import os
+from typing import Optional
+
+import pandas as pd
+from shapely.geometry import Point
+
+import pam.activity as activity
+import pam.core as core
+from pam.activity import ROUTE_INTERNED_ATTRIBUTES, LazyRoute
+from pam.variables import START_OF_DAY
+
+
+def read_parquet(dir: str, keep_non_selected: bool = False) -> core.Population:
+    """Load a population from parquet tables written by `pam.operations.convert.matsim_to_parquet`
+    (or `pam.write.write_parquet`).
+
+    Leg routes are loaded as `LazyRoute`s and leg locations are completed from the adjacent activities.
+    Missing times and frequencies are loaded as None. The tables do not hold household frequencies
+    or person vehicles, household frequencies are left as None (defaulting to the average person
+    frequency, see `core.Household.freq`) and persons are loaded without vehicles.
+
+    Args:
+        dir (str): path to parquet directory.
+        keep_non_selected (bool, optional): Whether to load non-selected plans. Defaults to False.
+
+    Returns:
+        core.Population:
+    """
+    persons = load_parquet_table(dir, "persons")
+    plans = load_parquet_table(dir, "plans")
+    activities = load_parquet_table(dir, "activities")
+    legs = load_parquet_table(dir, "legs")
+    routes = load_parquet_table(dir, "routes")
+    if not keep_non_selected:
+        plans, activities, legs, routes = (
+            df[df.plan == 0] for df in [plans, activities, legs, routes]
+        )
+
+    population = core.Population()
+    # share activity types, modes, links and attribute names between persons
+    categories = population.categories
+    intern = categories.intern
+
+    routes = {
+        (route.pid, route.plan, route.seq): LazyRoute(
+            categories.attributes(json.loads(route.attributes), values=ROUTE_INTERNED_ATTRIBUTES),
+            route.text,
+        )
+        for route in routes.itertuples(index=False)
+    }
+    components = {}
+    for act in activities.itertuples(index=False):
+        loc = None
+        if not (pd.isna(act.x) or pd.isna(act.y)):
+            loc = Point(act.x, act.y)
+        components.setdefault((act.pid, act.plan), []).append(
+            activity.Activity(
+                seq=act.seq,
+                act=intern("act", act.act),
+                loc=loc,
+                link=intern("link", act.link),
+                start_time=_time(act.start_time),
+                end_time=_time(act.end_time),
+            )
+        )
+    for leg in legs.itertuples(index=False):
+        route = routes.get((leg.pid, leg.plan, leg.seq))
+        components.setdefault((leg.pid, leg.plan), []).append(
+            activity.Leg(
+                seq=leg.seq,
+                mode=intern("mode", leg.mode),
+                purp=intern("act", leg.purp),
+                start_time=_time(leg.start_time),
+                end_time=_time(leg.end_time),
+                distance=None if pd.isna(leg.distance) else leg.distance,
+                attributes=categories.attributes(
+                    json.loads(leg.attributes), values=("routingMode",)
+                ),
+                route=route,
+            )
+        )
+
+    person_plans = {}
+    for plan_record in plans.itertuples(index=False):
+        plan = activity.Plan()
+        day = components.get((plan_record.pid, plan_record.plan), [])
+        # activities and legs alternate, starting with the first activity
+        day.sort(key=lambda c: (c.seq, isinstance(c, activity.Leg)))
+        for component in day:
+            plan.add(component)
+        plan.score = None if pd.isna(plan_record.score) else plan_record.score
+        plan.autocomplete_matsim()
+        person_plans.setdefault(plan_record.pid, []).append((plan_record.selected, plan))
+
+    for record in persons.itertuples(index=False):
+        attributes = categories.attributes(json.loads(record.attributes))
+        person = core.Person(
+            record.pid, attributes=attributes, freq=None if pd.isna(record.freq) else record.freq
+        )
+        for selected, plan in person_plans.get(record.pid, []):
+            if selected:
+                person.plan = plan
+            else:
+                person.plans_non_selected.append(plan)
+        household = population.get(record.hid)
+        if household is None:
+            household = core.Household(record.hid)
+            population.add(household)
+        household.add(person)
+    return population
+
+
+def load_parquet_legs(dir: str) -> pd.DataFrame:
+    """Load a `Population.legs_df` shaped table of selected plan legs directly from parquet tables.
+
+    Locations are given as origin and destination coordinates (ox, oy, dx, dy) rather than
+    `Location` objects, MATSim plans do not include zones.
+
+    Args:
+        dir (str): path to parquet directory.
+
+    Returns:
+        pd.DataFrame:
+    """
+    legs = _selected(load_parquet_table(dir, "legs"))
+    legs = _join_locations(legs, _selected(load_parquet_table(dir, "activities")))
+    legs["seq"] = legs.groupby("pid").cumcount()
+    return _legs_frame(legs, load_parquet_table(dir, "persons"))
+
+
+def load_parquet_trips(
+    dir: str, ignore: list[str] = ["pt interaction", "pt_interaction"]
+) -> pd.DataFrame:
+    """Load a `Population.trips_df` shaped table of selected plan trips directly from parquet tables.
+
+    As for `Plan.trips`, legs are joined into trips by removing the `ignore` activities, with the
+    trip mode being the mode with the largest distance.
+
+    Args:
+        dir (str): path to parquet directory.
+        ignore (list[str], optional): activities to remove. Defaults to ["pt interaction", "pt_interaction"].
+
+    Returns:
+        pd.DataFrame:
+    """
+    activities = _selected(load_parquet_table(dir, "activities"))
+    legs = _selected(load_parquet_table(dir, "legs"))
+    legs = _join_locations(legs, activities)
+    legs["distance"] = legs.distance.fillna(legs.euclidean_distance * 1000)
+
+    # number legs by the trip they belong to, ie the count of preceding non ignored activities
+    activities["trip"] = (~activities.act.isin(ignore)).groupby(activities.pid).cumsum() - 1
+    legs = legs.merge(activities[["pid", "seq", "trip"]], on=["pid", "seq"], how="left")
+
+    mode_distance = legs.groupby(["pid", "trip", "mode"], sort=False).distance.sum().reset_index()
+    modes = mode_distance.loc[mode_distance.groupby(["pid", "trip"], sort=False).distance.idxmax()]
+    trips = legs.groupby(["pid", "trip"], sort=False).agg(
+        ox=("ox", "first"),
+        oy=("oy", "first"),
+        dx=("dx", "last"),
+        dy=("dy", "last"),
+        purp=("dact", "last"),
+        start_time=("start_time", "first"),
+        end_time=("end_time", "last"),
+    )
+    trips = trips.join(modes.set_index(["pid", "trip"])["mode"]).reset_index()
+    trips["seq"] = trips.trip
+    trips["euclidean_distance"] = (
+        (trips.dx - trips.ox) ** 2 + (trips.dy - trips.oy) ** 2
+    ) ** 0.5 / 1000
+    return _legs_frame(trips, load_parquet_table(dir, "persons"))
+
+
+def load_parquet_table(dir: str, table: str) -> pd.DataFrame:
+    """Load a table (persons, plans, activities, legs or routes) from a parquet directory.
+
+    Args:
+        dir (str): path to parquet directory.
+        table (str): table name.
+
+    Returns:
+        pd.DataFrame:
+    """
+    return pd.read_parquet(os.path.join(dir, table))
+
+
+def _time(seconds) -> Optional[int]:
+    # missing (null) times are read as NaN
+    return None if pd.isna(seconds) else int(seconds)
+
+
+def _selected(df: pd.DataFrame) -> pd.DataFrame:
+    return df[df.plan == 0].drop(columns="plan").reset_index(drop=True)
+
+
+def _join_locations(legs: pd.DataFrame, activities: pd.DataFrame) -> pd.DataFrame:
+    # leg n is preceded by activity n and followed by activity n + 1
+    origins = activities[["pid", "seq", "x", "y"]].rename(columns={"x": "ox", "y": "oy"})
+    destinations = activities[["pid", "seq", "act", "x", "y"]].rename(
+        columns={"x": "dx", "y": "dy", "act": "dact"}
+    )
+    destinations["seq"] -= 1
+    legs = legs.merge(origins, on=["pid", "seq"], how="left").merge(
+        destinations, on=["pid", "seq"], how="left"
+    )
+    legs["euclidean_distance"] = ((legs.dx - legs.ox) ** 2 + (legs.dy - legs.oy) ** 2) ** 0.5 / 1000
+    return legs
+
+
+def _legs_frame(legs: pd.DataFrame, persons: pd.DataFrame) -> pd.DataFrame:
+    attributes = pd.DataFrame.from_records(
+        persons.attributes.map(json.loads).tolist(), index=persons.pid
+    )
+    # as for Population.legs_df, person attributes take precedence over the person fields
+    fields = [c for c in ["hid", "freq"] if c not in attributes.columns]
+    persons = persons[["pid", *fields]].join(attributes, on="pid")
+    start = pd.Timestamp(START_OF_DAY)
+    df = pd.DataFrame(
+        {
+            "pid": legs.pid,
+            "ox": legs.ox,
+            "oy": legs.oy,
+            "dx": legs.dx,
+            "dy": legs.dy,
+            "seq": legs.seq,
+            "purp": legs.purp,
+            "mode": legs["mode"],
+            "tst": (start + pd.to_timedelta(legs.start_time, unit="s")).dt.time,
+            "tet": (start + pd.to_timedelta(legs.end_time, unit="s")).dt.time,
+            # duration in minutes
+            "duration": (legs.end_time - legs.start_time) / 60,
+            "euclidean_distance": legs.euclidean_distance,
+        }
+    )
+    df = df.merge(persons, on="pid", how="left")
+    df.insert(1, "hid", df.pop("hid"))
+    df.insert(df.columns.get_loc("euclidean_distance") + 1, "freq", df.pop("freq"))
+    core.Population.add_fields(df)
+    return df
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from collections import Counter
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pam.core import Person
+
+
+class ValidationReport:
+    """Compact record of person plan validation errors, see `pam.activity.Plan.violations`.
+
+    Holds counts of each error type ("sequence", "times" and "locations") and the ids of the first
+    `max_examples` persons with each error, so that memory use does not grow with population size.
+    Used by `pam.write.matsim.Writer(validate=True)` to validate persons as they are written.
+
+    Args:
+        max_examples (int, optional): number of example person ids kept per error type. Defaults to 5.
+    """
+
+    def __init__(self, max_examples: int = 5) -> None:
+        self.max_examples = max_examples
+        self.persons = 0
+        self.counts = Counter()
+        self.examples = {}
+
+    def check_person(self, person: Person) -> bool:
+        """Validate the selected plan of a person, recording any errors.
+
+        Args:
+            person (Person):
+
+        Returns:
+            bool: person plan is valid.
+        """
+        self.persons += 1
+        errors = person.plan.violations()
+        for error in errors:
+            self.counts[error] += 1
+            examples = self.examples.setdefault(error, [])
+            if len(examples) < self.max_examples:
+                examples.append(person.pid)
+        return not errors
+
+    @property
+    def valid(self) -> bool:
+        return not self.counts
+
+    def to_dict(self) -> dict:
+        """Report as a (json serialisable) dictionary.
+
+        Returns:
+            dict: number of persons checked and the count and example person ids of each error.
+        """
+        return {
+            "persons": self.persons,
+            "errors": {
+                error: {"count": count, "examples": self.examples[error]}
+                for error, count in self.counts.items()
+            },
+        }
+
+    def __str__(self) -> str:
+        invalid = ", ".join(
+            f"{error}: {count} (eg {', '.join(map(str, self.examples[error]))})"
+            for error, count in self.counts.items()
+        )
+        return f"Validated {self.persons} persons, invalid plans: {invalid or 'none'}."
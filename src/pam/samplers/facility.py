@@ -13,7 +13,7 @@ from lxml import etree as et
 
 from pam import variables
 from pam.samplers.spatial import RandomPointSampler
-from pam.utils import DEFAULT_GZIP_COMPRESSION, create_crs_attribute, create_local_dir, is_gzip
+from pam.utils import create_crs_attribute, create_local_dir, open_output
 
 
 class FacilitySampler:
@@ -254,8 +254,7 @@ class FacilitySampler:
     def write_facilities_xml(self, path, comment=None, coordinate_reference_system=None):
         create_local_dir(os.path.dirname(path))
 
-        compression = DEFAULT_GZIP_COMPRESSION if is_gzip(path) else 0
-        with et.xmlfile(path, encoding="utf-8", compression=compression) as xf:
+        with open_output(path) as output, et.xmlfile(output, encoding="utf-8") as xf:
             xf.write_declaration()
             xf.write_doctype(
                 '<!DOCTYPE facilities SYSTEM "http://matsim.org/files/dtd/facilities_v1.dtd">'
@@ -1,8 +1,9 @@
+import math
 from datetime import timedelta
 from random import randrange
 
-from pam.activity import Activity, Plan
-from pam.variables import END_OF_DAY
+from pam.activity import Activity, Plan, PlanComponent
+from pam.variables import SECONDS_PER_DAY
 
 
 def apply_jitter_to_plan(plan: Plan, jitter: timedelta, min_duration: timedelta):
@@ -42,32 +43,43 @@ def jitter_activity(plan: Plan, i: int, jitter: timedelta, min_duration: timedel
     if not isinstance(act, Activity):
         raise UserWarning(f"Expected type of Activity for act, not {type(act)}")
 
-    prev_duration = act.duration
+    # plan times are held as integer seconds, see `PlanComponent.start_s`
+    jitter = jitter // timedelta(seconds=1)
+    min_duration = min_duration // timedelta(seconds=1)
+    prev_duration = act.duration_s
     tail = (len(plan) - i) / 2
 
-    min_end = max(act.start_time + min_duration, act.end_time - jitter)
+    min_end = max(act.start_s + min_duration, act.end_s - jitter)
 
-    allowance = plan[-1].end_time - act.end_time
+    allowance = plan[-1].end_s - act.end_s
     for j in range(i + 1, len(plan), 2):  # legs
-        allowance = -plan[j].duration
+        allowance = -plan[j].duration_s
     for j in range(i + 2, len(plan) + 1, 2):  # acts
         allowance = -min_duration
 
-    max_end = min(plan[-1].end_time - allowance, act.end_time + jitter)
-    jitter_range = max((max_end - min_end).seconds, 1)
+    max_end = min(plan[-1].end_s - allowance, act.end_s + jitter)
+    # as timedelta.seconds, ie modulo one day
+    jitter_range = max((max_end - min_end) % SECONDS_PER_DAY, 1)
 
-    jitter = timedelta(seconds=randrange(jitter_range))
-    new_duration = min_end - act.start_time + jitter
+    new_duration = min_end - act.start_s + randrange(jitter_range)
     change = (new_duration - prev_duration) / tail
 
-    time = act.shift_duration(new_duration)
-    time = plan[i + 1].shift_start_time(time)  # shift first tail leg
+    act.end_s = act.start_s + new_duration
+    time = _shift(plan[i + 1], act.end_s)  # shift first tail leg
 
     for j in range(i + 2, len(plan) - 1, 2):  # tail acts
-        time = plan[j].shift_start_time(time)
-        time = plan[j].shift_duration(plan[j].duration - change)
-        time = plan[j + 1].shift_start_time(time)  # leg
+        duration = plan[j].duration_s - change
+        plan[j].start_s = time
+        plan[j].end_s = math.floor(time + duration)
+        time = _shift(plan[j + 1], plan[j].end_s)  # leg
 
     # final act
-    time = plan[-1].shift_start_time(time)
-    plan[-1].end_time = END_OF_DAY
+    plan[-1].start_s = time
+    plan[-1].end_s = SECONDS_PER_DAY
+
+
+def _shift(component: PlanComponent, start: int) -> int:
+    """Shift a component to a new start (in seconds), keeping its duration, returns the new end."""
+    component.end_s = start + component.duration_s
+    component.start_s = start
+    return component.end_s
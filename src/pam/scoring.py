@@ -8,7 +8,7 @@ import numpy as np
 from pam import utils
 from pam.activity import Activity, Leg, Plan
 from pam.core import Person
-from pam.variables import TRANSIT_MODES
+from pam.variables import SECONDS_PER_DAY, TRANSIT_MODES
 
 
 class PlanScorer(ABC):
@@ -205,8 +205,8 @@ class CharyparNagelPlanScorer(PlanScorer):
         non_wrapped = activities[1:-1]
         wrapped_act = Activity(
             act=activities[0].act,
-            start_time=activities[-1].start_time,
-            end_time=activities[0].end_time + td(days=1),
+            start_time=activities[-1].start_s,
+            end_time=activities[0].end_s + SECONDS_PER_DAY,
         )
         return wrapped_act, non_wrapped
 
@@ -268,30 +268,25 @@ class CharyparNagelPlanScorer(PlanScorer):
         performing = cnfg["performing"]
         typical_dur = utils.matsim_duration_to_hours(cnfg[activity.act]["typicalDuration"])
 
+        # times in seconds, compared by time of day
+        actual_start_time = activity.start_s
         opening_time = cnfg[activity.act].get("openingTime")
         if opening_time is not None:
-            opening_time = utils.matsim_time_to_datetime(opening_time)
-            if opening_time.time() > activity.start_time.time():
+            opening_time = utils.matsim_time_to_seconds(opening_time)
+            if opening_time % SECONDS_PER_DAY > actual_start_time % SECONDS_PER_DAY:
                 actual_start_time = opening_time
-            else:
-                actual_start_time = activity.start_time
-        else:
-            actual_start_time = activity.start_time
 
+        actual_end_time = activity.end_s
         closing_time = cnfg[activity.act].get("closingTime")
         if closing_time is not None:
-            closing_time = utils.matsim_time_to_datetime(closing_time)
-            if closing_time.time() < activity.end_time.time():
+            closing_time = utils.matsim_time_to_seconds(closing_time)
+            if closing_time % SECONDS_PER_DAY < actual_end_time % SECONDS_PER_DAY:
                 actual_end_time = closing_time
-            else:
-                actual_end_time = activity.end_time
-        else:
-            actual_end_time = activity.end_time
 
-        if actual_end_time < actual_start_time or actual_start_time > actual_end_time:
+        if actual_end_time < actual_start_time:
             duration = 0
         else:
-            duration = (actual_end_time - actual_start_time) / td(hours=1)
+            duration = (actual_end_time - actual_start_time) / 3600
 
         if duration < typical_dur / np.e:
             return (duration * np.e - typical_dur) * performing
@@ -305,28 +300,24 @@ class CharyparNagelPlanScorer(PlanScorer):
         opening_time = cnfg[activity.act].get("openingTime")
         if opening_time is None:
             return 0.0
-        opening_dt = utils.matsim_time_to_datetime(opening_time)
-        start_dt = activity.start_time
-        if start_dt.time() < opening_dt.time():
-            return waiting * ((opening_dt - start_dt) / td(hours=1))
+        opening = utils.matsim_time_to_seconds(opening_time)
+        start = activity.start_s
+        if start % SECONDS_PER_DAY < opening % SECONDS_PER_DAY:
+            return waiting * ((opening - start) / 3600)
         return 0.0
 
     def late_arrival_score(self, activity, cnfg) -> float:
         if cnfg[activity.act].get("latestStartTime") is not None and cnfg.get("lateArrival"):
-            latest_start_time = utils.matsim_time_to_datetime(cnfg[activity.act]["latestStartTime"])
-            if activity.start_time.time() > latest_start_time.time():
-                return cnfg["lateArrival"] * (
-                    (activity.start_time - latest_start_time) / td(hours=1)
-                )
+            latest_start_time = utils.matsim_time_to_seconds(cnfg[activity.act]["latestStartTime"])
+            if activity.start_s % SECONDS_PER_DAY > latest_start_time % SECONDS_PER_DAY:
+                return cnfg["lateArrival"] * ((activity.start_s - latest_start_time) / 3600)
         return 0.0
 
     def early_departure_score(self, activity, cnfg) -> float:
         if cnfg[activity.act].get("earliestEndTime") is not None and cnfg.get("earlyDeparture"):
-            earliest_end_time = utils.matsim_time_to_datetime(cnfg[activity.act]["earliestEndTime"])
-            if activity.end_time.time() < earliest_end_time.time():
-                return cnfg["earlyDeparture"] * (
-                    (earliest_end_time - activity.end_time) / td(hours=1)
-                )
+            earliest_end_time = utils.matsim_time_to_seconds(cnfg[activity.act]["earliestEndTime"])
+            if activity.end_s % SECONDS_PER_DAY < earliest_end_time % SECONDS_PER_DAY:
+                return cnfg["earlyDeparture"] * ((earliest_end_time - activity.end_s) / 3600)
         return 0.0
 
     def too_short_score(self, activity, cnfg) -> float:
@@ -0,0 +1,725 @@
+"""Versioned binary snapshot format for populations.
+
+A snapshot is a single file holding a json header followed by array columns:
+
+- `values`: deduplicated table of values (ids, activity types, modes, zones, attribute keys and
+  values...), held as utf-8 text with a kind (string, integer, float, boolean or json) per value.
+  Other columns refer to values by index, with -1 for None.
+- `attributes`: deduplicated table of attribute dictionaries, held as ranges (offsets) of key and
+  value indices.
+- `locations`: one row per (shared) `Location`, with area and link value indices and x, y coordinates.
+- `households`, `persons`, `plans` and `components` (activities and legs): one row per object, with
+  child objects referenced as contiguous ranges (offsets) of the following table.
+
+Arrays are aligned so that a snapshot can be memory-mapped, allowing households and persons to be
+loaded individually (see `Snapshot`) without reading the whole file. Columns are decoded in bulk,
+with values and attributes decoded once per distinct value.
+"""
+
+from __future__ import annotations
+
+import copy
+import gc
+import json
+from contextlib import contextmanager
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Optional, Union
+
+import numpy as np
+import shapely
+from shapely.geometry import Point
+
+import pam
+import pam.core as core
+from pam import PAMSnapshotError
+from pam.activity import (
+    EMPTY_ATTRIBUTES,
+    Activity,
+    LazyRoute,
+    LazyRouteV11,
+    Leg,
+    Plan,
+    Route,
+    RouteV11,
+)
+from pam.location import Location
+from pam.vehicles import CapacityType, ElectricVehicle, Vehicle, VehicleType
+
+SNAPSHOT_MAGIC = b"PAMSNAP\n"
+SNAPSHOT_VERSION = 2
+ALIGNMENT = 64
+NONE = -1
+NO_TIME = np.iinfo(np.int64).min
+
+ACTIVITY, LEG = 0, 1
+NO_ROUTE, ROUTE, ROUTE_V11 = 0, 1, 2
+STRING, INTEGER, FLOAT, BOOLEAN, JSON = 0, 1, 2, 3, 4
+
+COLUMNS = {
+    "values_kind": np.int8,
+    "values_data": np.uint8,
+    "values_offsets": np.int64,
+    "attributes_keys": np.int32,
+    "attributes_values": np.int32,
+    "attributes_offsets": np.int64,
+    "locations_area": np.int32,
+    "locations_link": np.int32,
+    "locations_x": np.float64,
+    "locations_y": np.float64,
+    "households_hid": np.int32,
+    "households_freq": np.int32,
+    "households_attributes": np.int32,
+    "households_location": np.int32,
+    "households_persons": np.int64,
+    "persons_pid": np.int32,
+    "persons_freq": np.int32,
+    "persons_attributes": np.int32,
+    "persons_vehicles": np.int32,
+    "persons_home_location": np.int32,
+    "persons_plans": np.int64,
+    "plans_freq": np.int32,
+    "plans_score": np.float64,
+    "plans_home_location": np.int32,
+    "plans_components": np.int64,
+    "components_kind": np.int8,
+    "components_seq": np.int32,
+    "components_name": np.int32,
+    "components_purp": np.int32,
+    "components_freq": np.int32,
+    "components_start_time": np.int64,
+    "components_end_time": np.int64,
+    "components_start_location": np.int32,
+    "components_end_location": np.int32,
+    "components_distance": np.float64,
+    "components_attributes": np.int32,
+    "components_route_kind": np.int8,
+    "components_route_attributes": np.int32,
+    "components_route_text": np.int32,
+}
+
+VALUE_KINDS = {str: STRING, int: INTEGER, float: FLOAT, bool: BOOLEAN}
+
+# row tables of the encoder and decoder, with the columns of each
+TABLES = {
+    table: [name for name in COLUMNS if name.startswith(f"{table}_")]
+    for table in ["locations", "households", "persons", "plans", "components"]
+}
+# columns of value indices, decoded in bulk
+VALUE_COLUMNS = {
+    "households_hid",
+    "households_freq",
+    "persons_pid",
+    "persons_freq",
+    "persons_vehicles",
+    "plans_freq",
+    "components_seq",
+    "components_name",
+    "components_purp",
+    "components_freq",
+    "components_route_text",
+}
+ATTRIBUTE_COLUMNS = {
+    "households_attributes",
+    "persons_attributes",
+    "components_attributes",
+    "components_route_attributes",
+}
+OFFSET_COLUMNS = {"households_persons", "persons_plans", "plans_components"}
+LOCATION_COLUMNS = {
+    "households_location",
+    "persons_home_location",
+    "plans_home_location",
+    "components_start_location",
+    "components_end_location",
+}
+
+
+def save_snapshot(population: core.Population, path: Union[str, Path]) -> None:
+    """Save a population as a binary snapshot.
+
+    Attributes (of households, persons and legs) must be json serialisable, numpy scalars are
+    converted to python types.
+
+    Args:
+        population (core.Population):
+        path (Union[str, Path]): snapshot path.
+    """
+    encoder = _SnapshotEncoder()
+    with _gc_paused():
+        for _, household in population:
+            encoder.add_household(household)
+        arrays = encoder.arrays()
+
+    header = {
+        "version": SNAPSHOT_VERSION,
+        "pam_version": pam.__version__,
+        "name": population.name,
+        "vehicle_types": [asdict(t) for t in population._vehicles_manager._veh_types.values()],
+        "vehicles": [_encode_vehicle(v) for v in population._vehicles_manager._vehicles.values()],
+    }
+    _write(path, header, arrays)
+
+
+def load_snapshot(path: Union[str, Path], mmap: bool = False) -> core.Population:
+    """Load a population from a binary snapshot.
+
+    Args:
+        path (Union[str, Path]): snapshot path.
+        mmap (bool, optional): Memory-map the snapshot rather than reading it into memory. Defaults to False.
+
+    Returns:
+        core.Population:
+    """
+    return Snapshot(path, mmap=mmap).population()
+
+
+class Snapshot:
+    """Population snapshot reader, households can be loaded individually or all at once.
+
+    Args:
+        path (Union[str, Path]): snapshot path.
+        mmap (bool, optional): Memory-map the snapshot, only reading the arrays of the households that are loaded. Defaults to True.
+    """
+
+    def __init__(self, path: Union[str, Path], mmap: bool = True) -> None:
+        self.path = path
+        self.header, self.columns = _read(path, mmap=mmap)
+        self._values = {}
+        self._attributes = {}
+        self._hids = None
+        self.vehicle_types = {
+            t["id"]: VehicleType(**{**t, "capacity": CapacityType(**t["capacity"])})
+            for t in self.header["vehicle_types"]
+        }
+        self.vehicles = {v["vid"]: _decode_vehicle(v) for v in self.header["vehicles"]}
+
+    def __len__(self) -> int:
+        return len(self.columns["households_hid"])
+
+    @property
+    def hids(self) -> dict[Any, int]:
+        """Mapping of household ids to household index."""
+        if self._hids is None:
+            hids = self.values(self.columns["households_hid"])
+            self._hids = {hid: idx for idx, hid in enumerate(hids)}
+        return self._hids
+
+    def value(self, code: int) -> Any:
+        """Decode a value of the (shared) values table, for ids, types, modes and zones.
+
+        Decoded values are cached, json values (lists and dictionaries) should be copied before
+        they are modified.
+        """
+        if code == NONE:
+            return None
+        value = self._values.get(code, NONE)
+        if value is NONE:
+            kind = self.columns["values_kind"][code]
+            value = self._values[code] = _decode_value(kind, self.text(code))
+        return value
+
+    def values(self, codes: np.ndarray) -> list:
+        """Decode a column of value codes, decoding each distinct value once."""
+        unique, inverse = np.unique(codes, return_inverse=True)
+        decoded = np.empty(len(unique), dtype=object)
+        for idx, code in enumerate(unique.tolist()):
+            decoded[idx] = self.value(code)
+        return decoded[inverse].tolist()
+
+    def text(self, code: int) -> str:
+        offsets = self.columns["values_offsets"]
+        return bytes(self.columns["values_data"][offsets[code] : offsets[code + 1]]).decode()
+
+    def attributes(self, codes: np.ndarray) -> list[dict]:
+        """Decode a column of attributes codes as new dictionaries (empty for -1)."""
+        unique, inverse = np.unique(codes, return_inverse=True)
+        self._decode_attributes([code for code in unique.tolist() if code not in self._attributes])
+        decoded = [self._attributes.get(code) for code in unique.tolist()]
+        attributes = []
+        for idx in inverse.tolist():
+            pairs = decoded[idx]
+            if pairs is None:
+                attributes.append({})
+            elif pairs[1]:
+                attributes.append(copy.deepcopy(dict(pairs[0])))
+            else:
+                attributes.append(dict(pairs[0]))
+        return attributes
+
+    def _decode_attributes(self, codes: list[int]) -> None:
+        # decode the keys and values of attribute dictionaries in bulk, caching the (key, value)
+        # pairs of each and whether they hold mutable (json) values
+        codes = [code for code in codes if code != NONE]
+        if not codes:
+            return
+        offsets = self.columns["attributes_offsets"]
+        starts = offsets[codes]
+        lengths = offsets[np.asarray(codes) + 1] - starts
+        rows = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        keys = self.values(self.columns["attributes_keys"][rows])
+        values = self.values(self.columns["attributes_values"][rows])
+        start = 0
+        for code, length in zip(codes, lengths.tolist()):
+            pairs = tuple(zip(keys[start : start + length], values[start : start + length]))
+            mutable = any(isinstance(value, (list, dict)) for _, value in pairs)
+            self._attributes[code] = (pairs, mutable)
+            start += length
+
+    def household(self, hid: Any) -> core.Household:
+        """Load a single household by id."""
+        idx = self.hids[hid]
+        return self.households(idx, idx + 1)[0]
+
+    def households(self, start: int = 0, stop: Optional[int] = None) -> list[core.Household]:
+        """Load a (contiguous) range of households by index."""
+        if stop is None:
+            stop = len(self)
+        return _SnapshotDecoder(self, start, stop).households()
+
+    def population(self) -> core.Population:
+        """Load the whole population."""
+        population = core.Population(name=self.header["name"])
+        population._vehicles_manager._veh_types.update(self.vehicle_types)
+        population._vehicles_manager._vehicles.update(self.vehicles)
+        with _gc_paused():
+            households = self.households()
+        population.households = {household.hid: household for household in households}
+        return population
+
+
+class _SnapshotEncoder:
+    def __init__(self) -> None:
+        self.codes = {kind: {} for kind in [STRING, INTEGER, FLOAT, BOOLEAN, JSON]}
+        self.kinds = []
+        self.texts = []
+        self.attribute_codes = {}
+        self.attribute_keys = []
+        self.attribute_values = []
+        self.attribute_offsets = [0]
+        self.locations = {}  # locations are shared between objects, so are indexed by id
+        self.rows = {table: [] for table in TABLES}
+
+    def value(self, value: Any) -> int:
+        if value is None:
+            return NONE
+        kind = VALUE_KINDS.get(value.__class__)
+        if kind is None:
+            if isinstance(value, np.generic):
+                return self.value(value.item())
+            kind, value = JSON, json.dumps(value, default=_json_default, separators=(",", ":"))
+        codes = self.codes[kind]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self.kinds)
+            self.kinds.append(kind)
+            self.texts.append(value if kind == STRING or kind == JSON else repr(value))
+        return code
+
+    def attributes(self, attributes: Optional[dict]) -> int:
+        if not attributes:
+            return NONE
+        value = self.value
+        pairs = tuple([(value(key), value(item)) for key, item in attributes.items()])
+        code = self.attribute_codes.get(pairs)
+        if code is None:
+            code = self.attribute_codes[pairs] = len(self.attribute_codes)
+            for key, item in pairs:
+                self.attribute_keys.append(key)
+                self.attribute_values.append(item)
+            self.attribute_offsets.append(len(self.attribute_keys))
+        return code
+
+    def location(self, location: Location) -> int:
+        idx = self.locations.get(id(location))
+        if idx is not None:
+            return idx
+        idx = self.locations[id(location)] = len(self.locations)
+        loc = location.loc
+        if loc is not None and not isinstance(loc, Point):
+            raise TypeError(f"Cannot snapshot location of type {type(loc)}, expected Point.")
+        self.rows["locations"].append(
+            (
+                self.value(location.area),
+                self.value(location.link),
+                np.nan if loc is None else loc.x,
+                np.nan if loc is None else loc.y,
+            )
+        )
+        return idx
+
+    def add_household(self, household: core.Household) -> None:
+        value, persons = self.value, self.rows["persons"]
+        row = (
+            value(household.hid),
+            value(household.hh_freq),
+            self.attributes(household.attributes),
+            self.location(household._location),
+        )
+        for _, person in household:
+            self.add_person(person)
+        self.rows["households"].append((*row, len(persons)))
+
+    def add_person(self, person: core.Person) -> None:
+        value, plans = self.value, self.rows["plans"]
+        vehicles = {mode: _encode_vehicle(v) for mode, v in person.vehicles.items()}
+        row = (
+            value(person.pid),
+            value(person.person_freq),
+            self.attributes(person.attributes),
+            value(vehicles) if vehicles else NONE,
+            self.location(person.home_location),
+        )
+        for plan in [person.plan, *person.plans_non_selected]:
+            self.add_plan(plan)
+        self.rows["persons"].append((*row, len(plans)))
+
+    def add_plan(self, plan: Plan) -> None:
+        components = self.rows["components"]
+        row = (
+            self.value(plan.plan_freq),
+            np.nan if plan.score is None else plan.score,
+            self.location(plan.home_location),
+        )
+        for component in plan:
+            self.add_component(component)
+        self.rows["plans"].append((*row, len(components)))
+
+    def add_component(self, component: Union[Activity, Leg]) -> None:
+        value, location = self.value, self.location
+        if isinstance(component, Activity):
+            row = (
+                ACTIVITY,
+                value(component.seq),
+                value(component.act),
+                NONE,
+                value(component.freq),
+                _microseconds(component.start_s),
+                _microseconds(component.end_s),
+                location(component.location),
+                NONE,
+                np.nan,
+                NONE,
+                NO_ROUTE,
+                NONE,
+                NONE,
+            )
+        else:
+            route = component.route
+            if not route.exists:
+                route_kind, route_attributes, route_text = NO_ROUTE, NONE, NONE
+            else:
+                route_kind = ROUTE_V11 if isinstance(route, RouteV11) else ROUTE
+                route_attributes, route_text = self.attributes(route.attrib), value(route.text)
+            distance = component._distance
+            row = (
+                LEG,
+                value(component.seq),
+                value(component.mode),
+                value(component.purp),
+                value(component.freq),
+                _microseconds(component.start_s),
+                _microseconds(component.end_s),
+                location(component.start_location),
+                location(component.end_location),
+                np.nan if distance is None else distance,
+                self.attributes(component.attributes),
+                route_kind,
+                route_attributes,
+                route_text,
+            )
+        self.rows["components"].append(row)
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        data = [text.encode() for text in self.texts]
+        arrays = {
+            "values_kind": np.array(self.kinds, dtype=COLUMNS["values_kind"]),
+            "values_data": np.frombuffer(b"".join(data), dtype=np.uint8),
+            "values_offsets": np.cumsum([0, *map(len, data)], dtype=np.int64),
+            "attributes_keys": np.array(self.attribute_keys, dtype=COLUMNS["attributes_keys"]),
+            "attributes_values": np.array(
+                self.attribute_values, dtype=COLUMNS["attributes_values"]
+            ),
+            "attributes_offsets": np.array(
+                self.attribute_offsets, dtype=COLUMNS["attributes_offsets"]
+            ),
+        }
+        for table, names in TABLES.items():
+            rows = self.rows[table]
+            columns = zip(*rows) if rows else [()] * len(names)
+            for name, values in zip(names, columns):
+                if name in OFFSET_COLUMNS:
+                    values = (0, *values)
+                arrays[name] = np.array(values, dtype=COLUMNS[name])
+        return arrays
+
+
+class _SnapshotDecoder:
+    """Decode a contiguous range of households, decoding each column in bulk."""
+
+    def __init__(self, snapshot: Snapshot, start: int, stop: int) -> None:
+        self.snapshot = snapshot
+        columns = snapshot.columns
+        rows = {"households": slice(start, stop)}
+        for table, child, offsets in [
+            ("households", "persons", "households_persons"),
+            ("persons", "plans", "persons_plans"),
+            ("plans", "components", "plans_components"),
+        ]:
+            parent = rows[table]
+            rows[child] = slice(
+                int(columns[offsets][parent.start]), int(columns[offsets][parent.stop])
+            )
+
+        self.locations = self.preload_locations(
+            {name: columns[name][rows[name.split("_")[0]]] for name in LOCATION_COLUMNS}
+        )
+        self.columns = {}
+        for table in ["households", "persons", "plans", "components"]:
+            for name in TABLES[table]:
+                if name in OFFSET_COLUMNS:
+                    # child offsets, relative to the first child
+                    offsets = columns[name][rows[table].start : rows[table].stop + 1]
+                    self.columns[name] = (offsets - offsets[0]).tolist()
+                else:
+                    self.columns[name] = self.decode(name, columns[name][rows[table]])
+
+    def decode(self, name: str, column: np.ndarray) -> list:
+        if name in VALUE_COLUMNS:
+            return self.snapshot.values(column)
+        if name in ATTRIBUTE_COLUMNS:
+            return self.snapshot.attributes(column)
+        if name in LOCATION_COLUMNS:
+            return self.locations[np.searchsorted(self.location_idxs, column)].tolist()
+        if name.endswith("_time"):
+            seconds = (column // 1_000_000).astype(object)
+            seconds[column == NO_TIME] = None
+            return seconds.tolist()
+        if column.dtype.kind == "f":
+            values = column.astype(object)
+            values[np.isnan(column)] = None
+            return values.tolist()
+        return column.tolist()
+
+    def preload_locations(self, columns: dict[str, np.ndarray]) -> np.ndarray:
+        """Create all locations referenced by the households, vectorising point creation.
+
+        Returns locations ordered by (sorted) location index (`location_idxs`), with a new empty
+        location for missing (-1) locations.
+        """
+        idxs = np.unique(np.concatenate([[NONE], *columns.values()]))
+        self.location_idxs = idxs
+        idxs = idxs[1:]
+        columns = self.snapshot.columns
+        xs, ys = columns["locations_x"][idxs], columns["locations_y"][idxs]
+        points = shapely.points(xs, ys).tolist()
+        missing = np.isnan(xs).tolist()
+        areas = self.snapshot.values(columns["locations_area"][idxs])
+        links = self.snapshot.values(columns["locations_link"][idxs])
+        locations = np.empty(len(idxs) + 1, dtype=object)
+        locations[0] = None
+        for i, (point, is_missing, area, link) in enumerate(zip(points, missing, areas, links), 1):
+            locations[i] = Location(loc=None if is_missing else point, link=link, area=area)
+        return locations
+
+    def households(self) -> list[core.Household]:
+        columns = self.columns
+        persons = self.persons()
+        offsets = columns["households_persons"]
+        households = []
+        for i, (hid, freq, attributes, location) in enumerate(
+            zip(*(columns[name] for name in TABLES["households"][:-1]))
+        ):
+            household = core.Household(hid, attributes=attributes, freq=freq)
+            household._location = location or Location()
+            household.people = {
+                person.pid: person for person in persons[offsets[i] : offsets[i + 1]]
+            }
+            households.append(household)
+        return households
+
+    def persons(self) -> list[core.Person]:
+        vehicles = self.snapshot.vehicles
+        columns = self.columns
+        plans = self.plans()
+        offsets = columns["persons_plans"]
+        persons = []
+        for i, (pid, freq, attributes, person_vehicles, home_location) in enumerate(
+            zip(*(columns[name] for name in TABLES["persons"][:-1]))
+        ):
+            person = core.Person(
+                pid,
+                freq=freq,
+                attributes=attributes,
+                home_location=home_location or Location(),
+                vehicles={
+                    mode: vehicles.get(v["vid"]) or _decode_vehicle(v)
+                    for mode, v in (person_vehicles or {}).items()
+                },
+            )
+            person.plan, *person.plans_non_selected = plans[offsets[i] : offsets[i + 1]]
+            persons.append(person)
+        return persons
+
+    def plans(self) -> list[Plan]:
+        columns = self.columns
+        components = self.components()
+        offsets = columns["plans_components"]
+        plans = []
+        for i, (freq, score, home_location) in enumerate(
+            zip(*(columns[name] for name in TABLES["plans"][:-1]))
+        ):
+            plan = Plan(home_location=home_location or Location(), freq=freq)
+            plan.score = score
+            plan.day = components[offsets[i] : offsets[i + 1]]
+            plans.append(plan)
+        return plans
+
+    def components(self) -> list[Union[Activity, Leg]]:
+        columns = self.columns
+        components = []
+        for (
+            kind,
+            seq,
+            name,
+            purp,
+            freq,
+            start_s,
+            end_s,
+            start_location,
+            end_location,
+            distance,
+            attributes,
+            route_kind,
+            route_attributes,
+            route_text,
+        ) in zip(*(columns[name] for name in TABLES["components"])):
+            if kind == ACTIVITY:
+                component = Activity.__new__(Activity)
+                component._act = name
+                component.location = start_location
+            else:
+                component = Leg.__new__(Leg)
+                component.purp = purp
+                component._mode = name
+                component.start_location = start_location
+                component.end_location = end_location
+                component._distance = distance
+                component.attributes = attributes or EMPTY_ATTRIBUTES
+                if route_kind == NO_ROUTE:
+                    component.route = Route()
+                elif route_kind == ROUTE_V11:
+                    component.route = LazyRouteV11(route_attributes, route_text)
+                else:
+                    component.route = LazyRoute(route_attributes, route_text)
+            component._owner = None
+            component.seq = seq
+            component.start_s = start_s
+            component.end_s = end_s
+            component._freq = freq
+            components.append(component)
+        return components
+
+
+@contextmanager
+def _gc_paused():
+    # saving and loading create many (long lived) objects, which would otherwise trigger repeated
+    # garbage collections of the whole population
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _write(path: Union[str, Path], header: dict, arrays: dict[str, np.ndarray]) -> None:
+    offset = 0
+    header["arrays"] = {}
+    for name, array in arrays.items():
+        header["arrays"][name] = {"dtype": array.dtype.str, "shape": array.shape, "offset": offset}
+        offset = _align(offset + array.nbytes)
+    header_bytes = json.dumps(header).encode()
+    data_start = _align(len(SNAPSHOT_MAGIC) + 8 + len(header_bytes))
+    with open(path, "wb") as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(np.uint64(len(header_bytes)).tobytes())
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(data_start + header["arrays"][name]["offset"])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(data_start + offset)
+
+
+def _read(path: Union[str, Path], mmap: bool) -> tuple[dict, dict[str, np.ndarray]]:
+    with open(path, "rb") as f:
+        if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+            raise PAMSnapshotError(f"{path} is not a PAM population snapshot.")
+        header_size = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+        header = json.loads(f.read(header_size))
+        if header["version"] != SNAPSHOT_VERSION:
+            raise PAMSnapshotError(
+                f"Unsupported snapshot version {header['version']}, expected {SNAPSHOT_VERSION}."
+            )
+        data_start = _align(len(SNAPSHOT_MAGIC) + 8 + header_size)
+        if not mmap:
+            f.seek(data_start)
+            data = f.read()
+
+    columns = {}
+    for name, spec in header["arrays"].items():
+        dtype, shape = np.dtype(spec["dtype"]), tuple(spec["shape"])
+        if not shape[0]:
+            columns[name] = np.zeros(shape, dtype=dtype)
+        elif mmap:
+            columns[name] = np.memmap(
+                path, dtype=dtype, mode="r", offset=data_start + spec["offset"], shape=shape
+            )
+        else:
+            columns[name] = np.frombuffer(
+                data, dtype=dtype, count=int(np.prod(shape)), offset=spec["offset"]
+            ).reshape(shape)
+    return header, columns
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _microseconds(seconds: Optional[int]) -> int:
+    # snapshots hold microseconds, plan component times are (integer) seconds
+    if seconds is None:
+        return NO_TIME
+    return seconds * 1_000_000
+
+
+def _decode_value(kind: int, text: str) -> Any:
+    if kind == STRING:
+        return text
+    if kind == INTEGER:
+        return int(text)
+    if kind == FLOAT:
+        return float(text)
+    if kind == BOOLEAN:
+        return text == "True"
+    return json.loads(text)
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(
+        f"Cannot snapshot value {value!r} of type {type(value)}, values must be json serialisable."
+    )
+
+
+def _encode_vehicle(vehicle: Vehicle) -> dict:
+    vehicle_class = "ElectricVehicle" if isinstance(vehicle, ElectricVehicle) else "Vehicle"
+    return {"class": vehicle_class, **asdict(vehicle)}
+
+
+def _decode_vehicle(data: dict) -> Vehicle:
+    data = dict(data)
+    vehicle_class = ElectricVehicle if data.pop("class") == "ElectricVehicle" else Vehicle
+    return vehicle_class(**data)
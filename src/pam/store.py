@@ -0,0 +1,1061 @@
+"""Columnar (struct-of-arrays) population store.
+
+A `PopulationStore` holds the selected plans of a population as numpy arrays rather than python objects:
+
+- `households` and `persons`: one row per household and person, with persons referencing their household.
+- `activities` and `legs`: one row per plan component, with each person's activities and legs held as
+  contiguous ranges (`persons_activities` and `persons_legs` offsets). Plans alternate activities and legs,
+  so plan order is recovered by interleaving the two ranges.
+- `locations`: one row per (shared) `Location`, with area, link and x, y coordinates.
+
+Activity types, leg purposes, modes, zones and links are categorical codes into `PopulationStore.categories`
+(-1 for None) and times are integer seconds since the start of day. Aggregate queries
+(`stats`, `activity_classes`, `mode_classes`, `mode_counts`, `legs_df` and `trips_df`) are then vectorised
+numpy operations, and the store uses a fraction of the memory of the equivalent `core.Population`.
+
+Households, persons, plans and plan components are accessed through lightweight read-only views
+(`HouseholdView`, `PersonView`, `PlanView`, `ActivityView` and `LegView`) that follow the `core` API and
+can be materialised as `core` objects (eg `PersonView.to_person`). Routes, vehicles and non-selected
+plans are not stored.
+"""
+
+from __future__ import annotations
+
+from array import array
+from collections.abc import Iterable, Iterator
+from datetime import timedelta
+from typing import Any, Optional, Union
+
+import numpy as np
+import pandas as pd
+import shapely
+from shapely.geometry import Point
+
+import pam.core as core
+from pam.activity import EMPTY_ATTRIBUTES, Activity, Leg, Plan
+from pam.location import Location
+from pam.utils import seconds_to_datetime
+from pam.variables import START_OF_DAY
+
+NONE = -1
+NO_TIME = np.iinfo(np.int32).min
+CATEGORIES = ("act", "mode", "zone", "link")
+
+COLUMNS = {
+    "households_freq": "d",
+    "persons_household": "q",
+    "persons_freq": "d",
+    "persons_home_location": "q",
+    "persons_activities": "q",
+    "persons_legs": "q",
+    "activities_seq": "q",
+    "activities_act": "i",
+    "activities_location": "q",
+    "activities_start_time": "i",
+    "activities_end_time": "i",
+    "activities_freq": "d",
+    "legs_seq": "q",
+    "legs_mode": "i",
+    "legs_purp": "i",
+    "legs_start_location": "q",
+    "legs_end_location": "q",
+    "legs_start_time": "i",
+    "legs_end_time": "i",
+    "legs_freq": "d",
+    "legs_distance": "d",
+    "locations_area": "i",
+    "locations_link": "i",
+    "locations_x": "d",
+    "locations_y": "d",
+}
+
+
+class PopulationStore:
+    """Columnar store of the selected plans of a population, see `pam.store`.
+
+    Build stores with `PopulationStore.from_population` (or `core.Population.to_store`),
+    `PopulationStore.from_persons` or `pam.operations.convert.matsim_to_store`.
+
+    Args:
+        columns (dict[str, np.ndarray]): store arrays, keyed as `pam.store.COLUMNS`.
+        categories (dict[str, list]): categorical values of activity types (and leg purposes), modes, zones and links.
+        hids (list): household ids.
+        pids (list): person ids.
+        household_attributes (list[dict]): household attributes.
+        person_attributes (list[dict]): person attributes.
+        leg_attributes (list[dict]): leg attributes.
+    """
+
+    def __init__(
+        self,
+        columns: dict[str, np.ndarray],
+        categories: dict[str, list],
+        hids: list,
+        pids: list,
+        household_attributes: list[dict],
+        person_attributes: list[dict],
+        leg_attributes: list[dict],
+    ) -> None:
+        self.columns = columns
+        self.categories = categories
+        self.hids = hids
+        self.pids = pids
+        self.household_attributes = household_attributes
+        self.person_attributes = person_attributes
+        self.leg_attributes = leg_attributes
+        self._household_index = None
+        self._household_persons = None
+
+    @classmethod
+    def from_population(cls, population: core.Population) -> PopulationStore:
+        """Build a store from the selected plans of a population.
+
+        Args:
+            population (core.Population):
+
+        Returns:
+            PopulationStore:
+        """
+        builder = _StoreBuilder()
+        for _, household in population:
+            builder.add_household(household)
+        return builder.store()
+
+    @classmethod
+    def from_persons(
+        cls, persons: Iterable[core.Person], household_key: Optional[str] = None
+    ) -> PopulationStore:
+        """Build a store from a (streamed) iterable of persons, eg from `pam.read.stream_matsim_persons`.
+
+        Args:
+            persons (Iterable[core.Person]):
+            household_key (Optional[str], optional): Person attribute used as household id, if not given persons are given their own household. Defaults to None.
+
+        Returns:
+            PopulationStore:
+        """
+        builder = _StoreBuilder()
+        for person in persons:
+            hid = person.pid
+            if household_key is not None:
+                hid = person.attributes.get(household_key, hid)
+            builder.add_person(person, builder.household(hid))
+        return builder.store()
+
+    def to_population(self, name: Optional[str] = None) -> core.Population:
+        """Materialise the store as a population.
+
+        Args:
+            name (Optional[str], optional): population name. Defaults to None.
+
+        Returns:
+            core.Population:
+        """
+        population = core.Population(name=name)
+        locations = {}
+        for _, household in self:
+            population.add(household.to_household(locations))
+        return population
+
+    def __len__(self) -> int:
+        return len(self.pids)
+
+    def __iter__(self) -> Iterator[tuple[Any, HouseholdView]]:
+        for idx, hid in enumerate(self.hids):
+            yield hid, HouseholdView(self, idx)
+
+    def __getitem__(self, hid) -> HouseholdView:
+        return HouseholdView(self, self.household_index[hid])
+
+    def __contains__(self, hid) -> bool:
+        return hid in self.household_index
+
+    def get(self, hid, default=None) -> Optional[HouseholdView]:
+        if hid not in self.household_index:
+            return default
+        return self[hid]
+
+    @property
+    def household_index(self) -> dict[Any, int]:
+        """Mapping of household ids to household index."""
+        if self._household_index is None:
+            self._household_index = {hid: idx for idx, hid in enumerate(self.hids)}
+        return self._household_index
+
+    def household_persons(self, idx: int) -> np.ndarray:
+        """Person indices of a household, by household index."""
+        if self._household_persons is None:
+            households = self.columns["persons_household"]
+            order = np.argsort(households, kind="stable")
+            offsets = np.searchsorted(households[order], np.arange(len(self.hids) + 1))
+            self._household_persons = (order, offsets)
+        order, offsets = self._household_persons
+        return order[offsets[idx] : offsets[idx + 1]]
+
+    def people(self) -> Iterator[tuple[Any, Any, PersonView]]:
+        """Iterator for people in the store, returns hid, pid and `PersonView`."""
+        households = self.columns["persons_household"]
+        for idx, pid in enumerate(self.pids):
+            yield self.hids[households[idx]], pid, PersonView(self, idx)
+
+    def plans(self) -> Iterator[PlanView]:
+        """Iterator for (selected) plans in the store."""
+        for idx in range(len(self)):
+            yield PlanView(self, idx)
+
+    @property
+    def num_households(self) -> int:
+        return len(self.hids)
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "num_households": len(self.hids),
+            "num_people": len(self.pids),
+            "num_activities": len(self.columns["activities_act"]),
+            "num_legs": len(self.columns["legs_mode"]),
+        }
+
+    @property
+    def activity_classes(self) -> set:
+        return self._classes("act", self.columns["activities_act"])
+
+    @property
+    def mode_classes(self) -> set:
+        return self._classes("mode", self.columns["legs_mode"])
+
+    @property
+    def subpopulations(self) -> set:
+        return {attributes.get("subpopulation") for attributes in self.person_attributes}
+
+    def _classes(self, category: str, codes: np.ndarray) -> set:
+        return set(self.values(category)[np.unique(codes)].tolist())
+
+    def values(self, category: str) -> np.ndarray:
+        """Categorical values as an object array, indexable by (-1 for None) codes.
+
+        Args:
+            category (str): one of "act", "mode", "zone" or "link".
+
+        Returns:
+            np.ndarray:
+        """
+        return _objects([*self.categories[category], None])
+
+    def location(self, idx: int) -> Location:
+        """Create the `Location` of a location index."""
+        return self.locations([idx])[0]
+
+    def locations(self, idxs: np.ndarray) -> list[Location]:
+        """Create the `Location` of each location index, vectorising point creation."""
+        columns = self.columns
+        idxs = np.asarray(idxs, dtype=np.int64)
+        xs = np.append(columns["locations_x"], np.nan)[idxs]
+        ys = np.append(columns["locations_y"], np.nan)[idxs]
+        points = shapely.points(xs, ys).tolist()
+        missing = np.isnan(xs).tolist()
+        areas = self.values("zone")[np.append(columns["locations_area"], NONE)[idxs]].tolist()
+        links = self.values("link")[np.append(columns["locations_link"], NONE)[idxs]].tolist()
+        return [
+            Location(loc=None if is_missing else point, link=link, area=area)
+            for point, is_missing, area, link in zip(points, missing, areas, links)
+        ]
+
+    def person_freqs(self) -> np.ndarray:
+        """Person frequencies (as `core.Person.freq`), the person freq, else the average freq of their legs.
+
+        Returns:
+            np.ndarray: frequencies, nan where unknown.
+        """
+        columns = self.columns
+        freqs = columns["persons_freq"].copy()
+        offsets = columns["persons_legs"]
+        counts = np.diff(offsets)
+        leg_freqs = columns["legs_freq"]
+        sums = np.zeros(len(freqs))
+        if len(leg_freqs):
+            # reduceat returns the element at the offset for empty ranges, so these are masked below
+            sums = np.add.reduceat(leg_freqs, np.minimum(offsets[:-1], len(leg_freqs) - 1))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            av_leg_freqs = np.where(counts > 0, sums / counts, np.nan)
+        use_legs = np.isnan(freqs) | (freqs == 0)
+        freqs[use_legs] = av_leg_freqs[use_legs]
+        return freqs
+
+    def home_locations(self) -> np.ndarray:
+        """Person home location indices (as `core.Person.home`).
+
+        The person home location if it exists, else the location of their first home activity,
+        else the location of their first activity.
+
+        Returns:
+            np.ndarray: location indices, -1 for persons without a home location or activities.
+        """
+        columns = self.columns
+        homes = columns["persons_home_location"].copy()
+        offsets = columns["persons_activities"]
+        exists = self._location_exists()
+        missing = ~np.append(exists, False)[homes]
+        acts = self.values("act")
+        is_home = np.array(
+            [act is not None and str(act).lower()[:4] == "home" for act in acts], dtype=bool
+        )[columns["activities_act"]]
+        counts = np.diff(offsets)
+        owners = np.repeat(np.arange(len(counts)), counts)
+        n_acts = len(owners)
+        first_home = np.full(len(counts), n_acts, dtype=np.int64)
+        home_acts = np.flatnonzero(is_home)
+        np.minimum.at(first_home, owners[home_acts], home_acts)
+        first_home[first_home == n_acts] = NONE
+        first_act = np.where(counts > 0, offsets[:-1], NONE)
+        fallback = np.where(first_home != NONE, first_home, first_act)
+        fallback_locations = np.where(
+            fallback != NONE, np.append(columns["activities_location"], NONE)[fallback], NONE
+        )
+        homes[missing] = fallback_locations[missing]
+        return homes
+
+    def _location_exists(self) -> np.ndarray:
+        """Locations with a (truthy) area, link or loc, as `Location.exists`."""
+        columns = self.columns
+        zones = np.array([bool(zone) for zone in self.categories["zone"]] + [False], dtype=bool)
+        links = np.array([bool(link) for link in self.categories["link"]] + [False], dtype=bool)
+        return (
+            zones[columns["locations_area"]]
+            | links[columns["locations_link"]]
+            | ~np.isnan(columns["locations_x"])
+        )
+
+    def mode_counts(self, weighted: bool = False) -> pd.Series:
+        """Count legs by mode.
+
+        Args:
+            weighted (bool, optional): weight legs by person freq. Defaults to False.
+
+        Returns:
+            pd.Series: leg counts indexed by mode.
+        """
+        codes = self.columns["legs_mode"]
+        weights = None
+        if weighted:
+            leg_persons = np.repeat(np.arange(len(self)), np.diff(self.columns["persons_legs"]))
+            weights = self.person_freqs()[leg_persons]
+        counts = np.bincount(codes + 1, weights=weights, minlength=len(self.categories["mode"]) + 1)
+        modes = [None, *self.categories["mode"]]
+        series = pd.Series(counts, index=pd.Index(modes, name="mode"), name="legs")
+        return series[series > 0]
+
+    def legs_df(self) -> pd.DataFrame:
+        """Extract tabular record of legs, as `core.Population.legs_df`.
+
+        Returns:
+            pd.DataFrame: record of legs.
+        """
+        columns = self.columns
+        offsets = columns["persons_legs"]
+        owners = np.repeat(np.arange(len(self)), np.diff(offsets))
+        seq = np.arange(len(owners)) - offsets[:-1][owners]
+        return self._travel_df(
+            owners=owners,
+            seq=seq,
+            start_locations=columns["legs_start_location"],
+            end_locations=columns["legs_end_location"],
+            purps=self.values("act")[columns["legs_purp"]],
+            modes=self.values("mode")[columns["legs_mode"]],
+            start_times=columns["legs_start_time"],
+            end_times=columns["legs_end_time"],
+        )
+
+    def trips_df(self, ignore: list[str] = ["pt interaction", "pt_interaction"]) -> pd.DataFrame:
+        """Extract tabular record of trips, as `core.Population.trips_df`.
+
+        Legs between activities in `ignore` are combined into trips with the mode of greatest total
+        distance, see `pam.activity.Plan.trips`.
+
+        Args:
+            ignore (list[str], optional): activities to remove. Defaults to ["pt interaction", "pt_interaction"].
+
+        Returns:
+            pd.DataFrame: record of trips.
+        """
+        columns = self.columns
+        act_offsets = columns["persons_activities"]
+        leg_offsets = columns["persons_legs"]
+        n_acts = len(columns["activities_act"])
+        act_owners = np.repeat(np.arange(len(self)), np.diff(act_offsets))
+        first = np.zeros(n_acts, dtype=bool)
+        first[act_offsets[:-1][np.diff(act_offsets) > 0]] = True
+        ignored = np.append(np.isin(self.values("act"), ignore)[:-1], False)
+        anchor = ~ignored[columns["activities_act"]] & ~first
+
+        # each leg runs from activity `before` to activity `before + 1`
+        leg_owners = np.repeat(np.arange(len(self)), np.diff(leg_offsets))
+        leg_positions = np.arange(len(leg_owners)) - leg_offsets[:-1][leg_owners]
+        before = act_offsets[:-1][leg_owners] + leg_positions
+        positions = np.arange(n_acts)
+        starts = np.maximum.accumulate(np.where(anchor | first, positions, 0))[before]
+        ends = np.minimum.accumulate(np.where(anchor, positions, n_acts)[::-1])[::-1]
+        ends = np.append(ends, n_acts)[before + 1]
+        # legs after the last trip end of a plan are not part of a trip
+        complete = ends < act_offsets[1:][leg_owners]
+
+        distances = self._leg_distances()
+        legs = pd.DataFrame(
+            {
+                "trip": ends[complete],
+                "mode": columns["legs_mode"][complete],
+                "distance": distances[complete],
+                "order": np.flatnonzero(complete),
+            }
+        )
+        modes = (
+            legs.groupby(["trip", "mode"], sort=False)
+            .agg(distance=("distance", "sum"), order=("order", "min"))
+            .reset_index()
+            .sort_values(["trip", "distance", "order"], ascending=[True, False, True])
+            .drop_duplicates("trip")
+        )
+        trip_ends = modes["trip"].to_numpy()
+        trip_starts = (
+            pd.Series(starts[complete]).groupby(ends[complete]).first().loc[trip_ends].to_numpy()
+        )
+        owners = act_owners[trip_ends]
+        seq = pd.Series(owners).groupby(owners).cumcount().to_numpy()
+        return self._travel_df(
+            owners=owners,
+            seq=seq,
+            start_locations=columns["activities_location"][trip_starts],
+            end_locations=columns["activities_location"][trip_ends],
+            purps=self.values("act")[columns["activities_act"][trip_ends]],
+            modes=self.values("mode")[modes["mode"].to_numpy()],
+            start_times=columns["activities_end_time"][trip_starts],
+            end_times=columns["activities_start_time"][trip_ends],
+        )
+
+    def _leg_distances(self) -> np.ndarray:
+        """Leg distances (as `Leg.distance`), the leg distance, else the euclidean distance in m."""
+        columns = self.columns
+        distances = columns["legs_distance"].copy()
+        missing = np.isnan(distances)
+        distances[missing] = self._euclidean_distances(
+            columns["legs_start_location"][missing], columns["legs_end_location"][missing]
+        )
+        return distances
+
+    def _euclidean_distances(self, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """Euclidean distances between location indices, in m."""
+        xs = np.append(self.columns["locations_x"], np.nan)
+        ys = np.append(self.columns["locations_y"], np.nan)
+        return np.hypot(xs[ends] - xs[starts], ys[ends] - ys[starts])
+
+    def _travel_df(
+        self,
+        owners: np.ndarray,
+        seq: np.ndarray,
+        start_locations: np.ndarray,
+        end_locations: np.ndarray,
+        purps: np.ndarray,
+        modes: np.ndarray,
+        start_times: np.ndarray,
+        end_times: np.ndarray,
+    ) -> pd.DataFrame:
+        columns = self.columns
+        zones = self.values("zone")
+        areas = np.append(columns["locations_area"], NONE)
+        # locations are created once per (used) location index and shared between rows
+        used, inverse = np.unique(
+            np.concatenate([start_locations, end_locations]), return_inverse=True
+        )
+        locations = _objects(self.locations(used))
+        home_used, home_inverse = np.unique(self.home_locations(), return_inverse=True)
+        home_locations = _objects(self.locations(home_used))
+        timed = (start_times != NO_TIME) & (end_times != NO_TIME)
+        starts = pd.to_timedelta(np.where(start_times == NO_TIME, np.nan, start_times), unit="s")
+        ends = pd.to_timedelta(np.where(end_times == NO_TIME, np.nan, end_times), unit="s")
+        starts, ends = starts + START_OF_DAY, ends + START_OF_DAY
+        df = pd.DataFrame(
+            {
+                "pid": _objects(self.pids)[owners],
+                "hid": _objects(self.hids)[columns["persons_household"][owners]],
+                "hzone": home_locations[home_inverse][owners],
+                "ozone": zones[areas[start_locations]],
+                "dzone": zones[areas[end_locations]],
+                "oloc": locations[inverse[: len(start_locations)]],
+                "dloc": locations[inverse[len(start_locations) :]],
+                "seq": seq,
+                "purp": purps,
+                "mode": modes,
+                "tst": starts.time,
+                "tet": ends.time,
+                # duration in minutes
+                "duration": np.where(timed, end_times - start_times, np.nan) / 60,
+                "euclidean_distance": self._euclidean_distances(start_locations, end_locations)
+                / 1000,
+                "freq": self.person_freqs()[owners],
+            }
+        )
+        # add person attributes
+        attributes = pd.DataFrame(self.person_attributes)
+        for name, values in attributes.items():
+            df[name] = values.to_numpy()[owners]
+        core.Population.add_fields(df)
+        return df
+
+
+class HouseholdView:
+    """Read-only view of a household in a `PopulationStore`, following the `core.Household` API."""
+
+    __slots__ = ("store", "idx")
+
+    def __init__(self, store: PopulationStore, idx: int) -> None:
+        self.store = store
+        self.idx = idx
+
+    @property
+    def hid(self):
+        return self.store.hids[self.idx]
+
+    @property
+    def hh_freq(self) -> Optional[float]:
+        return _value(self.store.columns["households_freq"][self.idx])
+
+    @property
+    def attributes(self) -> dict:
+        return self.store.household_attributes[self.idx]
+
+    @property
+    def people(self) -> dict[Any, PersonView]:
+        return {pid: person for pid, person in self}
+
+    def __iter__(self) -> Iterator[tuple[Any, PersonView]]:
+        for idx in self.store.household_persons(self.idx).tolist():
+            yield self.store.pids[idx], PersonView(self.store, idx)
+
+    def __getitem__(self, pid) -> PersonView:
+        return self.people[pid]
+
+    def get(self, pid, default=None) -> Optional[PersonView]:
+        return self.people.get(pid, default)
+
+    def __len__(self) -> int:
+        return len(self.store.household_persons(self.idx))
+
+    def to_household(self, locations: Optional[dict] = None) -> core.Household:
+        """Materialise the household.
+
+        Args:
+            locations (Optional[dict], optional): cache of created locations, by location index, shared between households. Defaults to None.
+
+        Returns:
+            core.Household:
+        """
+        household = core.Household(self.hid, attributes=dict(self.attributes), freq=self.hh_freq)
+        for _, person in self:
+            household.add(person.to_person(locations))
+        return household
+
+    def __str__(self) -> str:
+        return f"HouseholdView: {self.hid}"
+
+
+class PersonView:
+    """Read-only view of a person (and their selected plan) in a `PopulationStore`, following the `core.Person` API."""
+
+    __slots__ = ("store", "idx")
+
+    def __init__(self, store: PopulationStore, idx: int) -> None:
+        self.store = store
+        self.idx = idx
+
+    @property
+    def pid(self):
+        return self.store.pids[self.idx]
+
+    @property
+    def hid(self):
+        return self.store.hids[self.store.columns["persons_household"][self.idx]]
+
+    @property
+    def person_freq(self) -> Optional[float]:
+        return _value(self.store.columns["persons_freq"][self.idx])
+
+    @property
+    def freq(self) -> Optional[float]:
+        if self.person_freq:
+            return self.person_freq
+        freqs = [leg.freq for leg in self.legs]
+        if not freqs or None in freqs:
+            return None
+        return sum(freqs) / len(freqs)
+
+    @property
+    def attributes(self) -> dict:
+        return self.store.person_attributes[self.idx]
+
+    @property
+    def subpopulation(self):
+        return self.attributes.get("subpopulation")
+
+    @property
+    def home_location(self) -> Location:
+        return self.store.location(int(self.store.columns["persons_home_location"][self.idx]))
+
+    @property
+    def home(self) -> Location:
+        home = self.home_location
+        if home.exists:
+            return home
+        return self.plan.home
+
+    @property
+    def plan(self) -> PlanView:
+        return PlanView(self.store, self.idx)
+
+    @property
+    def activities(self) -> Iterator[ActivityView]:
+        return self.plan.activities
+
+    @property
+    def legs(self) -> Iterator[LegView]:
+        return self.plan.legs
+
+    @property
+    def num_activities(self) -> int:
+        return self.plan.num_activities
+
+    @property
+    def num_legs(self) -> int:
+        return self.plan.num_legs
+
+    @property
+    def activity_classes(self) -> set:
+        return self.plan.activity_classes
+
+    @property
+    def mode_classes(self) -> set:
+        return self.plan.mode_classes
+
+    def __iter__(self) -> Iterator[Union[ActivityView, LegView]]:
+        return iter(self.plan)
+
+    def __len__(self) -> int:
+        return len(self.plan)
+
+    def __getitem__(self, val):
+        return self.plan[val]
+
+    def to_person(self, locations: Optional[dict] = None) -> core.Person:
+        """Materialise the person and their plan.
+
+        Args:
+            locations (Optional[dict], optional): cache of created locations, by location index, shared between persons. Defaults to None.
+
+        Returns:
+            core.Person:
+        """
+        if locations is None:
+            locations = {}
+        idx = int(self.store.columns["persons_home_location"][self.idx])
+        person = core.Person(
+            self.pid,
+            freq=self.person_freq,
+            attributes=dict(self.attributes),
+            home_location=_location(self.store, idx, locations),
+        )
+        person.plan.day = [component.to_component(locations) for component in self.plan]
+        return person
+
+    def __str__(self) -> str:
+        return f"PersonView: {self.pid}"
+
+
+class PlanView:
+    """Read-only view of a person's selected plan in a `PopulationStore`, following the `pam.activity.Plan` API."""
+
+    __slots__ = ("store", "idx")
+
+    def __init__(self, store: PopulationStore, idx: int) -> None:
+        self.store = store
+        self.idx = idx
+
+    def _range(self, name: str) -> range:
+        offsets = self.store.columns[name]
+        return range(int(offsets[self.idx]), int(offsets[self.idx + 1]))
+
+    @property
+    def activities(self) -> Iterator[ActivityView]:
+        for idx in self._range("persons_activities"):
+            yield ActivityView(self.store, idx)
+
+    @property
+    def legs(self) -> Iterator[LegView]:
+        for idx in self._range("persons_legs"):
+            yield LegView(self.store, idx)
+
+    @property
+    def num_activities(self) -> int:
+        return len(self._range("persons_activities"))
+
+    @property
+    def num_legs(self) -> int:
+        return len(self._range("persons_legs"))
+
+    @property
+    def day(self) -> list[Union[ActivityView, LegView]]:
+        return list(self)
+
+    def __iter__(self) -> Iterator[Union[ActivityView, LegView]]:
+        legs = self.legs
+        for act in self.activities:
+            yield act
+            leg = next(legs, None)
+            if leg is not None:
+                yield leg
+
+    def __len__(self) -> int:
+        return self.num_activities + self.num_legs
+
+    def __getitem__(self, val):
+        return self.day[val]
+
+    def __bool__(self) -> bool:
+        return bool(len(self))
+
+    @property
+    def home_location(self) -> Location:
+        return self.store.location(int(self.store.columns["persons_home_location"][self.idx]))
+
+    @property
+    def home(self) -> Optional[Location]:
+        home = self.home_location
+        if home.exists:
+            return home
+        activities = list(self.activities)
+        for act in activities:
+            if act.act is not None and str(act.act).lower()[:4] == "home":
+                return act.location
+        return activities[0].location
+
+    @property
+    def activity_classes(self) -> set:
+        codes = self.store.columns["activities_act"][
+            slice(*self.store.columns["persons_activities"][self.idx : self.idx + 2])
+        ]
+        return self.store._classes("act", codes)
+
+    @property
+    def mode_classes(self) -> set:
+        codes = self.store.columns["legs_mode"][
+            slice(*self.store.columns["persons_legs"][self.idx : self.idx + 2])
+        ]
+        return self.store._classes("mode", codes)
+
+    def to_plan(self) -> Plan:
+        """Materialise the plan, with its own locations."""
+        plan = Plan(home_location=self.home_location)
+        locations = {}
+        plan.day = [component.to_component(locations) for component in self]
+        return plan
+
+
+class _ComponentView:
+    __slots__ = ("store", "idx")
+    prefix = ""
+
+    def __init__(self, store: PopulationStore, idx: int) -> None:
+        self.store = store
+        self.idx = idx
+
+    def _column(self, name: str):
+        return self.store.columns[self.prefix + name][self.idx]
+
+    @property
+    def seq(self) -> Optional[int]:
+        seq = int(self._column("seq"))
+        return None if seq == NONE else seq
+
+    @property
+    def freq(self) -> Optional[float]:
+        return _value(self._column("freq"))
+
+    @property
+    def start_s(self) -> Optional[int]:
+        seconds = self._column("start_time")
+        return None if seconds == NO_TIME else int(seconds)
+
+    @property
+    def end_s(self) -> Optional[int]:
+        seconds = self._column("end_time")
+        return None if seconds == NO_TIME else int(seconds)
+
+    @property
+    def start_time(self):
+        return _datetime(self._column("start_time"))
+
+    @property
+    def end_time(self):
+        return _datetime(self._column("end_time"))
+
+    @property
+    def duration(self) -> timedelta:
+        return self.end_time - self.start_time
+
+    def _category(self, category: str, code: int):
+        if code == NONE:
+            return None
+        return self.store.categories[category][code]
+
+
+class ActivityView(_ComponentView):
+    """Read-only view of an activity in a `PopulationStore`, following the `pam.activity.Activity` API."""
+
+    __slots__ = ()
+    prefix = "activities_"
+
+    @property
+    def act(self):
+        return self._category("act", self._column("act"))
+
+    @property
+    def location(self) -> Location:
+        return self.store.location(int(self._column("location")))
+
+    def to_component(self, locations: Optional[dict] = None) -> Activity:
+        """Materialise the activity.
+
+        Args:
+            locations (Optional[dict], optional): cache of created locations, by location index. Defaults to None.
+
+        Returns:
+            Activity:
+        """
+        activity = Activity(
+            seq=self.seq,
+            act=self.act,
+            start_time=self.start_time,
+            end_time=self.end_time,
+            freq=self.freq,
+        )
+        activity.location = _location(self.store, int(self._column("location")), locations)
+        return activity
+
+    def __str__(self) -> str:
+        return f"ActivityView(act:{self.act}, location:{self.location})"
+
+
+class LegView(_ComponentView):
+    """Read-only view of a leg in a `PopulationStore`, following the `pam.activity.Leg` API."""
+
+    __slots__ = ()
+    prefix = "legs_"
+
+    @property
+    def mode(self):
+        return self._category("mode", self._column("mode"))
+
+    @property
+    def purp(self):
+        return self._category("act", self._column("purp"))
+
+    @property
+    def start_location(self) -> Location:
+        return self.store.location(int(self._column("start_location")))
+
+    @property
+    def end_location(self) -> Location:
+        return self.store.location(int(self._column("end_location")))
+
+    @property
+    def attributes(self) -> dict:
+        return self.store.leg_attributes[self.idx]
+
+    @property
+    def euclidean_distance(self) -> float:
+        # in km, as Leg.euclidean_distance
+        starts = np.array([self._column("start_location")])
+        ends = np.array([self._column("end_location")])
+        return float(self.store._euclidean_distances(starts, ends)[0]) / 1000
+
+    @property
+    def distance(self) -> float:
+        distance = _value(self._column("distance"))
+        if distance is not None:
+            return distance
+        return self.euclidean_distance * 1000
+
+    def to_component(self, locations: Optional[dict] = None) -> Leg:
+        """Materialise the leg (without a route).
+
+        Args:
+            locations (Optional[dict], optional): cache of created locations, by location index. Defaults to None.
+
+        Returns:
+            Leg:
+        """
+        leg = Leg(
+            seq=self.seq,
+            mode=self.mode,
+            start_time=self.start_time,
+            end_time=self.end_time,
+            distance=_value(self._column("distance")),
+            purp=self.purp,
+            freq=self.freq,
+            attributes=dict(self.attributes) or None,
+        )
+        leg.start_location = _location(self.store, int(self._column("start_location")), locations)
+        leg.end_location = _location(self.store, int(self._column("end_location")), locations)
+        return leg
+
+    def __str__(self) -> str:
+        return f"LegView(mode:{self.mode}, area:{self.start_location} --> {self.end_location})"
+
+
+class _StoreBuilder:
+    """Accumulate store columns in typed arrays, so that building a store holds no per component objects."""
+
+    def __init__(self) -> None:
+        self.columns = {name: array(typecode) for name, typecode in COLUMNS.items()}
+        self.columns["persons_activities"].append(0)
+        self.columns["persons_legs"].append(0)
+        self.categories = {category: {} for category in CATEGORIES}
+        # locations are shared between a person and their plan components, so are indexed by id,
+        # this index is per person as streamed persons (and their location ids) do not outlive them
+        self.locations = {}
+        self.n_locations = 0
+        self.households = {}
+        self.hids = []
+        self.pids = []
+        self.household_attributes = []
+        self.person_attributes = []
+        self.leg_attributes = []
+
+    def code(self, category: str, value: Any) -> int:
+        if value is None:
+            return NONE
+        codes = self.categories[category]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+        return code
+
+    def location(self, location: Optional[Location]) -> int:
+        if location is None:
+            return NONE
+        idx = self.locations.get(id(location))
+        if idx is not None:
+            return idx
+        idx = self.locations[id(location)] = self.n_locations
+        self.n_locations += 1
+        loc = location.loc
+        if loc is not None and not isinstance(loc, Point):
+            raise TypeError(f"Cannot store location of type {type(loc)}, expected Point.")
+        columns = self.columns
+        columns["locations_area"].append(self.code("zone", location.area))
+        columns["locations_link"].append(self.code("link", location.link))
+        columns["locations_x"].append(np.nan if loc is None else loc.x)
+        columns["locations_y"].append(np.nan if loc is None else loc.y)
+        return idx
+
+    def household(self, hid: Any, freq: Optional[float] = None, attributes: dict = {}) -> int:
+        idx = self.households.get(hid)
+        if idx is None:
+            idx = self.households[hid] = len(self.hids)
+            self.hids.append(hid)
+            self.columns["households_freq"].append(_float(freq))
+            self.household_attributes.append(dict(attributes))
+        return idx
+
+    def add_household(self, household: core.Household) -> None:
+        idx = self.household(household.hid, household.hh_freq, household.attributes)
+        for _, person in household:
+            self.add_person(person, idx)
+
+    def add_person(self, person: core.Person, household: int) -> None:
+        columns = self.columns
+        self.locations.clear()
+        self.pids.append(person.pid)
+        self.person_attributes.append(dict(person.attributes))
+        columns["persons_household"].append(household)
+        columns["persons_freq"].append(_float(person.person_freq))
+        columns["persons_home_location"].append(self.location(person.home_location))
+        for component in person.plan:
+            if isinstance(component, Activity):
+                self.add_activity(component)
+            else:
+                self.add_leg(component)
+        columns["persons_activities"].append(len(columns["activities_act"]))
+        columns["persons_legs"].append(len(columns["legs_mode"]))
+
+    def add_activity(self, act: Activity) -> None:
+        columns = self.columns
+        columns["activities_seq"].append(NONE if act.seq is None else act.seq)
+        columns["activities_act"].append(self.code("act", act.act))
+        columns["activities_location"].append(self.location(act.location))
+        columns["activities_start_time"].append(_seconds(act.start_s))
+        columns["activities_end_time"].append(_seconds(act.end_s))
+        columns["activities_freq"].append(_float(act.freq))
+
+    def add_leg(self, leg: Leg) -> None:
+        columns = self.columns
+        columns["legs_seq"].append(NONE if leg.seq is None else leg.seq)
+        columns["legs_mode"].append(self.code("mode", leg.mode))
+        columns["legs_purp"].append(self.code("act", leg.purp))
+        columns["legs_start_location"].append(self.location(leg.start_location))
+        columns["legs_end_location"].append(self.location(leg.end_location))
+        columns["legs_start_time"].append(_seconds(leg.start_s))
+        columns["legs_end_time"].append(_seconds(leg.end_s))
+        columns["legs_freq"].append(_float(leg.freq))
+        columns["legs_distance"].append(_float(leg._distance))
+        attributes = leg.attributes
+        self.leg_attributes.append(dict(attributes) if attributes else EMPTY_ATTRIBUTES)
+
+    def store(self) -> PopulationStore:
+        columns = {}
+        for name in list(self.columns):
+            typed = self.columns.pop(name)
+            columns[name] = np.frombuffer(typed, dtype=typed.typecode)
+        return PopulationStore(
+            columns=columns,
+            categories={category: list(codes) for category, codes in self.categories.items()},
+            hids=self.hids,
+            pids=self.pids,
+            household_attributes=self.household_attributes,
+            person_attributes=self.person_attributes,
+            leg_attributes=self.leg_attributes,
+        )
+
+
+def _location(store: PopulationStore, idx: int, locations: Optional[dict]) -> Location:
+    """Create the location of a location index, sharing locations through the `locations` cache."""
+    if locations is None:
+        return store.location(idx)
+    if idx == NONE:
+        return Location()
+    location = locations.get(idx)
+    if location is None:
+        location = locations[idx] = store.location(idx)
+    return location
+
+
+def _objects(values: list) -> np.ndarray:
+    objects = np.empty(len(values), dtype=object)
+    objects[:] = values
+    return objects
+
+
+def _float(value: Optional[float]) -> float:
+    return np.nan if value is None else float(value)
+
+
+def _value(value: float) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
+
+
+def _seconds(seconds: Optional[int]) -> int:
+    return NO_TIME if seconds is None else seconds
+
+
+def _datetime(seconds: int):
+    if seconds == NO_TIME:
+        return None
+    return seconds_to_datetime(int(seconds))
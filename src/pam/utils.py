@@ -1,9 +1,13 @@
 import gzip
 import os
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from functools import lru_cache
 from io import BytesIO
 from pathlib import Path
-from typing import Generator, Union
+from typing import BinaryIO, Generator, Iterator, Optional, Union
 
 import numpy as np
 from lxml import etree as et
@@ -14,6 +18,15 @@ from pam.variables import START_OF_DAY
 
 # according to gzip manpage
 DEFAULT_GZIP_COMPRESSION = 6
+# threads used to compress gzip outputs, see ParallelGzipFile
+DEFAULT_GZIP_WORKERS = min(4, os.cpu_count() or 1)
+GZIP_BLOCK_SIZE = 2**20
+GZIP_MAGIC = b"\x1f\x8b"
+# bound on the number of distinct MATSim time strings cached, ie more than every second of two days
+TIME_CACHE_SIZE = 2**18
+# characters escaped by libxml2 when serialising attribute values and text
+ATTRIBUTE_ESCAPES = re.compile(r'[&<>"\n\r\t]')
+TEXT_ESCAPES = re.compile(r"[&<>\r]")
 
 
 def parse_time(time: Union[int, str]) -> datetime:
@@ -132,6 +145,64 @@ def dt_to_s(dt: datetime) -> int:
     return (((dt.hour * 60) + dt.minute) * 60) + dt.second
 
 
+@lru_cache(maxsize=TIME_CACHE_SIZE)
+def datetime_to_seconds(dt: datetime) -> int:
+    """Convert datetime to whole seconds since the start of day, including any days.
+
+    Used for plan component times, which are held as integer seconds. Sub-second precision is
+    dropped (rounding down). Results are cached, so that components with the same time share an int.
+
+    Args:
+        dt (datetime): datetime
+
+    Returns:
+        int: seconds since `pam.variables.START_OF_DAY`.
+    """
+    return (dt - START_OF_DAY) // timedelta(seconds=1)
+
+
+@lru_cache(maxsize=TIME_CACHE_SIZE)
+def seconds_to_datetime(seconds: int) -> datetime:
+    """Convert seconds since the start of day to datetime.
+
+    Results are cached, so that components with the same time share a (immutable) datetime.
+
+    Args:
+        seconds (int): seconds since `pam.variables.START_OF_DAY`.
+
+    Returns:
+        datetime: datetime
+    """
+    return START_OF_DAY + timedelta(seconds=seconds)
+
+
+def seconds_to_matsim_time(seconds: int) -> str:
+    """Convert seconds since the start of day to matsim string format (`hh:mm:ss`).
+
+    Args:
+        seconds (int): seconds since `pam.variables.START_OF_DAY`.
+
+    Returns:
+        str: MATSim time string (`hh:mm:ss`)
+    """
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{int(hours):02}:{int(minutes):02}:{int(seconds):02}"
+
+
+@lru_cache(maxsize=TIME_CACHE_SIZE)
+def matsim_time_to_seconds(mt: str) -> int:
+    """Parse MATSim time string (`hh:mm:ss` or `hh:mm`) into seconds since the start of day.
+
+    Args:
+        mt (str): MATSim time string (`hh:mm:ss` or `hh:mm`)
+
+    Returns:
+        int: seconds
+    """
+    return td_to_s(safe_strpdelta(mt))
+
+
 def td_to_s(td: timedelta) -> int:
     """Convert timedelta to seconds since start of day.
 
@@ -144,10 +215,12 @@ def td_to_s(td: timedelta) -> int:
     return (td.days * 86400) + td.seconds
 
 
+@lru_cache(maxsize=TIME_CACHE_SIZE)
 def safe_strptime(mt: str) -> datetime:
     """Safely parse string into datetime.
 
     Can cope with time strings in format `hh:mm:ss` if hh > 24 then adds a day.
+    Results are cached, as plans typically repeat a small set of distinct times many times over.
 
     Args:
         mt (str): MATSim time string (`hh:mm:ss` or `hh:mm`)
@@ -158,10 +231,11 @@ def safe_strptime(mt: str) -> datetime:
     return START_OF_DAY + safe_strpdelta(mt)
 
 
+@lru_cache(maxsize=TIME_CACHE_SIZE)
 def safe_strpdelta(mt: str) -> timedelta:
     """Parse string into timedelta.
 
-    Can cope with time strings in format `hh:mm:ss` or `hh:mm`.
+    Can cope with time strings in format `hh:mm:ss` or `hh:mm`. Results are cached.
 
     Args:
         mt (str): MATSim time string (`hh:mm:ss` or `hh:mm`)
@@ -174,10 +248,10 @@ def safe_strpdelta(mt: str) -> timedelta:
     """
     units = mt.split(":")
     if len(units) == 3:
-        h, m, s = mt.split(":")
+        h, m, s = units
         return timedelta(hours=int(h), minutes=int(m), seconds=int(s))
     if len(units) == 2:
-        h, m = mt.split(":")
+        h, m = units
         return timedelta(hours=int(h), minutes=int(m))
     raise UserWarning(f"Unrecognised timedelta format: {mt}")
 
@@ -238,7 +312,10 @@ def get_linestring(from_point: Union[Point, CellId], to_point: Union[Point, Cell
 
 
 def get_elems(path: Union[str, Path], tag: str) -> Generator:
-    """Wrapper for unzipping and dealing with xml namespaces
+    """Wrapper for unzipping and dealing with xml namespaces.
+
+    The xml is streamed from disk, gzipped inputs are decompressed on the fly rather than read into
+    memory, so elements are yielded as soon as they are parsed, regardless of file size.
 
     Args:
         path (Union[str, Path]): xml path
@@ -247,17 +324,17 @@ def get_elems(path: Union[str, Path], tag: str) -> Generator:
     Yields:
         Generator:  Generator of elements
     """
-    target = try_unzip(path)
-    tag = get_tag(target, tag)
-    target = try_unzip(path)  # need to repeat :(
-    return parse_elems(target, tag)
+    with open_xml(path) as target:
+        tag = sniff_tag(target, tag)
+        target.seek(0)
+        yield from parse_elems(target, tag)
 
 
-def parse_elems(target: Union[BytesIO, str, Path], tag: str) -> Generator:
+def parse_elems(target: Union[BinaryIO, str, Path], tag: str) -> Generator:
     """Traverse the given XML tree, retrieving the elements of the specified tag.
 
     Args:
-        target (Union[BytesIO, str, Path]): Target xml, either BytesIO object or string path
+        target (Union[BinaryIO, str, Path]): Target xml, either file-like object or string path
         tag (str): The tag type to extract , e.g. 'link'
 
     Yields:
@@ -272,6 +349,129 @@ def parse_elems(target: Union[BytesIO, str, Path], tag: str) -> Generator:
     del doc
 
 
+def get_elem_attributes(
+    path: Union[str, Path], tag: str, block_size: int = 2**20
+) -> Iterator[dict]:
+    """Stream the attributes of xml elements of the given tag, without building elements.
+
+    Much faster than `get_elems` for large numbers of elements described by their attributes (eg
+    vehicles), child elements are ignored. Namespaces are ignored.
+
+    Args:
+        path (Union[str, Path]): xml path, optionally gzipped.
+        tag (str): The tag type to extract, e.g. 'vehicle'.
+        block_size (int, optional): bytes parsed at a time. Defaults to 2**20.
+
+    Yields:
+        Iterator[dict]: element attributes.
+    """
+    target = _AttributesTarget(tag)
+    parser = et.XMLParser(target=target, huge_tree=True)
+    with open_xml(path) as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            parser.feed(block)
+            yield from target.attributes
+            target.attributes.clear()
+    parser.close()
+    yield from target.attributes
+
+
+class _AttributesTarget:
+    """lxml parser target collecting the attributes of elements of a given (local) tag."""
+
+    def __init__(self, tag: str) -> None:
+        self.tag = tag
+        self.namespaced = "}" + tag
+        self.attributes = []
+
+    def start(self, tag: str, attrib: dict) -> None:
+        if tag == self.tag or tag.endswith(self.namespaced):
+            self.attributes.append(attrib)
+
+    def close(self) -> None:
+        pass
+
+
+def escape_xml_attribute(value: str) -> str:
+    """Escape an xml attribute value as libxml2 (lxml) does."""
+    if ATTRIBUTE_ESCAPES.search(value) is None:
+        return value
+    return (
+        value.replace("&", "&amp;")
+        .replace("<", "&lt;")
+        .replace(">", "&gt;")
+        .replace('"', "&quot;")
+        .replace("\n", "&#10;")
+        .replace("\r", "&#13;")
+        .replace("\t", "&#9;")
+    )
+
+
+def escape_xml_text(value: str) -> str:
+    """Escape xml text as libxml2 (lxml) does."""
+    if TEXT_ESCAPES.search(value) is None:
+        return value
+    return (
+        value.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace("\r", "&#13;")
+    )
+
+
+def open_xml(path: Union[str, Path]) -> BinaryIO:
+    """Open xml at given path for streaming, gzipped files are decompressed on the fly.
+
+    Compression is detected from the file content rather than the extension.
+
+    Args:
+        path (Union[str, Path]): xml path.
+
+    Returns:
+        BinaryIO: readable (and seekable) binary file object.
+    """
+    with open(path, "rb") as f:
+        magic = f.read(len(GZIP_MAGIC))
+    if magic == GZIP_MAGIC:
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def sniff_tag(target: BinaryIO, tag: str, chunk_size: int = 2**16) -> str:
+    """Check for namespace declaration on the root element of a streamed xml.
+
+    Only the prefix of the document up to the root element is read, the caller is responsible for
+    rewinding the target before parsing it.
+
+    Args:
+        target (BinaryIO): readable binary file object.
+        tag (str): The tag type to extract , e.g. 'link'.
+        chunk_size (int, optional): number of bytes read per step. Defaults to 2**16.
+
+    Returns:
+        str: tag, prefixed with the default namespace if declared, ie {namespace}tag.
+    """
+    nsmap = {}
+    parser = et.XMLPullParser(events=("start", "start-ns"))
+    while True:
+        chunk = target.read(chunk_size)
+        if not chunk:
+            break
+        parser.feed(chunk)
+        for event, element in parser.read_events():
+            if event == "start-ns":
+                nsmap[element[0]] = element[1]
+            else:  # namespaces are declared before (or on) the root element
+                return _namespaced_tag(nsmap, tag)
+    return _namespaced_tag(nsmap, tag)
+
+
+def _namespaced_tag(nsmap: dict, tag: str) -> str:
+    if "" not in nsmap:
+        return tag
+    return "{" + nsmap[""] + "}" + tag
+
+
 def try_unzip(path: Union[str, Path]) -> Union[BytesIO, str, Path]:
     """Attempts to unzip xml at given path, if fails, returns path
 
@@ -384,6 +584,98 @@ def is_gzip(location: Union[str, Path]) -> bool:
     return suffix == ".gz" or suffix == ".gzip"
 
 
+def open_output(
+    path: Union[str, Path], compression: Optional[int] = None, workers: Optional[int] = None
+) -> BinaryIO:
+    """Open a binary output file, gzipped paths (see `is_gzip`) are compressed with a `ParallelGzipFile`.
+
+    Args:
+        path (Union[str, Path]): output path.
+        compression (Optional[int], optional): gzip compression level, 0 for no compression. Defaults to DEFAULT_GZIP_COMPRESSION for gzipped paths.
+        workers (Optional[int], optional): compression threads. Defaults to DEFAULT_GZIP_WORKERS.
+
+    Returns:
+        BinaryIO: writable binary file object, to be closed by the caller.
+    """
+    if compression is None:
+        compression = DEFAULT_GZIP_COMPRESSION if is_gzip(path) else 0
+    if compression:
+        return ParallelGzipFile(path, compression=compression, workers=workers)
+    return open(path, "wb")
+
+
+class ParallelGzipFile:
+    """Writable gzip file compressing blocks of data in parallel threads (as pigz).
+
+    Each block of `block_size` bytes is compressed as a separate gzip member, members are written in
+    order. Multi-member gzip files are read as a single stream by gzip tools, `gzip.open` and MATSim.
+
+    Args:
+        path (Union[str, Path]): output path.
+        compression (int, optional): gzip compression level. Defaults to DEFAULT_GZIP_COMPRESSION.
+        workers (Optional[int], optional): compression threads. Defaults to DEFAULT_GZIP_WORKERS.
+        block_size (int, optional): uncompressed bytes per gzip member. Defaults to GZIP_BLOCK_SIZE.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        compression: int = DEFAULT_GZIP_COMPRESSION,
+        workers: Optional[int] = None,
+        block_size: int = GZIP_BLOCK_SIZE,
+    ) -> None:
+        self.compression = compression
+        self.workers = workers or DEFAULT_GZIP_WORKERS
+        self.block_size = block_size
+        self.file = open(path, "wb")
+        self.executor = ThreadPoolExecutor(self.workers)
+        self.pending = deque()
+        self.buffer = bytearray()
+        self.members = 0
+
+    @property
+    def closed(self) -> bool:
+        return self.file.closed
+
+    def write(self, data: bytes) -> int:
+        self.buffer += data
+        if len(self.buffer) >= self.block_size:
+            self._compress_buffer()
+        return len(data)
+
+    def _compress_buffer(self) -> None:
+        # zlib releases the GIL, so blocks are compressed in parallel
+        self.pending.append(
+            self.executor.submit(gzip.compress, bytes(self.buffer), self.compression, mtime=0)
+        )
+        self.buffer.clear()
+        self.members += 1
+        # bound the number of blocks held in memory
+        while len(self.pending) > 2 * self.workers:
+            self.file.write(self.pending.popleft().result())
+
+    def flush(self) -> None:
+        self.file.flush()
+
+    def close(self) -> None:
+        if self.file.closed:
+            return
+        try:
+            if self.buffer or not self.members:
+                self._compress_buffer()
+            while self.pending:
+                self.file.write(self.pending.popleft().result())
+        finally:
+            self.executor.shutdown()
+            self.file.close()
+
+    def __enter__(self) -> "ParallelGzipFile":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
 def create_local_dir(directory: Union[str, Path]):
     """Safely create new directory.
     TODO this can be replaced with pathlib I think
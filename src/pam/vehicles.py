@@ -1,8 +1,10 @@
 from __future__ import annotations
 
 import logging
-from dataclasses import dataclass, field
-from typing import Optional
+from array import array
+from collections.abc import Mapping, MutableMapping
+from dataclasses import dataclass, field, fields
+from typing import Iterator, Optional
 
 from lxml import etree as et
 
@@ -131,6 +133,17 @@ class Vehicle:
         """
         xf.write(et.Element("vehicle", {"id": str(self.vid), "type": str(self.type_id)}))
 
+    def to_xml_bytes(self) -> bytes:
+        """Serialise vehicle as a MATSim xml element, identical to the output of `to_xml`.
+
+        Returns:
+            bytes: utf-8 encoded xml element.
+        """
+        return (
+            f'<vehicle id="{utils.escape_xml_attribute(str(self.vid))}" '
+            f'type="{utils.escape_xml_attribute(str(self.type_id))}"/>'
+        ).encode()
+
 
 @dataclass
 class ElectricVehicle(Vehicle):
@@ -167,6 +180,353 @@ class ElectricVehicle(Vehicle):
             )
         )
 
+    def to_ev_xml_bytes(self) -> bytes:
+        """Serialise vehicle as a MATSim electric vehicle xml element, identical to the output of
+        `to_ev_xml`.
+
+        Returns:
+            bytes: utf-8 encoded xml element.
+        """
+        escape = utils.escape_xml_attribute
+        return (
+            f'<vehicle id="{escape(str(self.vid))}" '
+            f'battery_capacity="{escape(str(self.battery_capacity))}" '
+            f'initial_soc="{escape(str(self.initial_soc))}" '
+            f'charger_types="{escape(str(self.charger_types))}" '
+            f'vehicle_type="{escape(str(self.type_id))}"/>'
+        ).encode()
+
+
+class VehicleView(Vehicle):
+    """`Vehicle` api for a row of a `VehicleTable`, reading and writing the table.
+
+    Views compare equal to vehicles with the same values, and are copied (and pickled) as detached
+    `Vehicle`s (see `detach`).
+    """
+
+    def __init__(self, table: VehicleTable, vid: str) -> None:
+        self._table = table
+        self._vid = vid
+
+    @property
+    def _row(self) -> int:
+        return self._table._index[self._vid]
+
+    @property
+    def vid(self) -> str:
+        return self._vid
+
+    @vid.setter
+    def vid(self, vid: str) -> None:
+        self._table.rename(self._vid, vid)
+        self._vid = vid
+
+    @property
+    def type_id(self) -> str:
+        return self._table.strings[self._table.type_codes[self._row]]
+
+    @type_id.setter
+    def type_id(self, type_id: str) -> None:
+        self._table.type_codes[self._row] = self._table.code(type_id)
+
+    def detach(self) -> Vehicle:
+        """Copy of the vehicle, independent of the table.
+
+        Returns:
+            Vehicle:
+        """
+        return self._table.vehicle(self._vid)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Vehicle):
+            return NotImplemented
+        if isinstance(other, VehicleView):
+            other = other.detach()
+        return self.detach() == other
+
+    def __reduce__(self):
+        vehicle = self.detach()
+        return type(vehicle), tuple(getattr(vehicle, f.name) for f in fields(vehicle))
+
+
+class ElectricVehicleView(VehicleView, ElectricVehicle):
+    """`ElectricVehicle` api for a row of a `VehicleTable`, see `VehicleView`."""
+
+    @property
+    def battery_capacity(self) -> float:
+        return self._table.battery_capacity[self._row]
+
+    @battery_capacity.setter
+    def battery_capacity(self, battery_capacity: float) -> None:
+        self._table.battery_capacity[self._row] = battery_capacity
+
+    @property
+    def initial_soc(self) -> float:
+        return self._table.initial_soc[self._row]
+
+    @initial_soc.setter
+    def initial_soc(self, initial_soc: float) -> None:
+        self._table.initial_soc[self._row] = initial_soc
+
+    @property
+    def charger_types(self) -> str:
+        return self._table.strings[self._table.charger_codes[self._row]]
+
+    @charger_types.setter
+    def charger_types(self, charger_types: str) -> None:
+        self._table.charger_codes[self._row] = self._table.code(charger_types)
+
+
+class VehicleTable(MutableMapping):
+    """Vehicles held as columns, mapping vehicle ids to `Vehicle` (or `ElectricVehicle`) views.
+
+    Each vehicle is a row of the vehicle id, type id and (electric vehicle) battery capacity,
+    initial state of charge and charger types columns, with type ids and charger types held as
+    codes of a shared string table. Rows are found by vehicle id with an index. Getting a vehicle
+    returns a view of its row (`VehicleView`), setting a vehicle copies its values into the table and
+    popping a vehicle returns a detached copy. Removed rows are compacted once they make up most of
+    the table.
+
+    Electric vehicle battery capacities and initial states of charge are held as floats.
+
+    Args:
+        vehicles (Mapping[str, Vehicle], optional): initial vehicles. Defaults to {}.
+    """
+
+    def __init__(self, vehicles: Mapping[str, Vehicle] = {}) -> None:
+        self._index = {}
+        self.vids = []
+        self.ev = bytearray()
+        self.type_codes = array("i")
+        self.battery_capacity = array("d")
+        self.initial_soc = array("d")
+        self.charger_codes = array("i")
+        self.strings = []
+        self._codes = {}
+        self._removed = 0
+        self.update(vehicles)
+
+    def code(self, value: str) -> int:
+        """Code of a type id or charger types string, added to the string table if new."""
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.strings)
+            self.strings.append(value)
+        return code
+
+    def set_row(
+        self,
+        vid: str,
+        type_id: str,
+        battery_capacity: Optional[float] = None,
+        initial_soc: Optional[float] = None,
+        charger_types: Optional[str] = None,
+    ) -> None:
+        """Add (or overwrite) a vehicle, an electric vehicle if `battery_capacity` is given.
+
+        Args:
+            vid (str): vehicle id.
+            type_id (str): vehicle type id.
+            battery_capacity (Optional[float], optional): Defaults to None.
+            initial_soc (Optional[float], optional): Defaults to None.
+            charger_types (Optional[str], optional): Defaults to None.
+        """
+        ev = battery_capacity is not None
+        values = (
+            ev,
+            self.code(type_id),
+            battery_capacity if ev else 0.0,
+            initial_soc if ev else 0.0,
+            self.code(charger_types) if ev else -1,
+        )
+        row = self._index.get(vid)
+        if row is None:
+            self._index[vid] = len(self.vids)
+            self.vids.append(vid)
+            for column, value in zip(self._columns(), values):
+                column.append(value)
+        else:
+            for column, value in zip(self._columns(), values):
+                column[row] = value
+
+    def extend(self, vids: list[str], type_ids: list[str]) -> None:
+        """Add (or overwrite) vehicles of the given ids and types.
+
+        Args:
+            vids (list[str]): vehicle ids.
+            type_ids (list[str]): vehicle type ids.
+        """
+        for vid, type_id in zip(vids, type_ids):
+            self.set_row(vid, type_id)
+
+    def vehicle(self, vid: str) -> Vehicle:
+        """Detached copy of a vehicle.
+
+        Args:
+            vid (str): vehicle id.
+
+        Returns:
+            Vehicle: `Vehicle` or `ElectricVehicle`.
+        """
+        row = self._index[vid]
+        type_id = self.strings[self.type_codes[row]]
+        if not self.ev[row]:
+            return Vehicle(vid=vid, type_id=type_id)
+        return ElectricVehicle(
+            vid=vid,
+            type_id=type_id,
+            battery_capacity=self.battery_capacity[row],
+            initial_soc=self.initial_soc[row],
+            charger_types=self.strings[self.charger_codes[row]],
+        )
+
+    def rename(self, vid: str, new: str) -> None:
+        """Change the id of a vehicle.
+
+        Args:
+            vid (str): vehicle id.
+            new (str): new vehicle id.
+        """
+        if new in self._index:
+            raise PAMVehicleIdError(f"Failed to rename vehicle '{vid}', '{new}' already exists.")
+        row = self._index.pop(vid)
+        self._index[new] = row
+        self.vids[row] = new
+
+    def ev_ids(self) -> Iterator[str]:
+        """Ids of the electric vehicles."""
+        return (vid for vid, ev in zip(self.vids, self.ev) if ev and vid is not None)
+
+    def type_ids(self) -> Iterator[tuple[str, str]]:
+        """Vehicle ids and their type ids."""
+        strings = self.strings
+        return (
+            (vid, strings[code]) for vid, code in zip(self.vids, self.type_codes) if vid is not None
+        )
+
+    def charger_types(self) -> set[str]:
+        """Distinct charger types strings of the electric vehicles."""
+        return {
+            self.strings[code]
+            for vid, ev, code in zip(self.vids, self.ev, self.charger_codes)
+            if ev and vid is not None
+        }
+
+    def xml_records(self) -> Iterator[bytes]:
+        """Serialise vehicles as MATSim vehicle xml elements, see `Vehicle.to_xml_bytes`."""
+        escape = utils.escape_xml_attribute
+        types = [escape(str(value)) for value in self.strings]
+        for vid, code in zip(self.vids, self.type_codes):
+            if vid is not None:
+                yield f'<vehicle id="{escape(str(vid))}" type="{types[code]}"/>'.encode()
+
+    def ev_xml_records(self) -> Iterator[bytes]:
+        """Serialise electric vehicles as MATSim electric vehicle xml elements, see
+        `ElectricVehicle.to_ev_xml_bytes`.
+        """
+        escape = utils.escape_xml_attribute
+        strings = [escape(str(value)) for value in self.strings]
+        for row, (vid, ev) in enumerate(zip(self.vids, self.ev)):
+            if ev and vid is not None:
+                yield (
+                    f'<vehicle id="{escape(str(vid))}" '
+                    f'battery_capacity="{self.battery_capacity[row]}" '
+                    f'initial_soc="{self.initial_soc[row]}" '
+                    f'charger_types="{strings[self.charger_codes[row]]}" '
+                    f'vehicle_type="{strings[self.type_codes[row]]}"/>'
+                ).encode()
+
+    def compact(self) -> None:
+        """Drop the rows of removed vehicles."""
+        rows = [row for row, vid in enumerate(self.vids) if vid is not None]
+        self.vids = [self.vids[row] for row in rows]
+        self.ev = bytearray(self.ev[row] for row in rows)
+        self.type_codes = array("i", (self.type_codes[row] for row in rows))
+        self.battery_capacity = array("d", (self.battery_capacity[row] for row in rows))
+        self.initial_soc = array("d", (self.initial_soc[row] for row in rows))
+        self.charger_codes = array("i", (self.charger_codes[row] for row in rows))
+        self._index = {vid: row for row, vid in enumerate(self.vids)}
+        self._removed = 0
+
+    def _columns(self) -> tuple:
+        return (
+            self.ev,
+            self.type_codes,
+            self.battery_capacity,
+            self.initial_soc,
+            self.charger_codes,
+        )
+
+    def _values(self, vid: str) -> tuple:
+        row = self._index[vid]
+        if not self.ev[row]:
+            return (self.strings[self.type_codes[row]],)
+        return (
+            self.strings[self.type_codes[row]],
+            self.battery_capacity[row],
+            self.initial_soc[row],
+            self.strings[self.charger_codes[row]],
+        )
+
+    def __setitem__(self, vid: str, vehicle: Vehicle) -> None:
+        if not isinstance(vehicle, Vehicle):
+            raise UserWarning(
+                f"Unsupported type {type(vehicle)}, please use 'Union[Vehicle, ElectricVehicle]'."
+            )
+        if isinstance(vehicle, ElectricVehicle):
+            self.set_row(
+                vid,
+                vehicle.type_id,
+                float(vehicle.battery_capacity),
+                float(vehicle.initial_soc),
+                vehicle.charger_types,
+            )
+        else:
+            self.set_row(vid, vehicle.type_id)
+
+    def __getitem__(self, vid: str) -> Vehicle:
+        if self.ev[self._index[vid]]:
+            return ElectricVehicleView(self, vid)
+        return VehicleView(self, vid)
+
+    def __delitem__(self, vid: str) -> None:
+        row = self._index.pop(vid)
+        self.vids[row] = None
+        self._removed += 1
+        if self._removed > 1024 and 2 * self._removed > len(self.vids):
+            self.compact()
+
+    def pop(self, vid: str, *default) -> Vehicle:
+        if vid not in self._index:
+            if default:
+                return default[0]
+            raise KeyError(vid)
+        vehicle = self.vehicle(vid)
+        del self[vid]
+        return vehicle
+
+    def clear(self) -> None:
+        self.__init__()
+
+    def __contains__(self, vid) -> bool:
+        return vid in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return (vid for vid in self.vids if vid is not None)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, VehicleTable):
+            return len(self) == len(other) and all(
+                vid in other._index and self._values(vid) == other._values(vid) for vid in self
+            )
+        return super().__eq__(other)
+
+    def __repr__(self) -> str:
+        return f"<VehicleTable {len(self)} vehicles, {sum(1 for _ in self.ev_ids())} electric>"
+
 
 class VehicleManager:
     """
@@ -174,15 +534,15 @@ class VehicleManager:
 
     Attributes:
         _veh_types (dict[str, VehicleType]): Mapping of type ids to vehicle types data.
-        _vehicles (dict[str, Vehicle]): Mapping of vehicle ids to vehicle data.
+        _vehicles (VehicleTable): Mapping of vehicle ids to vehicle data, held as columns.
     """
 
     _veh_types: dict[str, VehicleType]
-    _vehicles: dict[str, Vehicle]
+    _vehicles: VehicleTable
 
     def __init__(self) -> None:
         self._veh_types = {}
-        self._vehicles = {}
+        self._vehicles = VehicleTable()
 
     def add_type(self, vehicle_type: VehicleType) -> None:
         """Add vehicle type to manager.
@@ -251,7 +611,8 @@ class VehicleManager:
             return False
         return True
 
-    def pop(self, vid):
+    def pop(self, vid) -> Vehicle:
+        """Remove a vehicle, returning a (detached) copy."""
         return self._vehicles.pop(vid)
 
     @property
@@ -259,9 +620,9 @@ class VehicleManager:
         """Return dictionary of electric vehicles in manager.
 
         Returns:
-            dict[str, ElectricVehicle]: Dictionary of electric vehicles.
+            dict[str, ElectricVehicle]: Dictionary of electric vehicles (views of the manager vehicles).
         """
-        return {vid: veh for vid, veh in self._vehicles.items() if isinstance(veh, ElectricVehicle)}
+        return {vid: self._vehicles[vid] for vid in self._vehicles.ev_ids()}
 
     def charger_types(self) -> set[str]:
         """Return set of electric charger types used by evs.
@@ -270,8 +631,8 @@ class VehicleManager:
             set[str]: Electric charger types.
         """
         chargers = set()
-        for v in self.evs.values():
-            chargers |= set(v.charger_types.split(","))
+        for charger_types in self._vehicles.charger_types():
+            chargers |= set(charger_types.split(","))
         return chargers
 
     def is_consistent(self) -> bool:
@@ -284,10 +645,10 @@ class VehicleManager:
             bool: Manager is consistent. Note that this doesn't check for unused types.
         """
         veh_types = set(self._veh_types.keys())
-        for k, v in self._vehicles.items():
-            if v.type_id not in veh_types:
+        for k, type_id in self._vehicles.type_ids():
+            if type_id not in veh_types:
                 raise PAMVehicleIdError(
-                    f"Failed to find veh type of id '{v}', specified for veh id '{k}'."
+                    f"Failed to find veh type of id '{self._vehicles[k]}', specified for veh id '{k}'."
                 )
         return True
 
@@ -299,7 +660,7 @@ class VehicleManager:
         """
         unused = {}
         veh_types = set(self._veh_types.keys())
-        veh_veh_types = set([v.type_id for v in self._vehicles.values()])
+        veh_veh_types = set(type_id for _, type_id in self._vehicles.type_ids())
         for t in veh_types:
             if t not in veh_veh_types:
                 unused[t] = self._veh_types[t]
@@ -311,7 +672,7 @@ class VehicleManager:
 
     def clear_vehs(self):
         """Remove all vehciles from manager."""
-        self._vehicles = {}
+        self._vehicles = VehicleTable()
 
     def from_xml(self, vehs_path: str, evs_path: Optional[str] = None):
         """Reads MATSim vehicles from https://www.matsim.org/files/dtd/vehicleDefinitions_v2.0.xsd
@@ -343,10 +704,14 @@ class VehicleManager:
         Args:
             path (str): path to matsim all_vehicles xml file
         """
-        vehs = dict(
-            (elem.get("id"), VehicleType.from_xml_elem(elem))
-            for elem in utils.get_elems(path, "vehicleType")
-        )
+        vehs = {}
+        with utils.open_xml(path) as f:
+            # vehicle types precede vehicles, so stop parsing at the first vehicle
+            for _, elem in et.iterparse(f, tag=("{*}vehicleType", "{*}vehicle")):
+                if et.QName(elem).localname == "vehicle":
+                    break
+                vehs[elem.get("id")] = VehicleType.from_xml_elem(elem)
+                elem.clear()
         keys = set(vehs) & set(self._veh_types)
         if keys:
             raise PAMVehicleIdError(
@@ -361,16 +726,17 @@ class VehicleManager:
             path (str): path to matsim all_vehicles xml file
         """
 
-        vehs = {
-            elem.get("id"): Vehicle(vid=elem.get("id"), type_id=elem.get("type"))
-            for elem in utils.get_elems(path, "vehicle")
-        }
-        keys = set(vehs) & set(self._vehicles)
+        vids = []
+        type_ids = []
+        for attribs in utils.get_elem_attributes(path, "vehicle"):
+            vids.append(attribs["id"])
+            type_ids.append(attribs["type"])
+        keys = {vid for vid in vids if vid in self._vehicles}
         if keys:
             raise PAMVehicleIdError(
                 f"Failed to read vehs from xml due to duplicate keys with existing: {keys}"
             )
-        self._vehicles.update(vehs)
+        self._vehicles.extend(vids, type_ids)
 
     def evs_from_xml(self, path):
         """Reads vehicles from MATSim vehicles file (https://www.matsim.org/files/dtd/vehicleDefinitions_v2.0.xsd).
@@ -378,20 +744,15 @@ class VehicleManager:
         Args:
             path (str): path to matsim all_vehicles xml file
         """
-        evs = {}
-        for vehicle_elem in utils.get_elems(path, "vehicle"):
-            attribs = dict(vehicle_elem.attrib)
-            vid = attribs.pop("id")
-            vehicle_type = attribs.pop("vehicle_type")
-            attribs["battery_capacity"] = float(attribs["battery_capacity"])
-            attribs["initial_soc"] = float(attribs["initial_soc"])
-            evs[vid] = ElectricVehicle(vid=vid, type_id=vehicle_type, **attribs)
-        keys = set(evs) & set(self._vehicles)
-        if keys:
-            PAMVehicleIdError(
-                f"Failed to read evs from xml due to duplicate keys with existing: {keys}"
+        # electric vehicles are expected to overwrite the vehicles of the same id
+        for attribs in utils.get_elem_attributes(path, "vehicle"):
+            self._vehicles.set_row(
+                attribs["id"],
+                attribs["vehicle_type"],
+                float(attribs["battery_capacity"]),
+                float(attribs["initial_soc"]),
+                attribs.get("charger_types", ElectricVehicle.charger_types),
             )
-        self._vehicles.update(evs)
 
     def to_xml(self, vehs_path: str, evs_path: Optional[str] = None):
         """Write manager to MATSim formatted xml.
@@ -408,9 +769,9 @@ class VehicleManager:
         """Writes MATSim vehicles file as per https://www.matsim.org/files/dtd/vehicleDefinitions_v2.0.xsd.
 
         Args:
-            path (str): name of output file.
+            path (str): name of output file, gzipped if it ends with .gz.
         """
-        with et.xmlfile(path, encoding="utf-8") as xf:
+        with utils.open_output(path) as output, et.xmlfile(output, encoding="utf-8") as xf:
             xf.write_declaration()
             vehicleDefinitions_attribs = {
                 "xmlns": "http://www.matsim.org/files/dtd",
@@ -423,20 +784,38 @@ class VehicleManager:
                 for vehicle_type in self._veh_types.values():
                     vehicle_type.to_xml(xf)
                 logging.info(f"Writing vehicles to {path}")
-                for veh in self._vehicles.values():
-                    veh.to_xml(xf)
+                xf.flush()
+                _write_blocks(output, self._vehicles.xml_records())
 
     def to_ev_xml(self, path: str):
         """Writes MATSim electric vehciles file as per https://www.matsim.org/files/dtd/electric_vehicles_v1.dtd.
 
         Args:
-            path (str): name of output file
+            path (str): name of output file, gzipped if it ends with .gz.
         """
-        with et.xmlfile(path, encoding="utf-8") as xf:
+        with utils.open_output(path) as output, et.xmlfile(output, encoding="utf-8") as xf:
             logging.info(f"Writing electric vehicles to {path}")
             xf.write_declaration(
                 doctype='<!DOCTYPE vehicles SYSTEM "http://matsim.org/files/dtd/electric_vehicles_v1.dtd">'
             )
             with xf.element("vehicles"):
-                for veh in self.evs.values():
-                    veh.to_ev_xml(xf)
+                xf.flush()
+                _write_blocks(output, self._vehicles.ev_xml_records())
+
+
+def _write_blocks(output, records: Iterator[bytes], block_size: int = 10000) -> None:
+    """Write serialised records to output, joined into blocks of `block_size` records.
+
+    Args:
+        output: binary output (eg file), on which an (flushed) lxml xmlfile is open.
+        records (Iterator[bytes]): serialised xml elements.
+        block_size (int, optional): records per write. Defaults to 10000.
+    """
+    block = []
+    for record in records:
+        block.append(record)
+        if len(block) >= block_size:
+            output.write(b"".join(block))
+            block.clear()
+    if block:
+        output.write(b"".join(block))
@@ -1,8 +1,19 @@
-from pam.write.diary import dump, save_csv, save_geojson, to_csv, write_population_csvs
-from pam.write.matrices import write_od_matrices
+from pam.write.diary import (
+    DiaryWriter,
+    diary_tables,
+    diary_to_parquet,
+    dump,
+    save_csv,
+    save_geojson,
+    to_csv,
+    write_population_csvs,
+)
+from pam.write.matrices import ODMatrices, write_od_matrices
 from pam.write.matsim import (
+    CheckpointWriter,
     Writer,
     add_attribute,
+    concatenate_parts,
     create_person_element,
     object_attributes_dtd,
     population_v6_dtd,
@@ -10,3 +21,4 @@ from pam.write.matsim import (
     write_matsim_population_v6,
     write_plan,
 )
+from pam.write.parquet import ParquetWriter, write_parquet
@@ -1,21 +1,99 @@
 from __future__ import annotations
 
 import os
+from collections.abc import Sequence
 from typing import TYPE_CHECKING, Optional
 
 if TYPE_CHECKING:
-    from pam.core import Population
+    from pam.core import Person, Population
 
 import geopandas as gp
+import numpy as np
 import pandas as pd
-from shapely.geometry import LineString
+import pyarrow as pa
+import shapely
 
 from pam.activity import Activity, Leg
 from pam.utils import create_local_dir
+from pam.write.parquet import BatchedTableWriter
+
+LEG_COLUMNS = [
+    "pid",
+    "hid",
+    "freq",
+    "ozone",
+    "dzone",
+    "purp",
+    "origin activity",
+    "destination activity",
+    "mode",
+    "seq",
+    "tst",
+    "tet",
+    "duration",
+]
+ACTIVITY_COLUMNS = [
+    "pid",
+    "hid",
+    "freq",
+    "activity",
+    "seq",
+    "start time",
+    "end time",
+    "duration",
+    "zone",
+]
+# DiaryWriter table schemas, times and durations are seconds since the start of the simulation
+_TRAVEL_SCHEMA = pa.schema(
+    [
+        ("pid", pa.string()),
+        ("hid", pa.string()),
+        ("freq", pa.float64()),
+        ("seq", pa.int32()),
+        ("mode", pa.string()),
+        ("purp", pa.string()),
+        ("ozone", pa.string()),
+        ("dzone", pa.string()),
+        ("olink", pa.string()),
+        ("dlink", pa.string()),
+        ("ox", pa.float64()),
+        ("oy", pa.float64()),
+        ("dx", pa.float64()),
+        ("dy", pa.float64()),
+        ("start_time", pa.int64()),
+        ("end_time", pa.int64()),
+        ("duration", pa.int64()),
+        ("distance", pa.float64()),
+    ]
+)
+DIARY_SCHEMAS = {
+    "legs": _TRAVEL_SCHEMA,
+    "trips": _TRAVEL_SCHEMA,
+    "activities": pa.schema(
+        [
+            ("pid", pa.string()),
+            ("hid", pa.string()),
+            ("freq", pa.float64()),
+            ("seq", pa.int32()),
+            ("act", pa.string()),
+            ("zone", pa.string()),
+            ("link", pa.string()),
+            ("x", pa.float64()),
+            ("y", pa.float64()),
+            ("start_time", pa.int64()),
+            ("end_time", pa.int64()),
+            ("duration", pa.int64()),
+        ]
+    ),
+}
 
 
 def to_csv(
-    population: Population, dir: str, crs: Optional[str] = None, to_crs: Optional[str] = "EPSG:4326"
+    population: Population,
+    dir: str,
+    crs: Optional[str] = None,
+    to_crs: Optional[str] = "EPSG:4326",
+    geojson: bool = True,
 ) -> None:
     """Write a population to disk as tabular data in csv format.
 
@@ -31,92 +109,282 @@ def to_csv(
       dir (str): path to output directory
       crs (Optional[str]): population coordinate system (generally we use local grid systems). Defaults to None.
       to_crs (Optional[str]): output crs, defaults for use in kepler. Defaults to "EPSG:4326".
+      geojson (bool): write geojsons (which are much slower to write than csvs). Defaults to True.
 
     """
     create_local_dir(dir)
 
-    hhs = []
-    people = []
-    acts = []
-    legs = []
+    for name, df in diary_tables(population).items():
+        if geojson:
+            save_geojson(df, crs, to_crs, os.path.join(dir, f"{name}.geojson"))
+        save_csv(df, os.path.join(dir, f"{name}.csv"))
 
-    for hid, hh in population.households.items():
-        hh_data = {"hid": hid, "freq": hh.freq, "hzone": hh.location.area}
-        if isinstance(hh.attributes, dict):
-            hh_data.update(hh.attributes)
-        if hh.location.loc is not None:
-            hh_data["geometry"] = hh.location.loc
 
-        hhs.append(hh_data)
+def diary_to_parquet(
+    population: Population,
+    dir: str,
+    household_key: Optional[str] = None,
+    batch_size: int = 100000,
+    trips: bool = True,
+) -> None:
+    """Write the selected plans of a population to disk as legs, trips and activities parquet tables.
 
-        for pid, person in hh.people.items():
-            people_data = {"pid": pid, "hid": hid, "freq": person.freq, "hzone": hh.location.area}
-            if isinstance(person.attributes, dict):
-                people_data.update(person.attributes)
-            if hh.location.loc is not None:
-                people_data["geometry"] = hh.location.loc
+    Tables follow `DIARY_SCHEMAS` and are written by `DiaryWriter(format="parquet")`, as part files
+    of the legs, trips and activities sub directories (read as parquet datasets, eg
+    `pd.read_parquet(os.path.join(dir, "legs"))`). For the tables of all plans, read back with
+    `pam.read.read_parquet`, see `pam.write.write_parquet`.
+
+    Args:
+      population (Population):
+      dir (str): path to output directory
+      household_key (Optional[str]): Person attribute used as household id, if not given the population household ids are used. Defaults to None.
+      batch_size (int): Number of persons written to each part file. Defaults to 100000.
+      trips (bool): write the trips table, see `Plan.trips`. Defaults to True.
+    """
+    with DiaryWriter(
+        dir, format="parquet", household_key=household_key, batch_size=batch_size, trips=trips
+    ) as writer:
+        writer.add_population(population)
+
+
+def diary_tables(population: Population) -> dict[str, pd.DataFrame]:
+    """Build the households, people, legs and activities tables written by `to_csv`.
+
+    Records are gathered in a single pass over the population, leg geometries are built as arrays.
+    Tables with locs (shapely.Point) data include a "geometry" column, which is None for records
+    without locs.
+
+    Args:
+      population (Population):
 
-            people.append(people_data)
+    Returns:
+      dict[str, pd.DataFrame]: tables, households indexed by hid and people by pid.
+    """
+    hhs, hh_attributes, hh_locs = [], [], []
+    people, people_attributes, people_locs = [], [], []
+    acts, act_locs = [], []
+    legs, leg_starts, leg_ends = [], [], []
 
-            for seq, component in enumerate(person.plan):
+    for hid, hh in population.households.items():
+        hhs.append((hid, hh.freq, hh.location.area))
+        hh_attributes.append(hh.attributes if isinstance(hh.attributes, dict) else {})
+        hh_locs.append(hh.location.loc)
+
+        for pid, person in hh.people.items():
+            people.append((pid, hid, person.freq, hh.location.area))
+            people_attributes.append(
+                person.attributes if isinstance(person.attributes, dict) else {}
+            )
+            people_locs.append(hh.location.loc)
+
+            day = person.plan.day
+            for seq, component in enumerate(day):
                 if isinstance(component, Leg):
-                    leg_data = {
-                        "pid": pid,
-                        "hid": hid,
-                        "freq": component.freq,
-                        "ozone": component.start_location.area,
-                        "dzone": component.end_location.area,
-                        "purp": component.purp,
-                        "origin activity": person.plan[seq - 1].act,
-                        "destination activity": person.plan[seq + 1].act,
-                        "mode": component.mode,
-                        "seq": component.seq,
-                        "tst": component.start_time,
-                        "tet": component.end_time,
-                        "duration": str(component.duration),
-                    }
-                    if (
-                        component.start_location.loc is not None
-                        and component.end_location.loc is not None
-                    ):
-                        leg_data["geometry"] = LineString(
-                            (component.start_location.loc, component.end_location.loc)
+                    legs.append(
+                        (
+                            pid,
+                            hid,
+                            component.freq,
+                            component.start_location.area,
+                            component.end_location.area,
+                            component.purp,
+                            day[seq - 1].act,
+                            day[seq + 1].act,
+                            component.mode,
+                            component.seq,
+                            component.start_time,
+                            component.end_time,
+                            str(component.duration),
                         )
-
-                    legs.append(leg_data)
+                    )
+                    leg_starts.append(component.start_location.loc)
+                    leg_ends.append(component.end_location.loc)
 
                 if isinstance(component, Activity):
-                    act_data = {
-                        "pid": pid,
-                        "hid": hid,
-                        "freq": component.freq,
-                        "activity": component.act,
-                        "seq": component.seq,
-                        "start time": component.start_time,
-                        "end time": component.end_time,
-                        "duration": str(component.duration),
-                        "zone": component.location.area,
-                    }
-                    if component.location.loc is not None:
-                        act_data["geometry"] = component.location.loc
-
-                    acts.append(act_data)
-
-    hhs = pd.DataFrame(hhs).set_index("hid")
-    save_geojson(hhs, crs, to_crs, os.path.join(dir, "households.geojson"))
-    save_csv(hhs, os.path.join(dir, "households.csv"))
-
-    people = pd.DataFrame(people).set_index("pid")
-    save_geojson(people, crs, to_crs, os.path.join(dir, "people.geojson"))
-    save_csv(people, os.path.join(dir, "people.csv"))
-
-    legs = pd.DataFrame(legs)
-    save_geojson(legs, crs, to_crs, os.path.join(dir, "legs.geojson"))
-    save_csv(legs, os.path.join(dir, "legs.csv"))
-
-    acts = pd.DataFrame(acts)
-    save_geojson(acts, crs, to_crs, os.path.join(dir, "activities.geojson"))
-    save_csv(acts, os.path.join(dir, "activities.csv"))
+                    acts.append(
+                        (
+                            pid,
+                            hid,
+                            component.freq,
+                            component.act,
+                            component.seq,
+                            component.start_time,
+                            component.end_time,
+                            str(component.duration),
+                            component.location.area,
+                        )
+                    )
+                    act_locs.append(component.location.loc)
+
+    hhs = _records_frame(hhs, ["hid", "freq", "hzone"], hh_attributes, hh_locs)
+    people = _records_frame(people, ["pid", "hid", "freq", "hzone"], people_attributes, people_locs)
+    legs = _records_frame(legs, LEG_COLUMNS, geometry=_lines(leg_starts, leg_ends))
+    acts = _records_frame(acts, ACTIVITY_COLUMNS, geometry=act_locs)
+    return {
+        "households": hhs.set_index("hid"),
+        "people": people.set_index("pid"),
+        "legs": legs,
+        "activities": acts,
+    }
+
+
+def _records_frame(
+    records: list[tuple],
+    columns: list[str],
+    attributes: Optional[list[dict]] = None,
+    geometry: Optional[Sequence] = None,
+) -> pd.DataFrame:
+    """Build a table from records, adding (or updating) attribute columns and any geometry."""
+    df = pd.DataFrame.from_records(records, columns=columns)
+    if attributes:
+        attributes = pd.DataFrame.from_records(attributes)
+        for column in attributes.columns:
+            df[column] = attributes[column].to_numpy()
+    if geometry is not None and any(geom is not None for geom in geometry):
+        df["geometry"] = geometry
+    return df
+
+
+def _lines(starts: list, ends: list) -> np.ndarray:
+    """Build straight line geometries between start and end points, None where either is missing."""
+    geometry = np.full(len(starts), None, dtype=object)
+    mask = np.array([start is not None and end is not None for start, end in zip(starts, ends)])
+    if mask.any():
+        start_xy = shapely.get_coordinates(np.array(starts, dtype=object)[mask])
+        end_xy = shapely.get_coordinates(np.array(ends, dtype=object)[mask])
+        geometry[mask] = shapely.linestrings(np.stack([start_xy, end_xy], axis=1))
+    return geometry
+
+
+class DiaryWriter(BatchedTableWriter):
+    """Write (streamed) persons as legs, trips and activities tables, in batches of `batch_size` persons.
+
+    Selected plans are written as rows of the `DIARY_SCHEMAS` tables, with times and durations in
+    seconds since the start of the simulation and distances in m (unlike the `to_csv` tables, and
+    the `pam.write.write_parquet` tables of all plans). Csv tables are appended to
+    legs.csv, trips.csv and activities.csv, parquet tables are written as part files to the legs,
+    trips and activities sub directories (read as parquet datasets, eg
+    `pd.read_parquet(os.path.join(dir, "legs"))`). Memory use depends on `batch_size` only.
+
+    Persons are given the household id `hid`, or their `household_key` attribute if set, falling back
+    to their own person id.
+
+    Args:
+        dir (str): path to output directory.
+        format (str, optional): "csv" or "parquet". Defaults to "csv".
+        household_key (Optional[str], optional): Person attribute used as household id. Defaults to None.
+        batch_size (int, optional): Number of persons written at a time. Defaults to 100000.
+        trips (bool, optional): write the trips table, see `Plan.trips`. Defaults to True.
+    """
+
+    def __init__(
+        self,
+        dir: str,
+        format: str = "csv",
+        household_key: Optional[str] = None,
+        batch_size: int = 100000,
+        trips: bool = True,
+    ):
+        if format not in ("csv", "parquet"):
+            raise UserWarning(f"Unknown diary format: '{format}', use 'csv' or 'parquet'.")
+        schemas = {
+            table: DIARY_SCHEMAS[table] for table in DIARY_SCHEMAS if trips or table != "trips"
+        }
+        super().__init__(dir, schemas, batch_size=batch_size, parts=format == "parquet")
+        self.format = format
+        self.household_key = household_key
+        if format == "csv":
+            for table in schemas:
+                if os.path.exists(os.path.join(dir, f"{table}.csv")):
+                    os.remove(os.path.join(dir, f"{table}.csv"))
+
+    def add_population(self, population: Population) -> None:
+        for hid, _, person in population.people():
+            self.add_person(person, hid=hid)
+
+    def add_person(self, person: Person, hid: Optional[str] = None) -> None:
+        if self.household_key is not None:
+            hid = person.attributes.get(self.household_key, hid)
+        if hid is None:
+            hid = person.pid
+        person_record = (person.pid, str(hid), person.freq)
+
+        activities = self.records["activities"]
+        for seq, act in enumerate(person.plan.activities):
+            loc = act.location.loc
+            activities.append(
+                (
+                    *person_record,
+                    seq,
+                    act.act,
+                    _str(act.location.area),
+                    act.location.link,
+                    None if loc is None else loc.x,
+                    None if loc is None else loc.y,
+                    *_times(act),
+                )
+            )
+        self.records["legs"].extend(
+            _travel_record(person_record, seq, leg) for seq, leg in enumerate(person.plan.legs)
+        )
+        if "trips" in self.records:
+            self.records["trips"].extend(
+                _travel_record(person_record, trip.seq, trip) for trip in person.plan.trips()
+            )
+
+        self.added()
+
+    def to_table(self, table: str, records: list) -> pa.Table:
+        return pa.Table.from_pandas(
+            self._frame(table, records), schema=self.schemas[table], preserve_index=False
+        )
+
+    def write_table(self, table: str, records: list) -> None:
+        if self.format == "parquet":
+            super().write_table(table, records)
+            return
+        self._frame(table, records).astype(
+            {"seq": "Int32", "start_time": "Int64", "end_time": "Int64", "duration": "Int64"}
+        ).to_csv(
+            os.path.join(self.dir, f"{table}.csv"), mode="a", header=not self.part, index=False
+        )
+
+    def _frame(self, table: str, records: list) -> pd.DataFrame:
+        return pd.DataFrame.from_records(records, columns=self.schemas[table].names)
+
+
+def _travel_record(person_record: tuple, seq: int, leg: Leg) -> tuple:
+    start, end = leg.start_location, leg.end_location
+    distance = leg._distance
+    if distance is None and start.loc is not None and end.loc is not None:
+        distance = leg.euclidean_distance * 1000
+    return (
+        *person_record,
+        seq,
+        leg.mode,
+        leg.purp,
+        _str(start.area),
+        _str(end.area),
+        start.link,
+        end.link,
+        None if start.loc is None else start.loc.x,
+        None if start.loc is None else start.loc.y,
+        None if end.loc is None else end.loc.x,
+        None if end.loc is None else end.loc.y,
+        *_times(leg),
+        distance,
+    )
+
+
+def _str(value) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+def _times(component) -> tuple:
+    """Start time, end time and duration of a plan component as seconds (None if missing)."""
+    start, end = component.start_s, component.end_s
+    duration = None if start is None or end is None else end - start
+    return start, end, duration
 
 
 def dump(
@@ -1,16 +1,22 @@
 from __future__ import annotations
 
 import os
-from typing import TYPE_CHECKING, List, Optional, Tuple
+from collections import Counter, defaultdict
+from typing import TYPE_CHECKING, Any, Callable, List, Optional, Tuple
 
 if TYPE_CHECKING:
-    from pam.core import Population
+    from pam.core import Person, Population
+    from pam.location import Location
 
+import numpy as np
 import pandas as pd
 
 from pam.utils import create_local_dir
 from pam.utils import minutes_to_datetime as mtdt
 
+# leg_filter options and the leg fields they segment by
+LEG_FILTERS = {None: None, "Mode": "mode", "Purpose": "purp"}
+
 
 def write_od_matrices(
     population: Population,
@@ -18,13 +24,12 @@ def write_od_matrices(
     leg_filter: Optional[str] = None,
     person_filter: Optional[str] = None,
     time_minutes_filter: Optional[List[Tuple[int]]] = None,
+    weighted: bool = False,
 ) -> None:
     """Write a core population object to tabular O-D weighted matrices.
 
     Optionally segment matrices by leg attributes(mode/ purpose), person attributes or specific time periods.
-    A single filter can be applied each time.
-
-    TODO include freq (assume hh).
+    Filters can be combined, the matrices of each are written, see `ODMatrices`.
 
     Args:
         population (Population):
@@ -32,86 +37,180 @@ def write_od_matrices(
         leg_filter (Optional[str], optional): select between 'Mode', 'Purpose'. Defaults to None.
         person_filter (Optional[str], optional): select between given attribute categories (column names) from person attribute data. Defaults to None.
         time_minutes_filter (Optional[List[Tuple[int]]], optional): a list of tuples to slice times, e.g. [(start_of_slicer_1, end_of_slicer_1), (start_of_slicer_2, end_of_slicer_2), ... ]. Defaults to None.
+        weighted (bool, optional): weight legs by household freq rather than counting them. Defaults to False.
 
     """
-    create_local_dir(path)
-
-    legs = []
-
-    for hid, household in population.households.items():
-        for pid, person in household.people.items():
-            for leg in person.legs:
-                data = {
-                    "Household ID": hid,
-                    "Person ID": pid,
-                    "Origin": leg.start_location.area,
-                    "Destination": leg.end_location.area,
-                    "Purpose": leg.purp,
-                    "Mode": leg.mode,
-                    "Sequence": leg.seq,
-                    "Start time": leg.start_time,
-                    "End time": leg.end_time,
-                    "Freq": household.freq,
-                }
-                if person_filter:
-                    legs.append({**data, **person.attributes})
-                else:
-                    legs.append(data)
-
-    df_total = pd.DataFrame(data=legs, columns=["Origin", "Destination"]).set_index("Origin")
-    matrix = df_total.pivot_table(
-        values="Destination", index="Origin", columns="Destination", fill_value=0, aggfunc=len
+    matrices = ODMatrices(
+        leg_filter=leg_filter,
+        person_filter=person_filter,
+        time_minutes_filter=time_minutes_filter,
+        weighted=weighted,
     )
-    matrix.to_csv(os.path.join(path, "total_od.csv"))
-
-    data_legs = pd.DataFrame(data=legs)
-
-    if leg_filter:
-        data_legs_grouped = data_legs.groupby(leg_filter)
-        for filter, leg in data_legs_grouped:
-            df = pd.DataFrame(data=leg, columns=["Origin", "Destination"]).set_index("Origin")
-            matrix = df.pivot_table(
-                values="Destination",
-                index="Origin",
-                columns="Destination",
-                fill_value=0,
-                aggfunc=len,
-            )
-            matrix.to_csv(os.path.join(path, filter + "_od.csv"))
-        return None
-
-    elif person_filter:
-        data_legs_grouped = data_legs.groupby(person_filter)
-        for filter, leg in data_legs_grouped:
-            df = pd.DataFrame(data=leg, columns=["Origin", "Destination"]).set_index("Origin")
-            matrix = df.pivot_table(
-                values="Destination",
-                index="Origin",
-                columns="Destination",
-                fill_value=0,
-                aggfunc=len,
+    matrices.add_population(population)
+    matrices.write(path)
+
+
+class ODMatrices:
+    """Accumulate O-D leg counts into segmented matrices as persons are added.
+
+    Counts are accumulated per segment and O-D zone pair, so memory scales with the number of
+    segments and zone pairs rather than the number of legs. This allows matrices to be built from
+    streamed persons, eg:
+
+    ``` python
+    matrices = ODMatrices(leg_filter="Mode", zone=lambda location: link_zones.get(location.link))
+    for person in pam.read.matsim.stream_matsim_persons(PATH):
+        matrices.add_person(person)
+    matrices.write(OUT_DIR)
+    ```
+
+    Matrices are written as "total_od.csv" for all legs, "<value>_od.csv" for each leg mode or
+    purpose (`leg_filter`) or person attribute value (`person_filter`), and
+    "time_<start>_to_<end>_od.csv" for legs starting in each time slice (`time_minutes_filter`).
+    Leg and person segments are counted separately, if both filters are given (or a value would
+    clash with the total or a time slice name) their names are prefixed with the leg field or person
+    attribute, eg "mode_car_od.csv" and "subpopulation_car_od.csv". Legs with missing origin or
+    destination zones, and missing segment values, are skipped.
+
+    Args:
+        leg_filter (Optional[str], optional): segment by 'Mode' or 'Purpose'. Defaults to None.
+        person_filter (Optional[str], optional): segment by the given person attribute. Defaults to None.
+        time_minutes_filter (Optional[List[Tuple[int]]], optional): time slices (in minutes) to segment leg start times by. Defaults to None.
+        weighted (bool, optional): weight legs by the freq given to `add_person` (or the person freq) rather than counting them. Defaults to False.
+        zone (Optional[Callable[[Location], Any]], optional): map a leg location to its zone. Defaults to None, using location areas.
+
+    Raises:
+        UserWarning: Unknown `leg_filter`.
+    """
+
+    def __init__(
+        self,
+        leg_filter: Optional[str] = None,
+        person_filter: Optional[str] = None,
+        time_minutes_filter: Optional[List[Tuple[int]]] = None,
+        weighted: bool = False,
+        zone: Optional[Callable[[Location], Any]] = None,
+    ) -> None:
+        if leg_filter not in LEG_FILTERS:
+            raise UserWarning(
+                f"Unknown leg_filter: {leg_filter}, expected one of {list(LEG_FILTERS)[1:]}"
             )
-            matrix.to_csv(os.path.join(path, filter + "_od.csv"))
-        return None
-
-    elif time_minutes_filter:
-        periods = []
-        for time in time_minutes_filter:
-            periods.append(time)
-        for start_time, end_time in periods:
-            file_name = str(start_time) + "_to_" + str(end_time)
-            start_time = mtdt(start_time)
-            end_time = mtdt(end_time)
-            data_time = data_legs[
-                (data_legs["Start time"] >= start_time) & (data_legs["Start time"] < end_time)
-            ]
-            df = pd.DataFrame(data=data_time, columns=["Origin", "Destination"]).set_index("Origin")
-            matrix = df.pivot_table(
-                values="Destination",
-                index="Origin",
-                columns="Destination",
-                fill_value=0,
-                aggfunc=len,
+        self.leg_field = LEG_FILTERS[leg_filter]
+        self.person_filter = person_filter
+        self.periods = [
+            (f"time_{start}_to_{end}", mtdt(start), mtdt(end))
+            for start, end in time_minutes_filter or []
+        ]
+        self.weighted = weighted
+        self.zone = zone
+        # counts by segment, keyed by ("total", None), ("leg", value), ("person", value) or
+        # ("time", name)
+        self.counts = defaultdict(Counter)
+        # total and time slice matrices are written even if empty
+        self.counts[("total", None)]
+        for name, _, _ in self.periods:
+            self.counts[("time", name)]
+
+    def add_population(self, population: Population) -> None:
+        """Add the legs of all persons in a population, with their household freq."""
+        for household in population.households.values():
+            for person in household.people.values():
+                self.add_person(person, freq=household.freq)
+
+    def add_person(self, person: Person, freq: Optional[float] = None) -> None:
+        """Add the (selected plan) legs of a person.
+
+        Args:
+            person (Person):
+            freq (Optional[float], optional): leg weight if `weighted`, defaulting to the person freq (or 1). Defaults to None.
+        """
+        weight = 1
+        if self.weighted:
+            weight = freq if freq is not None else person.freq
+            if weight is None:
+                weight = 1
+
+        person_segment = None
+        if self.person_filter is not None:
+            person_segment = person.attributes.get(self.person_filter)
+            if _missing(person_segment):
+                person_segment = None
+
+        counts = self.counts
+        for leg in person.legs:
+            if self.zone is None:
+                od = (leg.start_location.area, leg.end_location.area)
+            else:
+                od = (self.zone(leg.start_location), self.zone(leg.end_location))
+            if _missing(od[0]) or _missing(od[1]):
+                continue
+
+            counts[("total", None)][od] += weight
+            if self.leg_field is not None:
+                value = getattr(leg, self.leg_field)
+                if not _missing(value):
+                    counts[("leg", str(value))][od] += weight
+            if person_segment is not None:
+                counts[("person", str(person_segment))][od] += weight
+            if leg.start_time is not None:
+                for name, start, end in self.periods:
+                    if start <= leg.start_time < end:
+                        counts[("time", name)][od] += weight
+
+    def name(self, segment: Tuple[str, Optional[str]]) -> str:
+        """Matrix (file) name of a segment.
+
+        Args:
+            segment (Tuple[str, Optional[str]]): segment kind ("total", "leg", "person" or "time") and value.
+
+        Returns:
+            str:
+        """
+        kind, value = segment
+        if kind == "total":
+            return "total"
+        if kind == "time":
+            return value
+        reserved = {"total", *(name for name, _, _ in self.periods)}
+        if (self.leg_field is not None and self.person_filter is not None) or value in reserved:
+            field = self.leg_field if kind == "leg" else self.person_filter
+            return f"{field}_{value}"
+        return value
+
+    def matrices(self) -> dict[str, pd.DataFrame]:
+        """Return the O-D matrices of each segment (with legs), by name (see `name`).
+
+        Matrix rows are the (sorted) origin zones and columns the (sorted) destination zones of
+        the segment legs.
+        """
+        matrices = {}
+        for segment, counts in self.counts.items():
+            origins = sorted({o for o, _ in counts})
+            destinations = sorted({d for _, d in counts})
+            origin_idx = {zone: i for i, zone in enumerate(origins)}
+            destination_idx = {zone: i for i, zone in enumerate(destinations)}
+            values = np.fromiter(counts.values(), dtype=float if self.weighted else np.int64)
+            matrix = np.zeros((len(origins), len(destinations)), dtype=values.dtype)
+            matrix[
+                np.fromiter((origin_idx[o] for o, _ in counts), dtype=np.int64, count=len(counts)),
+                np.fromiter(
+                    (destination_idx[d] for _, d in counts), dtype=np.int64, count=len(counts)
+                ),
+            ] = values
+            matrices[self.name(segment)] = pd.DataFrame(
+                matrix,
+                index=pd.Index(origins, name="Origin"),
+                columns=pd.Index(destinations, name="Destination"),
             )
-            matrix.to_csv(os.path.join(path, "time_" + file_name + "_od.csv"))
-        return None
+        return matrices
+
+    def write(self, path: str) -> None:
+        """Write the O-D matrices of each segment to "<name>_od.csv" in the `path` directory."""
+        create_local_dir(path)
+        for name, matrix in self.matrices().items():
+            matrix.to_csv(os.path.join(path, f"{name}_od.csv"))
+
+
+def _missing(value: Any) -> bool:
+    # None or NaN
+    return value is None or value != value
@@ -1,8 +1,14 @@
 from __future__ import annotations
 
+import json
 import logging
+import multiprocessing
 import os
+import queue
+import shutil
+import threading
 from datetime import datetime
+from functools import lru_cache, partial
 from pathlib import Path
 from typing import TYPE_CHECKING, Optional, Union
 from warnings import warn
@@ -14,10 +20,18 @@ if TYPE_CHECKING:
 
 from lxml import etree as et
 
-from pam.activity import Activity, Leg, Plan
-from pam.utils import DEFAULT_GZIP_COMPRESSION, create_crs_attribute, create_local_dir, is_gzip
-from pam.utils import datetime_to_matsim_time as dttm
-from pam.utils import timedelta_to_matsim_time as tdtm
+from pam.activity import Activity, LazyRoute, Leg, Plan
+from pam.report.validation import ValidationReport
+from pam.utils import (
+    create_crs_attribute,
+    create_local_dir,
+    escape_xml_attribute,
+    escape_xml_text,
+    open_output,
+)
+from pam.utils import seconds_to_matsim_time as stm
+
+HOUSEHOLD_CHUNK_SIZE = 1000
 
 
 def write_matsim(
@@ -31,7 +45,10 @@ def write_matsim(
     household_key: Optional[str] = "hid",
     keep_non_selected: bool = False,
     coordinate_reference_system: Optional[str] = None,
-) -> None:
+    workers: int = 1,
+    fast: bool = False,
+    validate: bool = False,
+) -> Optional[ValidationReport]:
     """Write a core population to matsim population v6 xml format.
     Note that this requires activity locs to be set (shapely.Point).
 
@@ -46,9 +63,15 @@ def write_matsim(
         household_key (Optional[str], optional): optionally add household id to person attributes. Defaults to "hid".
         keep_non_selected (bool, optional): Defaults to False.
         coordinate_reference_system (Optional[str], optional): optionally add CRS attribute to xml outputs. Defaults to None.
+        workers (int, optional): Number of worker processes used to serialise households. Defaults to 1.
+        fast (bool, optional): Serialise persons with string templates rather than lxml elements, see `Writer`. Defaults to False.
+        validate (bool, optional): Validate person plans as they are written, see `Writer`. Defaults to False.
 
     Raises:
         UserWarning: If population includes vehicles, `vehicles_dir` must be defined.
+
+    Returns:
+        Optional[ValidationReport]: plan validation errors, if `validate`.
     """
     if version is not None:
         warn(
@@ -59,13 +82,16 @@ def write_matsim(
     if vehs_path is None and evs_path is not None:
         raise UserWarning("You must provide a vehs_path in addition to evs_path.")
 
-    write_matsim_population_v6(
+    report = write_matsim_population_v6(
         population=population,
         path=plans_path,
         comment=comment,
         household_key=household_key,
         keep_non_selected=keep_non_selected,
         coordinate_reference_system=coordinate_reference_system,
+        workers=workers,
+        fast=fast,
+        validate=validate,
     )
 
     # write vehicles
@@ -75,6 +101,8 @@ def write_matsim(
         population.rebuild_vehicles_manager()
         population._vehicles_manager.to_xml(vehs_path, evs_path)
 
+    return report
+
 
 class Writer:
     """Context Manager for writing to xml.
@@ -94,6 +122,23 @@ class Writer:
                 pam.samplers.time.apply_jitter_to_plan(person.plan)
                 writer.add_person(household)
         ```
+
+    Gzipped outputs (.gz) are compressed in parallel threads (see `pam.utils.ParallelGzipFile`), with
+    `compression` level and `gzip_workers` threads.
+
+    With `threaded=True`, the output is written (and compressed) by a background thread, leaving the
+    calling thread free to build person elements.
+
+    With `fast=True`, persons are serialised with string templates (see `serialise_person`) rather
+    than built as lxml elements, which is several times faster and produces identical output.
+
+    Persons read with `keep_raw=True` (see `pam.read.matsim.stream_matsim_persons`) and left
+    unmodified are written verbatim from the xml they were read from.
+
+    With `validate=True`, the sequence, times and locations of each person's selected plan are
+    checked as the person is written (see `pam.activity.Plan.violations`), with errors counted in
+    `Writer.validation` (a `pam.report.validation.ValidationReport`) rather than raised. Invalid
+    plans are still written, a summary of errors is logged when the writer is closed.
     """
 
     def __init__(
@@ -103,6 +148,11 @@ class Writer:
         comment: Optional[str] = None,
         keep_non_selected: bool = False,
         coordinate_reference_system: str = None,
+        threaded: bool = False,
+        fast: bool = False,
+        compression: Optional[int] = None,
+        gzip_workers: Optional[int] = None,
+        validate: bool = False,
     ) -> None:
         if os.path.dirname(path):
             create_local_dir(os.path.dirname(path))
@@ -111,13 +161,20 @@ class Writer:
         self.comment = comment
         self.keep_non_selected = keep_non_selected
         self.coordinate_reference_system = coordinate_reference_system
-        self.compression = DEFAULT_GZIP_COMPRESSION if is_gzip(path) else 0
+        self.compression = compression
+        self.gzip_workers = gzip_workers
+        self.threaded = threaded
+        self.fast = fast
+        self.validation = ValidationReport() if validate else None
+        self.output = None
         self.xmlfile = None
         self.writer = None
         self.population_writer = None
 
     def __enter__(self) -> Writer:
-        self.xmlfile = et.xmlfile(self.path, encoding="utf-8", compression=self.compression)
+        output = BackgroundFile if self.threaded else open_output
+        self.output = output(self.path, compression=self.compression, workers=self.gzip_workers)
+        self.xmlfile = et.xmlfile(self.output, encoding="utf-8")
         self.writer = self.xmlfile.__enter__()  # enter into lxml file writer
         self.writer.write_declaration()
         self.writer.write_doctype(
@@ -139,16 +196,283 @@ class Writer:
         for _, person in household:
             if self.household_key is not None:
                 # force add hid as an attribute
-                person.attributes[self.household_key] = household.hid
+                _add_household_key(person, self.household_key, household.hid)
             self.add_person(person)
 
     def add_person(self, person) -> None:
+        if self.validation is not None:
+            self.validation.check_person(person)
+        raw = _raw_person(person, self.keep_non_selected)
+        if raw is not None:
+            self.add_serialised(raw)
+            return
+        if self.fast:
+            self.add_serialised(serialise_person(person, self.keep_non_selected))
+            return
         e = create_person_element(person.pid, person, self.keep_non_selected)
         self.writer.write(e, pretty_print=True)
 
+    def add_serialised(self, data: bytes) -> None:
+        """Write already serialised (utf-8) person elements, such as from `serialise_households`."""
+        self.writer.flush()
+        self.output.write(data)
+
     def __exit__(self, exc_type, exc_value, traceback):
         self.population_writer.__exit__(exc_type, exc_value, traceback)
         self.xmlfile.__exit__(exc_type, exc_value, traceback)
+        self.output.close()
+        if self.validation is not None and not self.validation.valid:
+            logging.warning(f"Wrote {self.path}. {self.validation}")
+
+
+class BackgroundFile:
+    """Binary file writer that writes (and optionally gzip compresses) data in a background thread.
+
+    Args:
+        path (str): output path.
+        compression (Optional[int], optional): gzip compression level, see `pam.utils.open_output`. Defaults to None.
+        workers (Optional[int], optional): gzip compression threads. Defaults to None.
+        max_queue (int, optional): maximum number of writes held in memory. Defaults to 64.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        compression: Optional[int] = None,
+        workers: Optional[int] = None,
+        max_queue: int = 64,
+    ) -> None:
+        self.file = open_output(path, compression=compression, workers=workers)
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self) -> None:
+        while True:
+            data = self.queue.get()
+            if data is None:
+                break
+            if self.error is None:
+                try:
+                    self.file.write(data)
+                except Exception as error:
+                    self.error = error
+
+    def write(self, data: bytes) -> None:
+        if self.error is not None:
+            raise self.error
+        self.queue.put(bytes(data))
+
+    def close(self) -> None:
+        self.queue.put(None)
+        self.thread.join()
+        self.file.close()
+        if self.error is not None:
+            raise self.error
+
+
+class CheckpointWriter:
+    """Context manager for writing a MATSim population in checkpointed parts, which can be resumed.
+
+    Households (or persons) are serialised into numbered part files of `chunk_size` households
+    in the `parts_dir` directory (defaulting to "<path>.parts"). Each completed part is recorded,
+    with its household ids, in a "manifest.jsonl" file. On successful exit, parts are concatenated
+    into the plans file at `path` (see `concatenate_parts`) and removed, unless `keep_parts`.
+
+    If a job fails, added households are written to a last part on exit, although households
+    added since the last completed part are lost if the process is killed. Reopening a checkpoint
+    writer for the same path resumes from the last completed part: households that have already
+    been written are skipped by `add_hh`, and can be checked for (`hid in writer`) to avoid
+    recomputing them.
+
+    Example:
+        ``` python
+        with pam.write.matsim.CheckpointWriter(PATH) as writer:
+            for hid, household in population:
+                if hid in writer:
+                    continue
+                pam.samplers.spatial.sample_locs(household)
+                writer.add_hh(household)
+        ```
+
+    Args:
+        path (str): output plans path (.xml or .xml.gz).
+        parts_dir (Optional[str], optional): directory for part files and manifest. Defaults to None, using "<path>.parts".
+        chunk_size (int, optional): number of households (or persons) in each part. Defaults to HOUSEHOLD_CHUNK_SIZE.
+        household_key (Optional[str], optional): optionally add household id to person attributes. Defaults to "hid".
+        comment (Optional[str], optional): optionally add a comment string to the xml output. Defaults to None.
+        keep_non_selected (bool, optional): Defaults to False.
+        coordinate_reference_system (Optional[str], optional): optionally add CRS attribute to xml output. Defaults to None.
+        fast (bool, optional): serialise persons with string templates, see `Writer`. Defaults to False.
+        keep_parts (bool, optional): keep the part files after concatenating them. Defaults to False.
+
+    Raises:
+        UserWarning: Resuming with different output options to the existing parts.
+    """
+
+    MANIFEST = "manifest.jsonl"
+
+    def __init__(
+        self,
+        path: str,
+        parts_dir: Optional[str] = None,
+        chunk_size: int = HOUSEHOLD_CHUNK_SIZE,
+        household_key: Optional[str] = "hid",
+        comment: Optional[str] = None,
+        keep_non_selected: bool = False,
+        coordinate_reference_system: Optional[str] = None,
+        fast: bool = False,
+        keep_parts: bool = False,
+    ) -> None:
+        self.path = path
+        self.parts_dir = parts_dir if parts_dir is not None else f"{path}.parts"
+        self.chunk_size = chunk_size
+        self.household_key = household_key
+        self.keep_non_selected = keep_non_selected
+        self.fast = fast
+        self.keep_parts = keep_parts
+        self.options = {
+            "household_key": household_key,
+            "comment": comment,
+            "keep_non_selected": keep_non_selected,
+            "coordinate_reference_system": coordinate_reference_system,
+        }
+        self.written = set()
+        self.num_parts = 0
+        self.buffer = []
+        self.buffer_ids = []
+
+    def __enter__(self) -> CheckpointWriter:
+        create_local_dir(self.parts_dir)
+        manifest_path = os.path.join(self.parts_dir, self.MANIFEST)
+        if os.path.exists(manifest_path):
+            options, parts = read_manifest(self.parts_dir)
+            if options != self.options:
+                raise UserWarning(
+                    f"Cannot resume {self.parts_dir} written with {options}, using {self.options}."
+                )
+            for part in parts:
+                self.written.update(part["ids"])
+            self.num_parts = len(parts)
+            logging.info(f"Resuming from {self.num_parts} parts ({len(self.written)} written).")
+            # drop any incomplete trailing record
+            with open(manifest_path, "w") as f:
+                for record in [self.options, *parts]:
+                    f.write(json.dumps(record) + "\n")
+        else:
+            _append_json(manifest_path, self.options)
+        return self
+
+    def __contains__(self, uid) -> bool:
+        """Check if the household (or person) `uid` has been written to a completed part."""
+        return uid in self.written
+
+    def add_hh(self, household) -> None:
+        if household.hid in self.written:
+            return
+        persons = []
+        for _, person in household:
+            if self.household_key is not None:
+                # force add hid as an attribute
+                _add_household_key(person, self.household_key, household.hid)
+            persons.append(_serialise(person, self.keep_non_selected, self.fast))
+        self.buffer.extend(persons)
+        self._added(household.hid)
+
+    def add_person(self, person) -> None:
+        if person.pid in self.written:
+            return
+        self.buffer.append(_serialise(person, self.keep_non_selected, self.fast))
+        self._added(person.pid)
+
+    def _added(self, uid) -> None:
+        self.buffer_ids.append(uid)
+        if len(self.buffer_ids) >= self.chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered households to a new part and record it in the manifest."""
+        if not self.buffer_ids:
+            return
+        name = f"part-{self.num_parts:05}.xml"
+        path = os.path.join(self.parts_dir, name)
+        with open(path + ".tmp", "wb") as f:
+            f.writelines(self.buffer)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        _append_json(
+            os.path.join(self.parts_dir, self.MANIFEST),
+            {"part": self.num_parts, "file": name, "ids": self.buffer_ids},
+        )
+        self.written.update(self.buffer_ids)
+        self.num_parts += 1
+        self.buffer = []
+        self.buffer_ids = []
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        # buffered households are complete, so are kept for resuming even if the job failed
+        self.flush()
+        if exc_type is not None:
+            return
+        concatenate_parts(self.parts_dir, self.path)
+        if not self.keep_parts:
+            shutil.rmtree(self.parts_dir)
+
+
+def read_manifest(parts_dir: str) -> tuple[dict, list[dict]]:
+    """Read the output options and completed parts of a `CheckpointWriter` parts directory.
+
+    Args:
+        parts_dir (str): parts directory.
+
+    Returns:
+        tuple[dict, list[dict]]: output options and part records (part number, file and ids), in order.
+    """
+    with open(os.path.join(parts_dir, CheckpointWriter.MANIFEST)) as f:
+        lines = f.read().splitlines()
+    options = json.loads(lines[0])
+    parts = []
+    for line in lines[1:]:
+        try:
+            part = json.loads(line)
+        except json.JSONDecodeError:
+            # a record interrupted while being written
+            break
+        if not os.path.exists(os.path.join(parts_dir, part["file"])):
+            break
+        parts.append(part)
+    return options, parts
+
+
+def concatenate_parts(
+    parts_dir: str, path: str, compression: Optional[int] = None, gzip_workers: Optional[int] = None
+) -> None:
+    """Concatenate the completed parts of a `CheckpointWriter` into a MATSim plans file.
+
+    Args:
+        parts_dir (str): parts directory.
+        path (str): output plans path (.xml or .xml.gz).
+        compression (Optional[int], optional): gzip compression level, see `Writer`. Defaults to None.
+        gzip_workers (Optional[int], optional): gzip compression threads, see `Writer`. Defaults to None.
+    """
+    options, parts = read_manifest(parts_dir)
+    with Writer(path, **options, compression=compression, gzip_workers=gzip_workers) as writer:
+        for part in parts:
+            with open(os.path.join(parts_dir, part["file"]), "rb") as f:
+                while True:
+                    data = f.read(2**20)
+                    if not data:
+                        break
+                    writer.add_serialised(data)
+
+
+def _append_json(path: str, record: dict) -> None:
+    with open(path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
 
 
 def write_matsim_population_v6(
@@ -158,7 +482,10 @@ def write_matsim_population_v6(
     comment: Optional[str] = None,
     keep_non_selected: bool = False,
     coordinate_reference_system: str = None,
-) -> None:
+    workers: int = 1,
+    fast: bool = False,
+    validate: bool = False,
+) -> Optional[ValidationReport]:
     """Write matsim population v6 xml (persons plans and attributes combined).
 
     Args:
@@ -168,16 +495,287 @@ def write_matsim_population_v6(
         comment (Optional[str], optional): optionally add a comment string to the xml outputs. Defaults to None.
         keep_non_selected (bool, optional): Defaults to False.
         coordinate_reference_system (str, optional): Defaults to None.
+        workers (int, optional): Number of worker processes used to serialise households. Workers are
+            forked so that they share the population rather than copying it, other platforms fall back
+            to serial writing. The output is identical to the serial writer. Defaults to 1.
+        fast (bool, optional): Serialise persons with string templates rather than lxml elements. Defaults to False.
+        validate (bool, optional): Validate person plans as they are written, see `Writer`. Defaults to False.
+
+    Returns:
+        Optional[ValidationReport]: plan validation errors, if `validate`.
     """
-    with Writer(
+    if workers > 1 and "fork" not in multiprocessing.get_all_start_methods():
+        logging.warning("Parallel writing requires forked processes, writing serially.")
+        workers = 1
+
+    options = dict(
         path=path,
         household_key=household_key,
         comment=comment,
         keep_non_selected=keep_non_selected,
         coordinate_reference_system=coordinate_reference_system,
-    ) as writer:
-        for _, household in population:
-            writer.add_hh(household)
+    )
+    if workers == 1:
+        with Writer(**options, fast=fast, validate=validate) as writer:
+            for _, household in population:
+                writer.add_hh(household)
+        return writer.validation
+
+    households = list(population.households.values())
+    if household_key is not None:
+        for household in households:
+            for person in household.people.values():
+                _add_household_key(person, household_key, household.hid)
+    chunk_size = max(1, min(HOUSEHOLD_CHUNK_SIZE, len(households) // (4 * workers)))
+    chunks = [(i, i + chunk_size) for i in range(0, len(households), chunk_size)]
+
+    global _households
+    _households = households
+    try:
+        # fork workers before the writer starts its background thread
+        with multiprocessing.get_context("fork").Pool(workers) as pool, Writer(
+            **options, threaded=True, validate=validate
+        ) as writer:
+            for (start, stop), data in zip(
+                chunks,
+                pool.imap(
+                    partial(serialise_households, keep_non_selected=keep_non_selected, fast=fast),
+                    chunks,
+                ),
+            ):
+                if writer.validation is not None:
+                    for household in households[start:stop]:
+                        for person in household.people.values():
+                            writer.validation.check_person(person)
+                writer.add_serialised(data)
+    finally:
+        _households = None
+    return writer.validation
+
+
+# households shared with forked worker processes by write_matsim_population_v6
+_households = None
+
+
+def serialise_households(
+    chunk: tuple[int, int], keep_non_selected: bool = False, fast: bool = False
+) -> bytes:
+    """Serialise the persons of a range of the households being written by a forked worker pool."""
+    start, stop = chunk
+    return b"".join(
+        _serialise(person, keep_non_selected, fast)
+        for household in _households[start:stop]
+        for person in household.people.values()
+    )
+
+
+def _serialise(person, keep_non_selected: bool = False, fast: bool = False) -> bytes:
+    """Serialise a person (element) to pretty printed (utf-8) xml, as written by `Writer`."""
+    raw = _raw_person(person, keep_non_selected)
+    if raw is not None:
+        return raw
+    if fast:
+        return serialise_person(person, keep_non_selected)
+    return et.tostring(
+        create_person_element(person.pid, person, keep_non_selected),
+        pretty_print=True,
+        encoding="utf-8",
+    )
+
+
+def _raw_person(person, keep_non_selected: bool = False) -> Optional[bytes]:
+    """Return the xml an unmodified person was read from (see `Person.keep_raw_xml`), if it can be written as is."""
+    raw = person.raw_xml
+    if raw is None or (person.plans_non_selected and not keep_non_selected):
+        return None
+    return raw + b"\n"
+
+
+def _add_household_key(person, key: str, hid) -> None:
+    """Add the household id to the person attributes.
+
+    The hid is derived from the household rather than a modification of the person, so the xml an
+    unmodified person was read from (see `Person.keep_raw_xml`) is kept, with the attribute added.
+    """
+    if key in person.attributes and person.attributes[key] == hid:
+        return
+    raw = person.raw_xml
+    person.attributes[key] = hid
+    if raw is None:
+        return
+    element = et.fromstring(raw)
+    attributes = element.find("attributes")
+    if attributes is None:
+        attributes = et.Element("attributes")
+        element.insert(0, attributes)
+    for attribute in attributes.findall("attribute"):
+        if attribute.get("name") == str(key):
+            attributes.remove(attribute)
+    add_attribute(attributes, key, hid)
+    person.keep_raw_xml(et.tostring(element, encoding="utf-8"))
+
+
+# plans repeat the same times, so cache their formatting
+_stm = lru_cache(maxsize=2**16)(stm)
+
+
+def serialise_person(person, keep_non_selected: bool = False) -> bytes:
+    """Serialise a person to (utf-8) MATSim xml using string templates.
+
+    The output is identical to pretty printing `create_person_element`, including libxml2's handling
+    of (parsed) routes with surrounding whitespace, but avoids building an element tree. Persons with
+    routes that contain child elements are serialised with lxml.
+
+    Args:
+        person (Person):
+        keep_non_selected (bool, optional): Defaults to False.
+
+    Returns:
+        bytes: person element.
+    """
+    plans = [person.plan, *person.plans_non_selected] if keep_non_selected else [person.plan]
+    for plan in plans:
+        for leg in plan.legs:
+            xml = _route_xml(leg.route)
+            if xml is not None and len(xml):
+                return et.tostring(
+                    create_person_element(person.pid, person, keep_non_selected),
+                    pretty_print=True,
+                    encoding="utf-8",
+                )
+
+    lines = [f"<person{_attributes({'id': str(person.pid)})}>"]
+    attributes = []
+    if person.vehicles:
+        vehicles = str({k: v.vid for k, v in person.vehicles.items()}).replace("'", '"')
+        attributes.append(
+            _attribute_element("org.matsim.vehicles.PersonVehicles", "vehicles", vehicles)
+        )
+    for k, v in person.attributes.items():
+        attributes.append(_attribute_element(*_attribute_class(k, v), str(v)))
+    if attributes:
+        lines.append("  <attributes>")
+        lines.extend(f"    {attribute}" for attribute in attributes)
+        lines.append("  </attributes>")
+    else:
+        lines.append("  <attributes/>")
+
+    _serialise_plan(lines, person.plan, selected=True)
+    if keep_non_selected:
+        for plan in person.plans_non_selected:
+            _serialise_plan(lines, plan, selected=False)
+    lines.append("</person>\n")
+    return "\n".join(lines).encode()
+
+
+def _serialise_plan(lines: list[str], plan: Plan, selected: Optional[bool] = None) -> None:
+    plan_attributes = {}
+    if selected is not None:
+        plan_attributes["selected"] = {True: "yes", False: "no"}[selected]
+    if plan.score is not None:
+        plan_attributes["score"] = str(plan.score)
+    if not plan.day:
+        lines.append(f"  <plan{_attributes(plan_attributes)}/>")
+        return
+
+    lines.append(f"  <plan{_attributes(plan_attributes)}>")
+    for component in plan:
+        if isinstance(component, Activity):
+            component.validate_matsim()
+            # times and coordinates never need escaping
+            act = f'    <activity type="{escape_xml_attribute(component.act)}"'
+            if component.start_s is not None:
+                act += f' start_time="{_stm(component.start_s)}"'
+            if component.end_s is not None:
+                act += f' end_time="{_stm(component.end_s)}"'
+            location = component.location
+            if location.link is not None:
+                act += f' link="{escape_xml_attribute(str(location.link))}"'
+            loc = location.loc
+            if loc:
+                act += f' x="{loc.x}" y="{loc.y}"'
+            lines.append(act + "/>")
+
+        if isinstance(component, Leg):
+            lines.append(_serialise_leg(component))
+    lines.append("  </plan>")
+
+
+def _serialise_leg(leg: Leg) -> str:
+    start = f'<leg mode="{escape_xml_attribute(leg.mode)}" trav_time="{_stm(leg.duration_s)}"'
+    attributes = []
+    if leg.attributes:
+        for k, v in leg.attributes.items():
+            if k == "enterVehicleTime":
+                attributes.append(_attribute_element("java.lang.Double", str(k), str(v)))
+            else:
+                attributes.append(_attribute_element(*_attribute_class(k, v), str(v)))
+
+    route = None
+    formatted = True
+    if leg.route.exists:
+        xml = _route_xml(leg.route)
+        if xml is None:
+            route = _text_element("route", leg.route.attrib, leg.route.text)
+        else:
+            # as libxml2, only pretty print elements without text content
+            formatted = not xml.tail
+            route = et.tostring(xml, encoding="unicode", with_tail=True)
+
+    if not attributes and route is None:
+        return f"    {start}/>"
+    if not formatted:
+        content = f"<attributes>{''.join(attributes)}</attributes>" if attributes else ""
+        return f"    {start}>{content}{route}</leg>"
+    lines = [f"    {start}>"]
+    if attributes:
+        lines.append("      <attributes>")
+        lines.extend(f"        {attribute}" for attribute in attributes)
+        lines.append("      </attributes>")
+    if route is not None:
+        lines.append(f"      {route}")
+    lines.append("    </leg>")
+    return "\n".join(lines)
+
+
+def _route_xml(route) -> Optional[et._Element]:
+    """Route element, if it exists and has been built (lazy routes are serialised from attributes and text)."""
+    if not route.exists:
+        return None
+    if isinstance(route, LazyRoute):
+        return route._xml
+    return route.xml
+
+
+def _attribute_class(k, v) -> tuple[str, str]:
+    # as add_attribute
+    if isinstance(v, str):
+        return "java.lang.String", str(k)
+    if isinstance(v, bool):
+        return "java.lang.Boolean", str(k)
+    if isinstance(v, int):
+        return "java.lang.Integer", str(k)
+    if isinstance(v, float):
+        return "java.lang.Double", str(k)
+    if k == "vehicles":
+        return "org.matsim.vehicles.PersonVehicles", "vehicles"
+    return "java.lang.String", str(k)
+
+
+def _attribute_element(cls: str, name: str, text: str) -> str:
+    if cls == "org.matsim.vehicles.PersonVehicles":
+        text = text.replace("'", '"')
+    return f'<attribute class="{cls}" name="{escape_xml_attribute(name)}">{escape_xml_text(text)}</attribute>'
+
+
+def _text_element(tag: str, attributes: dict, text: Optional[str]) -> str:
+    if text is None:
+        return f"<{tag}{_attributes(attributes)}/>"
+    return f"<{tag}{_attributes(attributes)}>{escape_xml_text(text)}</{tag}>"
+
+
+def _attributes(attributes: dict) -> str:
+    return "".join(f' {k}="{escape_xml_attribute(str(v))}"' for k, v in attributes.items())
 
 
 def create_person_element(pid, person, keep_non_selected: bool = False):
@@ -214,10 +812,10 @@ def write_plan(person_xml: et.SubElement, plan: Plan, selected: Optional[bool] =
         if isinstance(component, Activity):
             component.validate_matsim()
             act_data = {"type": component.act}
-            if component.start_time is not None:
-                act_data["start_time"] = dttm(component.start_time)
-            if component.end_time is not None:
-                act_data["end_time"] = dttm(component.end_time)
+            if component.start_s is not None:
+                act_data["start_time"] = stm(component.start_s)
+            if component.end_s is not None:
+                act_data["end_time"] = stm(component.end_s)
             if component.location.link is not None:
                 act_data["link"] = str(component.location.link)
             if component.location.x is not None:
@@ -228,7 +826,7 @@ def write_plan(person_xml: et.SubElement, plan: Plan, selected: Optional[bool] =
 
         if isinstance(component, Leg):
             leg = et.SubElement(
-                plan_xml, "leg", {"mode": component.mode, "trav_time": tdtm(component.duration)}
+                plan_xml, "leg", {"mode": component.mode, "trav_time": stm(component.duration_s)}
             )
 
             if component.attributes:
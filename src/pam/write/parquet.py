@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import json
+import os
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from pam.core import Person, Population
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from pam import utils
+from pam.activity import Activity, Leg, Plan
+
+# parquet table schemas, times are seconds since the start of the simulation
+PARQUET_SCHEMAS = {
+    "persons": pa.schema(
+        [
+            ("pid", pa.string()),
+            ("hid", pa.string()),
+            ("freq", pa.float64()),
+            ("attributes", pa.string()),
+        ]
+    ),
+    "plans": pa.schema(
+        [
+            ("pid", pa.string()),
+            ("plan", pa.int32()),
+            ("selected", pa.bool_()),
+            ("score", pa.float64()),
+        ]
+    ),
+    "activities": pa.schema(
+        [
+            ("pid", pa.string()),
+            ("plan", pa.int32()),
+            ("seq", pa.int32()),
+            ("act", pa.string()),
+            ("x", pa.float64()),
+            ("y", pa.float64()),
+            ("link", pa.string()),
+            ("start_time", pa.int64()),
+            ("end_time", pa.int64()),
+        ]
+    ),
+    "legs": pa.schema(
+        [
+            ("pid", pa.string()),
+            ("plan", pa.int32()),
+            ("seq", pa.int32()),
+            ("mode", pa.string()),
+            ("purp", pa.string()),
+            ("start_time", pa.int64()),
+            ("end_time", pa.int64()),
+            ("distance", pa.float64()),
+            ("attributes", pa.string()),
+        ]
+    ),
+    "routes": pa.schema(
+        [
+            ("pid", pa.string()),
+            ("plan", pa.int32()),
+            ("seq", pa.int32()),
+            ("type", pa.string()),
+            ("start_link", pa.string()),
+            ("end_link", pa.string()),
+            ("distance", pa.float64()),
+            ("attributes", pa.string()),
+            ("text", pa.string()),
+        ]
+    ),
+}
+
+
+def write_parquet(
+    population: Population, dir: str, household_key: Optional[str] = None, batch_size: int = 100000
+) -> None:
+    """Write a population to partitioned parquet tables.
+
+    Each table (persons, plans, activities, legs and routes) is written to a sub directory of `dir`
+    as a sequence of parquet part files of (at most) `batch_size` persons. Tables can be read with
+    `pam.read.read_parquet` or as parquet datasets, eg `pd.read_parquet(os.path.join(dir, "legs"))`.
+    Household frequencies and person vehicles are not written. For the (selected plan) legs, trips
+    and activities tables see `pam.write.diary_to_parquet` and `pam.write.DiaryWriter`.
+
+    Args:
+        population (Population):
+        dir (str): path to output directory.
+        household_key (Optional[str], optional): Person attribute used as household id, if not given the population household ids are used. Defaults to None.
+        batch_size (int, optional): Number of persons written to each part file. Defaults to 100000.
+    """
+    with ParquetWriter(dir, household_key=household_key, batch_size=batch_size) as writer:
+        for hid, _, person in population.people():
+            writer.add_person(person, hid=hid)
+
+
+class BatchedTableWriter:
+    """Base class for writers accumulating persons as records of one or more tables, flushing the
+    records to part files every `batch_size` persons.
+
+    Subclasses add the records of each person to `records` (by table) and then call `added`. Each
+    flush writes the records of each table with `write_table`, by default as a parquet part file of
+    the table sub directory (`part_path`), converting records with `to_table`.
+
+    Args:
+        dir (str): path to output directory.
+        schemas (dict[str, pa.Schema]): schema of each table.
+        batch_size (int, optional): Number of persons written to each part file. Defaults to 100000.
+        parts (bool, optional): create a sub directory for the part files of each table. Defaults to True.
+    """
+
+    def __init__(
+        self, dir: str, schemas: dict[str, pa.Schema], batch_size: int = 100000, parts: bool = True
+    ):
+        self.dir = dir
+        self.schemas = schemas
+        self.batch_size = batch_size
+        self.part = 0
+        self.size = 0
+        self.records = {table: [] for table in schemas}
+        utils.create_local_dir(dir)
+        if parts:
+            for table in schemas:
+                utils.create_local_dir(os.path.join(dir, table))
+
+    def added(self) -> None:
+        """Record that a person has been added, flushing a full batch."""
+        self.size += 1
+        if self.size >= self.batch_size:
+            self.flush()
+
+    def to_table(self, table: str, records: list) -> pa.Table:
+        """Convert the records of a table to an arrow table."""
+        return pa.Table.from_pylist(records, schema=self.schemas[table])
+
+    def part_path(self, table: str) -> str:
+        return os.path.join(self.dir, table, f"part-{self.part:05}.parquet")
+
+    def write_table(self, table: str, records: list) -> None:
+        pq.write_table(self.to_table(table, records), self.part_path(table))
+
+    def flush(self) -> None:
+        # a first (empty) part is written so that empty tables can be read
+        if not self.size and self.part:
+            return
+        for table, records in self.records.items():
+            self.write_table(table, records)
+        self.records = {table: [] for table in self.schemas}
+        self.part += 1
+        self.size = 0
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self) -> BatchedTableWriter:
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+
+
+class ParquetWriter(BatchedTableWriter):
+    """Accumulate persons as table records, flushing them to parquet part files every `batch_size` persons.
+
+    Persons are given the household id `hid`, or their `household_key` attribute if set, falling back
+    to their own person id.
+    """
+
+    def __init__(self, dir: str, household_key: Optional[str] = None, batch_size: int = 100000):
+        super().__init__(dir, PARQUET_SCHEMAS, batch_size=batch_size)
+        self.household_key = household_key
+
+    def add_person(self, person: Person, hid: Optional[str] = None) -> None:
+        if self.household_key is not None:
+            hid = person.attributes.get(self.household_key, hid)
+        if hid is None:
+            hid = person.pid
+        self.records["persons"].append(
+            {
+                "pid": person.pid,
+                "hid": str(hid),
+                "freq": person.freq,
+                "attributes": json.dumps(dict(person.attributes)),
+            }
+        )
+        self.add_plan(person.pid, person.plan, 0, selected=True)
+        for idx, plan in enumerate(person.plans_non_selected, 1):
+            self.add_plan(person.pid, plan, idx, selected=False)
+        self.added()
+
+    def add_plan(self, pid: str, plan: Plan, idx: int, selected: bool) -> None:
+        self.records["plans"].append(
+            {"pid": pid, "plan": idx, "selected": selected, "score": plan.score}
+        )
+        for component in plan:
+            record = {
+                "pid": pid,
+                "plan": idx,
+                "seq": component.seq,
+                "start_time": component.start_s,
+                "end_time": component.end_s,
+            }
+            if isinstance(component, Activity):
+                self.records["activities"].append(
+                    {
+                        **record,
+                        "act": component.act,
+                        "x": component.location.x,
+                        "y": component.location.y,
+                        "link": component.location.link,
+                    }
+                )
+            elif isinstance(component, Leg):
+                self.records["legs"].append(
+                    {
+                        **record,
+                        "mode": component.mode,
+                        "purp": component.purp,
+                        "distance": component._distance,
+                        "attributes": json.dumps(component.attributes),
+                    }
+                )
+                route = component.route
+                if route.exists:
+                    self.records["routes"].append(
+                        {
+                            "pid": pid,
+                            "plan": idx,
+                            "seq": component.seq,
+                            "type": route.type,
+                            "start_link": route.get("start_link"),
+                            "end_link": route.get("end_link"),
+                            "distance": route.distance,
+                            "attributes": json.dumps(route.attrib),
+                            "text": route.text,
+                        }
+                    )
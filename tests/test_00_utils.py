@@ -1,6 +1,8 @@
+import gzip
 from datetime import datetime, timedelta
 from pathlib import Path
 
+import lxml
 import numpy as np
 import pandas as pd
 import pytest
@@ -283,6 +285,19 @@ def test_matsim_time_day_three():
     assert dt == datetime(1900, 1, 3, 1, 1, 2)
 
 
+@pytest.mark.parametrize("seconds", [0, 59, 3600, 43262, 90061, 176461])
+def test_seconds_match_matsim_time(seconds):
+    td = timedelta(seconds=seconds)
+    assert utils.seconds_to_matsim_time(seconds) == utils.timedelta_to_matsim_time(td)
+    assert utils.matsim_time_to_seconds(utils.seconds_to_matsim_time(seconds)) == seconds
+
+
+def test_seconds_to_and_from_datetime_past_midnight():
+    dt = utils.matsim_time_to_datetime("25:01:02")
+    assert utils.datetime_to_seconds(dt) == 90062
+    assert utils.seconds_to_datetime(90062) == dt
+
+
 def test_parser_does_not_delete_current_element(test_trips_pathv12):
     """The xml iterparse should not delete the current element,
         as this leads to memory errors.
@@ -295,6 +310,65 @@ def test_parser_does_not_delete_current_element(test_trips_pathv12):
             assert element.getparent()[0] != element
 
 
+def test_get_elems_streams_gzipped_xml(test_trips_pathv12, tmp_path):
+    gzipped = tmp_path / "plans.xml.gz"
+    with open(test_trips_pathv12, "rb") as f, gzip.open(gzipped, "wb") as g:
+        g.write(f.read())
+    expected = [e.get("id") for e in utils.get_elems(test_trips_pathv12, "person")]
+    assert [e.get("id") for e in utils.get_elems(gzipped, "person")] == expected
+
+
+def test_get_elems_gzipped_xml_with_namespace(all_vehicle_xml_path, tmp_path):
+    gzipped = tmp_path / "vehicles.xml.gz"
+    with open(all_vehicle_xml_path, "rb") as f, gzip.open(gzipped, "wb") as g:
+        g.write(f.read())
+    assert [e.get("id") for e in utils.get_elems(gzipped, "vehicle")] == [
+        "Eddy",
+        "Stevie",
+        "Vladya",
+    ]
+
+
+def test_get_elem_attributes_gzipped_xml_with_namespace(all_vehicle_xml_path, tmp_path):
+    gzipped = tmp_path / "vehicles.xml.gz"
+    with open(all_vehicle_xml_path, "rb") as f, gzip.open(gzipped, "wb") as g:
+        g.write(f.read())
+    expected = [dict(e.attrib) for e in utils.get_elems(all_vehicle_xml_path, "vehicle")]
+    assert list(utils.get_elem_attributes(gzipped, "vehicle", block_size=16)) == expected
+    assert [a["id"] for a in expected] == ["Eddy", "Stevie", "Vladya"]
+
+
+@pytest.mark.parametrize("value", ["plain", 'a&b<c>"d"', "new\nline\ttab\rreturn", "unicode ü €"])
+def test_escape_xml_matches_lxml(value):
+    elem = lxml.etree.Element("e", {"a": value})
+    elem.text = value
+    assert lxml.etree.tostring(elem, encoding="unicode") == (
+        f'<e a="{utils.escape_xml_attribute(value)}">{utils.escape_xml_text(value)}</e>'
+    )
+
+
+def test_get_elems_yields_before_reading_whole_file(test_trips_pathv12, tmp_path):
+    truncated = tmp_path / "plans.xml.gz"
+    with open(test_trips_pathv12, "rb") as f:
+        xml = f.read()
+    with gzip.open(truncated, "wb") as g:
+        g.write(xml[: len(xml) // 2])
+    elements = utils.get_elems(truncated, "person")
+    assert next(elements).get("id") == "chris"
+    with pytest.raises(lxml.etree.XMLSyntaxError):
+        list(elements)
+
+
+def test_sniff_tag_without_namespace(test_trips_pathv12):
+    with utils.open_xml(test_trips_pathv12) as f:
+        assert utils.sniff_tag(f, "person") == "person"
+
+
+def test_sniff_tag_with_namespace(all_vehicle_xml_path):
+    with utils.open_xml(all_vehicle_xml_path) as f:
+        assert utils.sniff_tag(f, "vehicle") == "{http://www.matsim.org/files/dtd}vehicle"
+
+
 @pytest.mark.parametrize(
     ["input", "expected_times"],
     [
@@ -339,6 +413,21 @@ def test_safe_strpdelta_malformed_input(input):
         utils.safe_strpdelta(input)
 
 
+def test_safe_strptime_is_cached():
+    utils.safe_strptime.cache_clear()
+    first = utils.safe_strptime("07:30:00")
+    assert utils.safe_strptime("07:30:00") is first
+    assert utils.safe_strptime.cache_info().hits == 1
+
+
+def test_safe_strpdelta_malformed_input_is_not_cached():
+    utils.safe_strpdelta.cache_clear()
+    for _ in range(2):
+        with pytest.raises(UserWarning):
+            utils.safe_strpdelta("250000")
+    assert utils.safe_strpdelta.cache_info().currsize == 0
+
+
 @pytest.mark.parametrize(
     ["file", "is_xml"],
     [
@@ -401,3 +490,31 @@ def test_parse_time(a, expected):
 def test_parse_time_fail(input, input_type):
     with pytest.raises(TypeError, match=f"Cannot parse {input} of type <class '{input_type}'>*"):
         utils.parse_time(input)
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_parallel_gzip_file_writes_multi_member_gzip(tmp_path, workers):
+    path = tmp_path / "test.xml.gz"
+    data = b"".join(f"<line id='{i}'/>\n".encode() for i in range(10000))
+    with utils.ParallelGzipFile(path, workers=workers, block_size=2**12) as f:
+        for i in range(0, len(data), 1000):
+            f.write(data[i : i + 1000])
+    assert path.read_bytes().count(utils.GZIP_MAGIC + b"\x08") > 1
+    with gzip.open(path) as f:
+        assert f.read() == data
+    assert utils.try_unzip(path).read() == data
+
+
+def test_parallel_gzip_file_writes_empty_gzip(tmp_path):
+    path = tmp_path / "test.xml.gz"
+    utils.ParallelGzipFile(path).close()
+    with gzip.open(path) as f:
+        assert f.read() == b""
+
+
+@pytest.mark.parametrize(["name", "gzipped"], [("test.xml", False), ("test.xml.gz", True)])
+def test_open_output_compresses_gzip_paths(tmp_path, name, gzipped):
+    path = tmp_path / name
+    with utils.open_output(path) as f:
+        f.write(b"<xml/>")
+    assert path.read_bytes().startswith(utils.GZIP_MAGIC) == gzipped
@@ -1,3 +1,5 @@
+import pickle
+from copy import deepcopy
 from datetime import datetime, timedelta
 
 import pytest
@@ -7,6 +9,7 @@ from pam.core import Household, Person, Population
 from pam.utils import minutes_to_datetime as mtdt
 from pam.utils import timedelta_to_matsim_time as tdtm
 from pam.variables import END_OF_DAY
+from shapely.geometry import Point
 
 testdata = [
     (0, datetime(1900, 1, 1, 0, 0)),
@@ -639,3 +642,98 @@ def test_get_atributes():
     hh.add(Person("2", attributes={"subpopulation": "C", "age": 30}))
     pop.add(hh)
     assert pop.attributes == {"subpopulation": {"A", "B", "C"}, "age": {"10", "20", "30"}}
+
+
+@pytest.fixture
+def commuter_population():
+    person = Person("1", attributes={"subpopulation": "low"})
+    person.add(Activity(1, "home", "a", start_time=mtdt(0), end_time=mtdt(480)))
+    person.add(Leg(1, "car", "a", "b", start_time=mtdt(480), end_time=mtdt(510)))
+    person.add(Activity(2, "work", "b", start_time=mtdt(510), end_time=mtdt(1020)))
+    person.add(Leg(2, "car", "b", "a", start_time=mtdt(1020), end_time=mtdt(1050)))
+    person.add(Activity(3, "home", "a", start_time=mtdt(1050), end_time=END_OF_DAY))
+    household = Household("1", freq=2)
+    household.add(person)
+    population = Population()
+    population.add(household)
+    return population
+
+
+def test_population_aggregates_are_cached(commuter_population, mocker):
+    assert commuter_population.mode_classes == {"car"}
+    people = mocker.spy(commuter_population, "people")
+    assert commuter_population.mode_classes == {"car"}
+    assert people.call_count == 0
+    for _ in range(2):
+        assert commuter_population.activity_classes == {"home", "work"}
+        assert commuter_population.subpopulations == {"low"}
+    assert people.call_count == 2
+
+
+def test_cached_aggregates_are_copies(commuter_population):
+    commuter_population.mode_classes.add("bus")
+    commuter_population.stats["num_legs"] = 0
+    assert commuter_population.mode_classes == {"car"}
+    assert commuter_population.stats["num_legs"] == 2
+
+
+def test_population_aggregates_follow_plan_modifications(commuter_population):
+    assert commuter_population.stats["num_activities"] == 3
+    plan = commuter_population["1"]["1"].plan
+    plan.mode_shift(1, "bus")
+    assert commuter_population.mode_classes == {"bus"}
+    plan.day[2].act = "shop"
+    assert commuter_population.activity_classes == {"home", "shop"}
+    plan.fill_plan(*plan.remove_activity(2))
+    assert commuter_population.stats["num_activities"] == 1
+    assert commuter_population.activity_classes == {"home"}
+
+
+def test_population_aggregates_follow_population_modifications(commuter_population):
+    assert commuter_population.size == 2
+    assert len(commuter_population) == 1
+    commuter_population["1"].hh_freq = 3
+    assert commuter_population.size == 3
+    commuter_population.add(Person("2", attributes={"subpopulation": "high"}))
+    assert len(commuter_population) == 2
+    assert commuter_population.num_households == 2
+    assert commuter_population.subpopulations == {"low", "high"}
+    commuter_population["2"]["2"].attributes = {"subpopulation": "none"}
+    assert commuter_population.subpopulations == {"low", "none"}
+
+
+def test_population_aggregates_follow_in_place_modifications(commuter_population):
+    assert commuter_population.subpopulations == {"low"}
+    commuter_population["1"]["1"].attributes["subpopulation"] = "high"
+    assert commuter_population.subpopulations == {"high"}
+    commuter_population.add(Household("2"))
+    assert commuter_population.num_households == 2
+    del commuter_population.households["2"]
+    assert commuter_population.num_households == 1
+
+
+def test_population_aggregates_survive_reporting(commuter_population, mocker):
+    for component in commuter_population["1"]["1"].plan:
+        for location in ("location", "start_location", "end_location"):
+            if hasattr(component, location):
+                getattr(component, location).loc = Point(0, 0)
+    assert commuter_population.mode_classes == {"car"}
+    commuter_population.trips_df()
+    commuter_population.legs_df()
+    Person("2", attributes={"subpopulation": "high"})
+    people = mocker.spy(commuter_population, "people")
+    assert commuter_population.mode_classes == {"car"}
+    assert people.call_count == 0
+
+
+def test_population_aggregates_are_tracked_per_population(commuter_population):
+    assert commuter_population.mode_classes == {"car"}
+    copied = deepcopy(commuter_population)
+    unpickled = pickle.loads(pickle.dumps(commuter_population))
+    copied["1"]["1"].plan.mode_shift(1, "bus")
+    assert copied.mode_classes == {"bus"}
+    assert unpickled.mode_classes == {"car"}
+    assert commuter_population.mode_classes == {"car"}
+    unpickled["1"]["1"].plan.day[1].mode = "walk"
+    assert unpickled.mode_classes == {"walk", "car"}
+    assert commuter_population.mode_classes == {"car"}
@@ -1,9 +1,11 @@
+import pickle
+from copy import deepcopy
 from datetime import timedelta
 
 import pytest
-from pam.activity import Activity, Leg, Location, Plan
+from pam.activity import EMPTY_ATTRIBUTES, Activity, Leg, Location, Plan, Route
 from pam.utils import minutes_to_datetime as mtdt
-from pam.variables import END_OF_DAY
+from pam.variables import END_OF_DAY, SECONDS_PER_DAY
 
 
 def test_act_init():
@@ -157,3 +159,101 @@ def test_plan_contains_false():
     plan.add(act)
     act = Activity(start_time=0, loc=1)
     assert act not in plan
+
+
+def test_components_and_locations_are_slotted():
+    for obj in (Activity(1, "home", 1), Leg(1, "car"), Location(area=1)):
+        assert not hasattr(obj, "__dict__")
+
+
+def test_legs_share_read_only_empty_attributes():
+    leg = Leg(1, "car")
+    assert leg._attributes is EMPTY_ATTRIBUTES
+    assert Leg(2, "bus")._attributes is EMPTY_ATTRIBUTES
+    assert leg.attributes == {}
+    with pytest.raises(TypeError):
+        EMPTY_ATTRIBUTES["distance"] = 1
+
+
+@pytest.mark.parametrize(
+    "modify",
+    [
+        lambda attributes: attributes.__setitem__("distance", 1),
+        lambda attributes: attributes.update({"distance": 1}),
+        lambda attributes: attributes.setdefault("distance", 1),
+    ],
+)
+def test_empty_leg_attributes_are_writable(modify):
+    leg, other = Leg(1, "car"), Leg(2, "bus")
+    modify(leg.attributes)
+    assert leg.attributes == {"distance": 1}
+    assert other.attributes == {}
+    assert other._attributes is EMPTY_ATTRIBUTES
+    assert EMPTY_ATTRIBUTES == {}
+
+
+def test_leg_attributes_can_be_replaced():
+    leg = Leg(1, "car")
+    leg.attributes = {"distance": 1}
+    assert leg.attributes == {"distance": 1}
+    leg.attributes = Leg(2, "bus").attributes
+    assert leg._attributes is EMPTY_ATTRIBUTES
+
+
+def test_copied_legs_keep_empty_attributes():
+    leg = Leg(1, "car", start_area=1, end_area=2, start_time=mtdt(0), end_time=mtdt(10))
+    for copied in (deepcopy(leg), pickle.loads(pickle.dumps(leg))):
+        assert copied == leg
+        assert copied._attributes is EMPTY_ATTRIBUTES
+
+
+def test_components_and_locations_accept_state_pickled_before_slots():
+    location = Location.__new__(Location)
+    location.__setstate__({"loc": None, "link": "1-2", "area": "a"})
+    assert location.link == "1-2"
+
+    leg = Leg.__new__(Leg)
+    leg.__setstate__(
+        {
+            "seq": 1,
+            "purp": None,
+            "mode": "car",
+            "start_location": location,
+            "end_location": Location(area="b"),
+            "start_time": mtdt(0),
+            "end_time": mtdt(10),
+            "freq": None,
+            "_distance": None,
+            "attributes": {},
+            "route": Route(),
+        }
+    )
+    assert leg == Leg(1, "car", start_area="a", end_area="b", start_time=mtdt(0), end_time=mtdt(10))
+    assert leg.end_s == 600
+    leg.attributes["distance"] = 1
+    assert leg.attributes == {"distance": 1}
+
+
+def test_component_times_are_held_as_seconds():
+    act = Activity(1, "home", 1, start_time=mtdt(0), end_time=mtdt(90))
+    assert act.start_s == 0
+    assert act.end_s == 5400
+    assert act.duration_s == 5400
+    assert act.duration == timedelta(minutes=90)
+    assert act.end_time == mtdt(90)
+
+    act.end_time = END_OF_DAY
+    assert act.end_s == SECONDS_PER_DAY
+
+
+def test_component_times_accept_seconds():
+    leg = Leg(1, "car", start_time=60, end_time=120)
+    assert leg.start_time == mtdt(1)
+    assert leg.end_time == mtdt(2)
+    assert Leg(1, "car").start_s is None
+
+
+def test_component_times_drop_sub_seconds():
+    act = Activity(1, "home", 1, start_time=mtdt(0) + timedelta(seconds=1.5))
+    assert act.start_s == 1
+    assert act.start_time == mtdt(0) + timedelta(seconds=1)
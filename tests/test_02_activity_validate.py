@@ -206,3 +206,22 @@ def test_invalid_not_end_with_act():
 
 def test_validate_sequence(person_heh):
     assert person_heh.validate()
+
+
+def test_valid_plan_violations(person_heh):
+    assert person_heh.plan.violations() == []
+
+
+def test_plan_violations(
+    act_act_sequence,
+    leg_leg_sequence,
+    act_leg_act_leg_act_bad_times,
+    act_leg_act_leg_act_bad_locations1,
+    act_leg_act_leg_act_bad_locations2,
+):
+    assert act_act_sequence.plan.violations() == ["sequence"]
+    assert leg_leg_sequence.plan.violations() == ["sequence", "times"]
+    assert act_leg_act_leg_act_bad_times.plan.violations() == ["times"]
+    assert act_leg_act_leg_act_bad_locations1.plan.violations() == ["locations"]
+    assert act_leg_act_leg_act_bad_locations2.plan.violations() == ["locations"]
+    assert Plan().violations() == ["sequence"]
@@ -1,13 +1,26 @@
+import gzip
+import pickle
+
 import pytest
 from lxml import etree as et
-from pam.activity import Plan
+from pam.activity import LazyRoute, Plan
+from pam.categories import CategoryRegistry
+from pam.operations.convert import matsim_selected_plans
 from pam.read import (
+    build_person_index,
     get_attributes_from_person,
     load_attributes_map,
+    load_person_index,
+    matsim,
     parse_veh_attribute,
     read_matsim,
+    read_matsim_persons,
     stream_matsim_persons,
 )
+from pam.read.matsim import _person_chunks, _person_elements, selected_plans
+from pam.utils import get_elems
+from pam.vehicles import VehicleManager
+from pam.write import write_matsim
 
 test_trips_path = pytest.test_data_dir / "test_matsim_plans.xml"
 test_tripsv12_path = pytest.test_data_dir / "test_matsim_plansv12.xml"
@@ -191,6 +204,277 @@ def test_stream_transit_v12_matsim():
     assert legs[1].route.network_route == []
 
 
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"plans_path": test_tripsv12_path},
+        {"plans_path": test_trips_path, "attributes_path": test_attributes_path, "version": 11},
+    ],
+)
+def test_lazy_routes_match_eager_routes(kwargs):
+    eager = read_matsim(**kwargs)
+    lazy = read_matsim(lazy_routes=True, **kwargs)
+    eager_legs = [leg for _, _, person in eager.people() for leg in person.legs]
+    lazy_legs = [leg for _, _, person in lazy.people() for leg in person.legs]
+    assert len(lazy_legs) == len(eager_legs)
+    for lazy_leg, eager_leg in zip(lazy_legs, eager_legs):
+        assert lazy_leg.route.exists == eager_leg.route.exists
+        assert lazy_leg.route.type == eager_leg.route.type
+        assert lazy_leg.route.distance == eager_leg.route.distance
+        assert lazy_leg.route.network_route == eager_leg.route.network_route
+        assert lazy_leg.route.transit == eager_leg.route.transit
+        assert lazy_leg.start_location.link == eager_leg.start_location.link
+
+
+def test_lazy_routes_do_not_build_xml_until_required():
+    person = next(stream_matsim_persons(test_tripsv12_path, lazy_routes=True))
+    leg = list(person.legs)[1]
+    assert isinstance(leg.route, LazyRoute)
+    assert leg.network_route == ["3-4", "4-3", "3-2", "2-1", "1-2"]
+    assert leg.route._xml is None
+    assert leg.route.xml.get("distance") == "10300.0"
+
+
+def test_lazy_routes_pickle():
+    person = next(stream_matsim_persons(test_tripsv12_path, lazy_routes=True))
+    leg = list(person.legs)[1]
+    leg.route.xml  # built routes are serialised
+    unpickled = pickle.loads(pickle.dumps(leg.route))
+    assert unpickled.network_route == leg.route.network_route
+    assert et.tostring(unpickled.xml) == et.tostring(leg.route.xml)
+
+
+def test_lazy_routes_write_equivalent_xml(tmp_path):
+    parser = et.XMLParser(remove_blank_text=True, remove_comments=True)
+    written = []
+    for lazy_routes in [False, True]:
+        path = tmp_path / f"{lazy_routes}.xml"
+        write_matsim(read_matsim(test_tripsv12_path, lazy_routes=lazy_routes), path)
+        written.append(et.tostring(et.parse(str(path), parser)))
+    assert written[0] == written[1]
+
+
+def test_stream_matsim_persons_with_fields_projection():
+    fields = {"person": ["subpopulation"], "act": ["type", "x", "y", "end_time"], "leg": ["mode"]}
+    projected = {p.pid: p for p in stream_matsim_persons(test_tripsv12_path, fields=fields)}
+    full = {p.pid: p for p in stream_matsim_persons(test_tripsv12_path)}
+    assert projected["chris"].attributes == {"subpopulation": "rich"}
+    for pid, person in projected.items():
+        assert [a.act for a in person.activities] == [a.act for a in full[pid].activities]
+        assert [a.location.loc for a in person.activities] == [
+            a.location.loc for a in full[pid].activities
+        ]
+        assert [a.end_time for a in person.activities] == [a.end_time for a in full[pid].activities]
+        assert all(a.location.link is None for a in person.activities)
+        assert [leg.mode for leg in person.legs] == [leg.mode for leg in full[pid].legs]
+        assert all(not leg.route.exists and leg.attributes == {} for leg in person.legs)
+
+
+def test_stream_matsim_persons_with_empty_person_projection():
+    person = next(stream_matsim_persons(test_tripsv12_path, fields={"person": [], "leg": []}))
+    assert person.attributes == {}
+    assert [leg.mode for leg in person.legs] == ["car", "car"]
+
+
+def test_stream_matsim_persons_normalises_projection_once(mocker):
+    projection = mocker.spy(matsim, "_projection")
+    persons = list(stream_matsim_persons(test_tripsv12_path, fields={"act": ["type"]}))
+    assert len(persons) == 5
+    assert projection.call_count == 1
+
+
+def test_stream_matsim_v11_persons_with_person_projection():
+    attributes = load_attributes_map(test_attributes_path)
+    persons = stream_matsim_persons(
+        test_trips_path, attributes=attributes, version=11, fields={"person": ["income"]}
+    )
+    assert next(persons).attributes == {"income": "low"}
+
+
+@pytest.mark.parametrize("fields", [{"agent": []}, {"act": ["colour"]}])
+def test_stream_matsim_persons_with_unknown_projection(fields):
+    with pytest.raises(UserWarning):
+        next(stream_matsim_persons(test_tripsv12_path, fields=fields))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 64, 2**22])
+def test_person_chunks_contain_complete_persons(chunk_size):
+    pids = []
+    for chunk in _person_chunks(test_tripsv12_path, chunk_size):
+        root = et.fromstring(chunk)
+        pids.extend(person.get("id") for person in root.iterchildren("person"))
+    assert pids == [person.get("id") for person in get_elems(test_tripsv12_path, "person")]
+
+
+def test_person_chunks_keep_the_document_prologue(tmp_path):
+    path = tmp_path / "plans.xml"
+    with open(test_tripsv12_path) as f:
+        plans = f.read()
+    # declare an entity in the doctype, and a namespace on the root element
+    plans = plans.replace(
+        '<!DOCTYPE population SYSTEM "http://www.matsim.org/files/dtd/population_v6.dtd">',
+        '<!DOCTYPE population [<!ENTITY home "home">]>',
+    )
+    plans = plans.replace(
+        "<population>", '<population xmlns:pam="https://github.com/arup-group/pam">'
+    )
+    plans = plans.replace('type="home"', 'type="&home;"').replace(
+        '<person id="chris">', '<person id="chris" pam:note="first">'
+    )
+    path.write_text(plans)
+
+    serial = read_matsim(path, keep_non_selected=True)
+    parallel = read_matsim(path, keep_non_selected=True, workers=2)
+    assert parallel == serial
+    assert parallel["chris"]["chris"].plan[0].act == "home"
+
+
+def test_parallel_read_matsim_interns_values_with_the_population_categories():
+    serial = read_matsim(test_tripsv12_path, keep_non_selected=True)
+    parallel = read_matsim(test_tripsv12_path, keep_non_selected=True, workers=2)
+    assert len(parallel.categories) > 0
+    assert parallel.categories.tables == serial.categories.tables
+
+    categories = CategoryRegistry()
+    # a chunk per person
+    persons = matsim._stream_matsim_persons_parallel(
+        test_tripsv12_path,
+        attributes={},
+        vehicles_manager=VehicleManager(),
+        workers=2,
+        categories=categories,
+        chunk_size=64,
+        weight=1,
+        version=12,
+        simplify_pt_trips=False,
+        autocomplete=True,
+        crop=False,
+        keep_non_selected=False,
+        leg_attributes=True,
+        leg_route=True,
+        lazy_routes=True,
+        fields=matsim._projection(),
+        keep_raw=False,
+    )
+    acts = [act.act for person in persons for act in person.activities]
+    assert len({id(act) for act in acts}) == len(set(acts))
+    assert all(act is categories.intern("act", act) for act in acts)
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"plans_path": test_tripsv12_path},
+        {"plans_path": test_tripsv12_path, "household_key": "hid", "keep_non_selected": True},
+        {"plans_path": test_trips_path, "attributes_path": test_attributes_path, "version": 11},
+    ],
+)
+def test_parallel_read_matsim_is_identical_to_serial(kwargs, tmp_path):
+    serial = read_matsim(**kwargs)
+    parallel = read_matsim(workers=2, **kwargs)
+    assert list(parallel.households) == list(serial.households)
+    assert parallel == serial
+
+    written = []
+    for name, population in [("serial", serial), ("parallel", parallel)]:
+        path = tmp_path / f"{name}.xml"
+        write_matsim(population, path, keep_non_selected=True)
+        written.append([line for line in open(path) if "Created" not in line])
+    assert written[0] == written[1]
+
+
+def test_parallel_read_matsim_assigns_vehicles(
+    ev_population_xml_path, all_vehicle_xml_path, electric_vehicles_xml_path
+):
+    population = read_matsim(
+        plans_path=ev_population_xml_path,
+        all_vehicles_path=all_vehicle_xml_path,
+        electric_vehicles_path=electric_vehicles_xml_path,
+        workers=2,
+    )
+    assert population._vehicles_manager._vehicles == {}
+    for pid in ["Eddy", "Stevie", "Vladya"]:
+        assert list(population[pid][pid].attributes.keys()) == ["subpopulation"]
+        assert population[pid][pid].vehicles["car"].vid == pid
+
+
+@pytest.mark.parametrize("block_size", [1, 64, 2**22])
+def test_person_elements_match_file_offsets(block_size):
+    content = open(test_tripsv12_path, "rb").read()
+    elements = list(_person_elements(test_tripsv12_path, block_size))
+    assert [et.fromstring(e).get("id") for _, e in elements] == [
+        person.get("id") for person in get_elems(test_tripsv12_path, "person")
+    ]
+    for offset, element in elements:
+        assert content[offset : offset + len(element)] == element
+
+
+@pytest.mark.parametrize("block_size", [1, 64, 2**22])
+def test_person_elements_with_quoted_tag_end(block_size, tmp_path):
+    plans_path = tmp_path / "plans.xml"
+    plans_path.write_bytes(
+        b'<population><person id="a>b"><plan selected="yes"/></person>'
+        b'<person id=\'c/>d\' employed="no"/><person id="e"></person></population>'
+    )
+    elements = [e for _, e in _person_elements(plans_path, block_size)]
+    assert [et.fromstring(e).get("id") for e in elements] == ["a>b", "c/>d", "e"]
+    assert list(build_person_index(plans_path)) == ["a>b", "c/>d", "e"]
+
+
+def test_build_person_index_with_households(tmp_path):
+    index_path = tmp_path / "index.json"
+    index = build_person_index(test_tripsv12_path, household_key="hid", index_path=index_path)
+    assert list(index) == ["chris", "fatema", "fred", "gerry", "nick"]
+    assert [entry["hid"] for entry in index.values()] == ["A", "B", "B", "B", "A"]
+    assert load_person_index(index_path) == index
+
+
+def test_build_person_index_is_identical_for_gzipped_plans(tmp_path):
+    gzip_path = tmp_path / "plans.xml.gz"
+    with open(test_tripsv12_path, "rb") as f, gzip.open(gzip_path, "wb") as g:
+        g.write(f.read())
+    assert build_person_index(gzip_path) == build_person_index(test_tripsv12_path)
+
+
+@pytest.mark.parametrize("gzipped", [False, True])
+def test_read_matsim_persons_matches_streamed_persons(gzipped, tmp_path):
+    plans_path = test_tripsv12_path
+    if gzipped:
+        plans_path = tmp_path / "plans.xml.gz"
+        with open(test_tripsv12_path, "rb") as f, gzip.open(plans_path, "wb") as g:
+            g.write(f.read())
+    index = build_person_index(plans_path)
+    persons = list(read_matsim_persons(plans_path, pids=["nick", "fatema"], index=index))
+    streamed = {person.pid: person for person in stream_matsim_persons(plans_path)}
+    assert [person.pid for person in persons] == ["fatema", "nick"]
+    for person in persons:
+        assert person == streamed[person.pid]
+
+
+def test_read_matsim_persons_from_saved_index(tmp_path):
+    index_path = tmp_path / "index.json"
+    build_person_index(test_tripsv12_path, index_path=index_path)
+    persons = list(read_matsim_persons(test_tripsv12_path, pids=["gerry"], index=index_path))
+    assert [person.pid for person in persons] == ["gerry"]
+    assert persons[0].attributes["hid"] == "B"
+
+
+def test_read_matsim_persons_missing_pid():
+    with pytest.raises(KeyError):
+        list(read_matsim_persons(test_tripsv12_path, pids=["chris", "nobody"]))
+
+
+@pytest.mark.parametrize("suffix", [".xml", ".xml.gz"])
+def test_matsim_selected_plans_copies_selected_plans(suffix, tmp_path):
+    path = tmp_path / f"plans{suffix}"
+    assert matsim_selected_plans(test_tripsv12_path, path) == 1
+    expected = [(pid, et.tostring(plan)) for pid, plan in selected_plans(test_tripsv12_path)]
+    assert [(pid, et.tostring(plan)) for pid, plan in selected_plans(path)] == expected
+    assert len(list(get_elems(path, "plan"))) == len(expected)
+    for person, copied in zip(get_elems(test_tripsv12_path, "person"), get_elems(path, "person")):
+        assert et.tostring(copied.find("attributes")) == et.tostring(person.find("attributes"))
+
+
 def test_parse_veh_attribute():
     assert parse_veh_attribute('{"car":"chris"}') == {"car": "chris"}
 
@@ -220,3 +504,37 @@ def test_get_float_attribute_from_person():
     elem = et.fromstring(text)
     pid, attributes = get_attributes_from_person(elem)
     assert isinstance(attributes["age"], float)
+
+
+@pytest.mark.parametrize("lazy_routes", [True, False])
+def test_read_matsim_shares_interned_values(lazy_routes):
+    population = read_matsim(test_tripsv12_path, household_key="hid", lazy_routes=lazy_routes)
+    acts = {}
+    modes = {}
+    for _, _, person in population.people():
+        for act in person.activities:
+            assert acts.setdefault(act.act, act.act) is act.act
+        for leg in person.legs:
+            assert modes.setdefault(leg.mode, leg.mode) is leg.mode
+    assert population.categories.values("act") == population.activity_classes
+    assert population.categories.values("mode") == population.mode_classes
+
+
+def test_read_matsim_interned_values_do_not_change_population():
+    assert read_matsim(test_tripsv12_path, household_key="hid", lazy_routes=True) == read_matsim(
+        test_tripsv12_path, household_key="hid"
+    )
+
+
+def test_stream_matsim_persons_shares_attributes():
+    keys = {}
+    values = {}
+    for person in stream_matsim_persons(test_tripsv12_path, lazy_routes=True):
+        for key, value in person.attributes.items():
+            assert keys.setdefault(key, key) is key
+            if isinstance(value, str):
+                assert values.setdefault(value, value) is value
+        for leg in person.legs:
+            link = leg.route.get("start_link")
+            if link is not None:
+                assert values.setdefault(link, link) is link
@@ -1,4 +1,7 @@
+import gzip
 import os
+import pickle
+import re
 from copy import deepcopy
 from datetime import datetime
 
@@ -9,11 +12,13 @@ import pytest
 from pam import write
 from pam.activity import Activity, Leg
 from pam.core import Household, Person, Population
+from pam.location import Location
 from pam.read import read_matsim
+from pam.read.matsim import stream_matsim_persons
 from pam.utils import minutes_to_datetime as mtdt
 from pam.variables import END_OF_DAY
 from pam.write import Writer, write_matsim, write_matsim_population_v6, write_od_matrices
-from shapely.geometry import Point
+from shapely.geometry import LineString, Point
 
 
 def test_writer_enters(tmp_path):
@@ -262,6 +267,242 @@ def test_read_write_non_selected_plans_consistently(tmp_path):
     assert population == population2
 
 
+@pytest.mark.parametrize("suffix", [".xml", ".xml.gz"])
+def test_write_matsim_in_parallel_is_identical(tmp_path, suffix):
+    test_tripsv12_path = pytest.test_data_dir / "test_matsim_plansv12.xml"
+    population = read_matsim(
+        test_tripsv12_path, household_key="hid", version=12, keep_non_selected=True
+    )
+    written = []
+    for workers in [1, 3]:
+        location = tmp_path / f"test_{workers}{suffix}"
+        write_matsim(
+            population=population,
+            plans_path=location,
+            keep_non_selected=True,
+            coordinate_reference_system="EPSG:27700",
+            workers=workers,
+        )
+        opener = gzip.open if suffix == ".xml.gz" else open
+        with opener(location, "rb") as f:
+            # ignore the created timestamp comment
+            written.append(re.sub(rb"<!--Created .*?-->", b"", f.read()))
+    assert written[0] == written[1]
+
+
+@pytest.mark.parametrize("lazy_routes", [False, True])
+@pytest.mark.parametrize("suffix", [".xml", ".xml.gz"])
+def test_write_matsim_fast_is_identical(tmp_path, suffix, lazy_routes):
+    test_tripsv12_path = pytest.test_data_dir / "test_matsim_plansv12.xml"
+    population = read_matsim(test_tripsv12_path, keep_non_selected=True, lazy_routes=lazy_routes)
+    written = []
+    for fast in [False, True]:
+        location = tmp_path / f"test_{fast}{suffix}"
+        write_matsim(population=population, plans_path=location, keep_non_selected=True, fast=fast)
+        opener = gzip.open if suffix == ".xml.gz" else open
+        with opener(location, "rb") as f:
+            written.append(re.sub(rb"<!--Created .*?-->", b"", f.read()))
+    assert written[0] == written[1]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_write_matsim_validates_plans(tmp_path, workers):
+    test_tripsv12_path = pytest.test_data_dir / "test_matsim_plansv12.xml"
+    population = read_matsim(test_tripsv12_path, household_key="hid")
+    assert write_matsim(population, tmp_path / "valid.xml") is None
+    report = write_matsim(population, tmp_path / "valid.xml", validate=True, workers=workers)
+    assert report.valid
+    assert report.persons == 5
+
+    population["A"]["chris"].plan[1].end_time = mtdt(1)
+    population["B"]["fred"].plan[1].end_location = Location(loc=Point(5, 5))
+    report = write_matsim(population, tmp_path / "invalid.xml", validate=True, workers=workers)
+    assert report.to_dict() == {
+        "persons": 5,
+        "errors": {
+            "times": {"count": 1, "examples": ["chris"]},
+            "locations": {"count": 1, "examples": ["fred"]},
+        },
+    }
+    # invalid plans are still written
+    assert read_matsim(tmp_path / "invalid.xml").population == 5
+
+
+def test_writer_validation_keeps_first_examples(tmp_path):
+    with Writer(str(tmp_path / "test.xml"), validate=True) as writer:
+        writer.validation.max_examples = 2
+        for pid in "abc":
+            person = Person(pid)
+            person.add(Activity(1, "home", link="1", start_time=mtdt(0), end_time=mtdt(60)))
+            writer.add_person(person)
+            writer.add_person(Person(f"empty_{pid}"))
+    assert writer.validation.counts == {"sequence": 3}
+    assert writer.validation.examples == {"sequence": ["empty_a", "empty_b"]}
+    assert str(writer.validation) == (
+        "Validated 6 persons, invalid plans: sequence: 3 (eg empty_a, empty_b)."
+    )
+
+
+def test_serialise_person_escapes_like_lxml():
+    person = Person(
+        'a&<"\n', attributes={"x": "a&<>\"'\r\n\t é", "i": 3, "b": True, "f": 1.5, "e": ""}
+    )
+    person.add(Activity(1, "home&", "a", link="l<1", start_time=mtdt(0), end_time=mtdt(60)))
+    person.add(Leg(1, "car", start_time=mtdt(60), end_time=mtdt(90)))
+    person.add(Activity(2, "work", "b", loc=Point(1, 2), start_time=mtdt(90), end_time=END_OF_DAY))
+    person.plan[1].attributes = {"enterVehicleTime": 5, "routingMode": "car"}
+    person.plan.score = 1.25
+    expected = lxml.etree.tostring(
+        write.create_person_element(person.pid, person), pretty_print=True, encoding="utf-8"
+    )
+    assert write.matsim.serialise_person(person) == expected
+
+
+def test_writer_add_serialised(tmp_path):
+    path = str(tmp_path / "test.xml.gz")
+    with Writer(path, gzip_workers=2) as writer:
+        writer.add_serialised(b'<person id="a"><plan/></person>\n')
+        writer.add_person(Person("b"))
+    assert [p.get("id") for p in lxml.etree.parse(path).getroot()] == ["a", "b"]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_writer_passes_through_unmodified_persons(tmp_path, workers):
+    test_tripsv12_path = pytest.test_data_dir / "test_matsim_plansv12.xml"
+    raw = read_matsim(test_tripsv12_path, keep_non_selected=True, keep_raw=True, workers=workers)
+    population = read_matsim(test_tripsv12_path, keep_non_selected=True)
+    for pop in [raw, population]:
+        pop["chris"]["chris"].plan[0].location.link = "new"
+
+    write_matsim(raw, tmp_path / "raw.xml", household_key=None, keep_non_selected=True)
+    write_matsim(population, tmp_path / "expected.xml", household_key=None, keep_non_selected=True)
+
+    with open(tmp_path / "raw.xml", "rb") as f:
+        written = f.read()
+    # unmodified persons are copied verbatim, including their (tab) indentation
+    assert b'\t\t<attributes>\n\t\t\t<attribute name="hid"' in written
+    assert b'link="new"' in written
+    parser = lxml.etree.XMLParser(remove_blank_text=True, remove_comments=True)
+    trees = [lxml.etree.parse(str(tmp_path / name), parser) for name in ["raw.xml", "expected.xml"]]
+    assert [p.get("id") for p in trees[0].getroot()] == [p.get("id") for p in trees[1].getroot()]
+    assert read_matsim(tmp_path / "raw.xml", keep_non_selected=True) == population
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_writer_passes_through_persons_with_added_household_key(tmp_path, workers):
+    path = pytest.test_data_dir / "test_matsim_experienced_plans_v12.xml"
+    population = read_matsim(path, keep_raw=True)
+    write_matsim(population, tmp_path / "raw.xml", workers=workers)
+
+    # the persons are written as read, with the added hid attribute
+    persons = [person for _, _, person in population.people()]
+    assert all(person.raw_xml is not None for person in persons)
+    assert all(person.attributes["hid"] == person.pid for person in persons)
+    with open(tmp_path / "raw.xml", "rb") as f:
+        assert f.read().count(b"\t\t\t<activity") > 0
+    write_matsim(read_matsim(path), tmp_path / "expected.xml")
+    written = read_matsim(tmp_path / "raw.xml")
+    assert written == read_matsim(tmp_path / "expected.xml")
+    assert all(person.attributes["hid"] == person.pid for _, _, person in written.people())
+
+
+@pytest.mark.parametrize("copy", [deepcopy, lambda x: pickle.loads(pickle.dumps(x))])
+def test_person_raw_xml_is_not_copied_once_modified(copy):
+    test_tripsv12_path = pytest.test_data_dir / "test_matsim_plansv12.xml"
+    population = read_matsim(test_tripsv12_path, keep_non_selected=True, keep_raw=True)
+    unmodified, modified = [person for _, _, person in population.people()][:2]
+    modified.attributes["age"] = "old"
+    assert copy(unmodified).raw_xml == unmodified.raw_xml
+    assert copy(modified).raw_xml is None
+
+
+def test_person_raw_xml_is_dropped_on_modification():
+    test_tripsv12_path = pytest.test_data_dir / "test_matsim_plansv12.xml"
+    population = read_matsim(test_tripsv12_path, keep_non_selected=True, keep_raw=True)
+    persons = [person for _, _, person in population.people()]
+    assert all(person.raw_xml is not None for person in persons)
+
+    persons[0].attributes["age"] = "old"
+    persons[1].plan.day[1].mode = "walk"
+    persons[2].plan.add(Leg(mode="car"))
+    persons[3].mark_dirty()
+    assert [person.raw_xml is None for person in persons] == [True, True, True, True, False]
+
+
+@pytest.mark.parametrize(
+    "options", [{"leg_route": False}, {"crop": True}, {"fields": {"leg": ["mode"]}}]
+)
+def test_raw_xml_not_kept_when_parsing_loses_information(options):
+    test_tripsv12_path = pytest.test_data_dir / "test_matsim_plansv12.xml"
+    persons = stream_matsim_persons(
+        test_tripsv12_path, keep_raw=True, keep_non_selected=True, **options
+    )
+    assert all(person.raw_xml is None for person in persons)
+
+
+def test_raw_xml_not_kept_when_non_selected_plans_are_dropped():
+    test_tripsv12_path = pytest.test_data_dir / "test_matsim_plansv12.xml"
+    for person in stream_matsim_persons(test_tripsv12_path, keep_raw=True):
+        assert (person.raw_xml is None) == (person.pid == "chris")
+
+
+def read_plans(path):
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "rb") as f:
+        # ignore the created timestamp comment
+        return re.sub(rb"<!--Created .*?-->", b"", f.read())
+
+
+@pytest.mark.parametrize("suffix", [".xml", ".xml.gz"])
+def test_checkpoint_writer_is_identical(tmp_path, suffix):
+    population = read_matsim(pytest.test_data_dir / "test_matsim_plansv12.xml")
+    write_matsim(population, tmp_path / f"expected{suffix}", comment="test")
+    path = str(tmp_path / f"checkpointed{suffix}")
+    with write.CheckpointWriter(path, chunk_size=2, comment="test") as writer:
+        for _, household in population:
+            writer.add_hh(household)
+    assert read_plans(path) == read_plans(tmp_path / f"expected{suffix}")
+    assert not os.path.exists(path + ".parts")
+
+
+def test_checkpoint_writer_resumes(tmp_path):
+    population = read_matsim(pytest.test_data_dir / "test_matsim_plansv12.xml")
+    hids = list(population.households)
+    write_matsim(population, tmp_path / "expected.xml")
+    path = str(tmp_path / "checkpointed.xml")
+
+    with pytest.raises(ValueError):
+        with write.CheckpointWriter(path, chunk_size=2) as writer:
+            for hid, household in population:
+                if hid == hids[3]:
+                    raise ValueError("failed job")
+                writer.add_hh(household)
+    assert not os.path.exists(path)
+    # the first two households are in a completed part, the third was written on exit
+    options, parts = write.matsim.read_manifest(path + ".parts")
+    assert [part["ids"] for part in parts] == [hids[:2], hids[2:3]]
+
+    # a record interrupted while being written is ignored
+    with open(os.path.join(path + ".parts", "manifest.jsonl"), "a") as f:
+        f.write('{"part": 2, "fi')
+
+    added = []
+    with write.CheckpointWriter(path, chunk_size=2, keep_parts=True) as writer:
+        assert hids[2] in writer
+        assert hids[3] not in writer
+        for hid, household in population:
+            if hid in writer:
+                continue
+            added.append(hid)
+            writer.add_hh(household)
+    assert added == hids[3:]
+    assert read_plans(path) == read_plans(tmp_path / "expected.xml")
+
+    with pytest.raises(UserWarning):
+        with write.CheckpointWriter(path, household_key=None):
+            pass
+
+
 def test_writes_od_matrix_to_expected_file(tmpdir):
     population = Population()
 
@@ -469,6 +710,76 @@ def test_writes_od_matrix_to_expected_file(tmpdir):
             assert od_matrix_csv_string == expected_od_matrix
 
 
+def od_person(pid, modes, occ="white", freq=None):
+    person = Person(pid=pid, attributes={"occ": occ}, freq=freq)
+    person.add(Activity(1, "home", "a", start_time=mtdt(0)))
+    for seq, (mode, start, end) in enumerate(modes, 1):
+        person.add(Leg(seq, mode, start_area=start, end_area=end, start_time=mtdt(60 * seq)))
+        person.add(Activity(seq + 1, "other", end, start_time=mtdt(60 * seq + 30)))
+    return person
+
+
+def test_od_matrices_segments_in_one_pass(tmpdir):
+    matrices = write.ODMatrices(
+        leg_filter="Mode", person_filter="occ", time_minutes_filter=[(0, 90), (1000, 1100)]
+    )
+    matrices.add_person(od_person("0", [("car", "a", "b"), ("walk", "b", "a")]))
+    matrices.add_person(od_person("1", [("car", "a", "b"), ("car", "b", None)], occ="blue"))
+    matrices.write(tmpdir)
+
+    assert sorted(os.listdir(tmpdir)) == [
+        "mode_car_od.csv",
+        "mode_walk_od.csv",
+        "occ_blue_od.csv",
+        "occ_white_od.csv",
+        "time_0_to_90_od.csv",
+        "time_1000_to_1100_od.csv",
+        "total_od.csv",
+    ]
+    assert open(os.path.join(tmpdir, "total_od.csv")).read() == "Origin,a,b\na,0,2\nb,1,0\n"
+    assert open(os.path.join(tmpdir, "mode_car_od.csv")).read() == "Origin,b\na,2\n"
+    assert open(os.path.join(tmpdir, "occ_blue_od.csv")).read() == "Origin,b\na,1\n"
+    assert open(os.path.join(tmpdir, "time_0_to_90_od.csv")).read() == "Origin,b\na,2\n"
+    assert open(os.path.join(tmpdir, "time_1000_to_1100_od.csv")).read() == "Origin\n"
+
+
+def test_od_matrices_leg_and_person_segments_are_separate():
+    matrices = write.ODMatrices(leg_filter="Mode", person_filter="occ")
+    matrices.add_person(od_person("0", [("car", "a", "b")], occ="car"))
+    matrices.add_person(od_person("1", [("walk", "a", "b")], occ="total"))
+    counts = {name: matrix.to_numpy().sum() for name, matrix in matrices.matrices().items()}
+    assert counts == {"total": 2, "mode_car": 1, "mode_walk": 1, "occ_car": 1, "occ_total": 1}
+
+
+def test_od_matrices_values_clashing_with_total_are_prefixed():
+    matrices = write.ODMatrices(person_filter="occ")
+    matrices.add_person(od_person("0", [("car", "a", "b")], occ="total"))
+    matrices.add_person(od_person("1", [("car", "a", "b")], occ="white"))
+    counts = {name: matrix.to_numpy().sum() for name, matrix in matrices.matrices().items()}
+    assert counts == {"total": 2, "occ_total": 1, "white": 1}
+
+
+def test_od_matrices_weighted_with_zone_mapping():
+    zones = {"a": "north", "b": "south"}
+    matrices = write.ODMatrices(weighted=True, zone=lambda location: zones[location.area])
+    matrices.add_person(od_person("0", [("car", "a", "b")]), freq=2.5)
+    matrices.add_person(od_person("1", [("car", "a", "b"), ("car", "b", "b")], freq=4))
+    total = matrices.matrices()["total"]
+    assert total.loc["north", "south"] == 6.5
+    assert total.loc["south", "south"] == 4
+
+
+def test_od_matrices_from_streamed_persons():
+    matrices = write.ODMatrices(leg_filter="Mode", zone=lambda location: location.link)
+    num_legs = 0
+    for person in stream_matsim_persons(pytest.test_data_dir / "test_matsim_plansv12.xml"):
+        matrices.add_person(person)
+        num_legs += person.num_legs
+    total = matrices.matrices()["total"]
+    assert total.loc["1-2", "3-4"] == 4
+    assert total.to_numpy().sum() == num_legs
+
+
 def test_write_to_csv_no_locs(population_heh, tmpdir):
     for _, _, person in population_heh.people():
         for act in person.activities:
@@ -726,6 +1037,94 @@ def test_write_to_csv_some_locs(population_heh, tmpdir):
     assert len(acts_df) == 6
 
 
+def test_write_to_csv_without_geojson(population_heh, tmpdir):
+    population_heh.to_csv(tmpdir, geojson=False)
+    for name in ["households", "people", "legs", "activities"]:
+        assert os.path.exists(os.path.join(tmpdir, f"{name}.csv"))
+        assert not os.path.exists(os.path.join(tmpdir, f"{name}.geojson"))
+
+
+def test_diary_tables_leg_geometries():
+    person = Person("a")
+    person.add(Activity(1, "home", loc=Point(0, 0), start_time=mtdt(0), end_time=mtdt(60)))
+    person.add(
+        Leg(
+            1,
+            "car",
+            start_loc=Point(0, 0),
+            end_loc=Point(1, 1),
+            start_time=mtdt(60),
+            end_time=mtdt(90),
+        )
+    )
+    person.add(Activity(2, "work", start_time=mtdt(90), end_time=mtdt(120)))
+    person.add(Leg(2, "car", start_time=mtdt(120), end_time=mtdt(150)))
+    person.add(Activity(3, "home", loc=Point(0, 0), start_time=mtdt(150), end_time=END_OF_DAY))
+    population = Population()
+    population.add(person)
+
+    tables = write.diary_tables(population)
+    assert tables["legs"].geometry[0].equals(LineString([(0, 0), (1, 1)]))
+    assert tables["legs"].geometry[1] is None
+    assert tables["activities"].geometry[1] is None
+
+
+def test_write_diary_to_parquet(population_heh, tmp_path):
+    write.diary_to_parquet(population_heh, tmp_path / "population")
+    with write.DiaryWriter(tmp_path / "writer", format="parquet") as writer:
+        writer.add_population(population_heh)
+    for table, schema in write.diary.DIARY_SCHEMAS.items():
+        df = pd.read_parquet(tmp_path / "population" / table)
+        assert list(df.columns) == schema.names
+        pd.testing.assert_frame_equal(df, pd.read_parquet(tmp_path / "writer" / table))
+
+
+def test_diary_writer_tables(population_heh, tmp_path):
+    with write.DiaryWriter(tmp_path, format="parquet") as writer:
+        writer.add_population(population_heh)
+    legs = pd.read_parquet(tmp_path / "legs")
+    expected = population_heh.legs_df()
+    assert list(legs.pid) == list(expected.pid)
+    assert list(legs["mode"]) == list(expected["mode"])
+    assert list(legs.ozone) == list(expected.ozone)
+    assert list(legs.duration) == list(expected.duration * 60)
+    trips = pd.read_parquet(tmp_path / "trips")
+    assert len(trips) == len(population_heh.trips_df())
+    activities = pd.read_parquet(tmp_path / "activities")
+    assert len(activities) == sum(person.num_activities for _, _, person in population_heh.people())
+    assert list(activities.hid) == ["0"] * len(activities)
+    assert activities.x.iloc[0] == 0
+
+
+def test_diary_writer_csv_matches_parquet_in_batches(tmp_path):
+    path = pytest.test_data_dir / "test_matsim_plansv12.xml"
+    for format, batch_size in [("csv", 2), ("parquet", 100)]:
+        with write.DiaryWriter(
+            tmp_path / format, format=format, household_key="hid", batch_size=batch_size
+        ) as writer:
+            for person in stream_matsim_persons(path):
+                writer.add_person(person)
+    for table in ["legs", "trips", "activities"]:
+        csv = pd.read_csv(tmp_path / "csv" / f"{table}.csv")
+        parquet = pd.read_parquet(tmp_path / "parquet" / table)
+        assert list(csv.columns) == list(parquet.columns)
+        assert len(csv) == len(parquet)
+        assert list(csv.pid) == list(parquet.pid)
+        assert list(csv.start_time) == list(parquet.start_time)
+    assert len(list((tmp_path / "parquet" / "legs").iterdir())) == 1
+
+
+def test_diary_writer_without_trips(population_heh, tmp_path):
+    with write.DiaryWriter(tmp_path, trips=False) as writer:
+        writer.add_population(population_heh)
+    assert sorted(os.listdir(tmp_path)) == ["activities.csv", "legs.csv"]
+
+
+def test_diary_writer_unknown_format(tmp_path):
+    with pytest.raises(UserWarning):
+        write.DiaryWriter(tmp_path, format="xlsx")
+
+
 @pytest.mark.filterwarnings(
     "ignore:Conversion of an array with ndim > 0 to a scalar is deprecated, and will error in future:DeprecationWarning"
 )
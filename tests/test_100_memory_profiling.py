@@ -3,9 +3,16 @@ from pathlib import Path
 import pandas as pd
 import pytest
 from pam import read
+from pam.activity import Activity, Leg
+from pam.core import Person
+from pam.operations.cropping import link_plan
+from pam.utils import minutes_to_datetime as mtdt
+from shapely.geometry import Point
 
 BENCHMARK_MEM = "1400 MB"
 BENCHMARK_SECONDS = 250
+# 200k linked home-work-home plans, around 475 MB without slotted plan components and locations
+PLANS_BENCHMARK_MEM = "430 MB"
 
 data_dir = Path(__file__).parent / "test_data"
 
@@ -28,3 +35,20 @@ def test_activity_loader_mem(trips_attrs):
 @pytest.mark.high_mem
 def test_activity_loader_time(trips_attrs):
     read.load_travel_diary(*trips_attrs)
+
+
+@pytest.mark.limit_memory(PLANS_BENCHMARK_MEM)
+@pytest.mark.high_mem
+def test_linked_plans_mem():
+    home, work = Point(0, 0), Point(1000, 1000)
+    times = [mtdt(m) for m in (0, 480, 510, 1020, 1050, 1440)]
+    persons = []
+    for i in range(200000):
+        person = Person(str(i))
+        person.add(Activity(1, "home", loc=home, start_time=times[0], end_time=times[1]))
+        person.add(Leg(1, "car", start_time=times[1], end_time=times[2]))
+        person.add(Activity(2, "work", loc=work, start_time=times[2], end_time=times[3]))
+        person.add(Leg(2, "car", start_time=times[3], end_time=times[4]))
+        person.add(Activity(3, "home", loc=home, start_time=times[4], end_time=times[5]))
+        link_plan(person.plan)
+        persons.append(person)
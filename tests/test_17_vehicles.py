@@ -1,3 +1,4 @@
+import pickle
 from copy import deepcopy
 
 import importlib_resources
@@ -6,7 +7,7 @@ import pytest
 from pam import PAMVehicleIdError, PAMVehicleTypeError
 from pam.core import Person, Population
 from pam.read.matsim import read_matsim
-from pam.vehicles import ElectricVehicle, Vehicle, VehicleManager, VehicleType
+from pam.vehicles import ElectricVehicle, Vehicle, VehicleManager, VehicleTable, VehicleType
 from pam.write.matsim import write_matsim
 
 
@@ -193,6 +194,54 @@ def test_manager_iters(manager):
     assert set([k for k, v in manager.evs.items()]) == {"ev_0", "ev_1"}
 
 
+def test_manager_vehicles_are_table_views(manager):
+    assert isinstance(manager._vehicles, VehicleTable)
+    vehicle = manager["ev_0"]
+    assert isinstance(vehicle, ElectricVehicle)
+    assert vehicle == ElectricVehicle("ev_0", "car")
+    vehicle.initial_soc = 30
+    vehicle.charger_types = "default,fast"
+    assert manager["ev_0"] == ElectricVehicle(
+        "ev_0", "car", initial_soc=30.0, charger_types="default,fast"
+    )
+    assert manager.charger_types() == {"default", "fast"}
+    manager["car_0"].type_id = "lorry"
+    assert manager.get("car_0") == Vehicle("car_0", "lorry")
+    assert manager["car_0"] != ElectricVehicle("car_0", "lorry")
+
+
+def test_manager_vehicle_copies_are_detached(manager):
+    view = manager["ev_1"]
+    for copied in (deepcopy(view), pickle.loads(pickle.dumps(view))):
+        assert type(copied) is ElectricVehicle
+        assert copied == view
+    popped = manager.pop("ev_1")
+    assert type(popped) is ElectricVehicle
+    assert "ev_1" not in manager
+    assert manager.len() == 4
+    with pytest.raises(KeyError):
+        view.type_id
+
+
+def test_vehicle_table_compacts_removed_rows():
+    table = VehicleTable({f"v{i}": Vehicle(f"v{i}", "car") for i in range(3000)})
+    for i in range(2000):
+        table.pop(f"v{i}")
+    assert len(table.vids) < 3000
+    assert list(table) == [f"v{i}" for i in range(2000, 3000)]
+    assert table["v2500"] == Vehicle("v2500", "car")
+    table["v0"] = ElectricVehicle("v0", "car")
+    assert list(table.ev_ids()) == ["v0"]
+
+
+def test_vehicle_table_rename(manager):
+    manager["car_1"].vid = "car_2"
+    assert "car_1" not in manager
+    assert manager["car_2"] == Vehicle("car_2", "car")
+    with pytest.raises(PAMVehicleIdError):
+        manager["car_2"].vid = "car_0"
+
+
 @pytest.fixture
 def vehicles_v2_xsd():
     xsd_path = importlib_resources.files("pam") / "fixtures" / "dtd" / "vehicleDefinitions_v2.0.xsd"
@@ -394,6 +443,20 @@ def test_read_write_xml_consistently(all_vehicle_xml_path, electric_vehicles_xml
     assert manager == duplicate
 
 
+def test_read_write_gzipped_xml_consistently(
+    all_vehicle_xml_path, electric_vehicles_xml_path, tmp_path
+):
+    manager = VehicleManager()
+    manager.from_xml(all_vehicle_xml_path, electric_vehicles_xml_path)
+    vehs_path = tmp_path / "vehs.xml.gz"
+    evs_path = tmp_path / "evs.xml.gz"
+    manager.to_xml(vehs_path, evs_path)
+    assert vehs_path.read_bytes().startswith(b"\x1f\x8b")
+    duplicate = VehicleManager()
+    duplicate.from_xml(vehs_path, evs_path)
+    assert manager == duplicate
+
+
 def test_read_vehs_into_population(
     ev_population_xml_path, all_vehicle_xml_path, electric_vehicles_xml_path
 ):
@@ -576,3 +639,31 @@ def test_update_vehicles_manager(manager):
     population[0][0].vehicles["car"] = Vehicle("0", "flying_car")
     with pytest.raises(PAMVehicleIdError):
         population.update_vehicles_manager()
+
+
+def test_vehicle_xml_bytes_match_xml_writer(tmp_path):
+    vehicles = [Vehicle("a&b", 'type"1"'), ElectricVehicle("ev<1>", "car", 70.5, 30, "fast,slow")]
+    for vehicle in vehicles:
+        with lxml.etree.xmlfile(str(tmp_path / "vehicle.xml"), encoding="utf-8") as xf:
+            vehicle.to_xml(xf)
+        assert (tmp_path / "vehicle.xml").read_bytes() == vehicle.to_xml_bytes()
+    with lxml.etree.xmlfile(str(tmp_path / "ev.xml"), encoding="utf-8") as xf:
+        vehicles[1].to_ev_xml(xf)
+    assert (tmp_path / "ev.xml").read_bytes() == vehicles[1].to_ev_xml_bytes()
+
+
+def test_read_xml_shares_type_ids(all_vehicle_xml_path, electric_vehicles_xml_path):
+    manager = VehicleManager()
+    manager.from_xml(all_vehicle_xml_path, electric_vehicles_xml_path)
+    type_ids = {}
+    for vehicle in manager._vehicles.values():
+        assert type_ids.setdefault(vehicle.type_id, vehicle.type_id) is vehicle.type_id
+
+
+def test_read_types_stops_at_vehicles(all_vehicle_xml_path, tmp_path):
+    xml = all_vehicle_xml_path.read_text()
+    truncated = tmp_path / "vehicles.xml"
+    truncated.write_text(xml[: xml.index("Stevie")])
+    manager = VehicleManager()
+    manager.types_from_xml(truncated)
+    assert set(manager._veh_types) == {"defaultVehicleType", "defaultElectricVehicleType"}
@@ -1,6 +1,7 @@
 import os
 
 import pytest
+from pam import read
 from pam.operations import combine
 
 
@@ -18,3 +19,58 @@ def test_combined_length(path_population_A, path_population_B):
     """Combined population size equates to the sum of the individual populations."""
     combined_pop = combine.pop_combine([path_population_A, path_population_B], matsim_version=12)
     assert len(combined_pop) == 6
+
+
+def test_stream_combine_writes_all_persons(path_population_A, path_population_B, tmp_path):
+    outpath = tmp_path / "combined.xml"
+    stats = combine.stream_pop_combine([path_population_A, path_population_B], outpath)
+    assert stats == {"num_households": 5, "num_people": 5, "duplicates": 1}
+
+    combined = combine.pop_combine([path_population_A, path_population_B], matsim_version=12)
+    streamed = list(read.stream_matsim_persons(outpath, keep_non_selected=True))
+    # the second "chris" (household "D") is skipped
+    expected = [person for hid, _, person in combined.people() if hid != "D"]
+    assert [p.pid for p in streamed] == [p.pid for p in expected]
+    assert [p.attributes["hid"] for p in streamed] == list("ABCEF")
+    for person, expected_person in zip(streamed, expected):
+        assert person.plan == expected_person.plan
+        assert len(person.plans_non_selected) == len(expected_person.plans_non_selected)
+
+
+def test_stream_combine_skips_duplicate_person_ids(path_population_A, tmp_path, caplog):
+    outpath = tmp_path / "combined.xml"
+    stats = combine.stream_pop_combine([path_population_A, path_population_A], outpath, workers=2)
+    assert stats == {"num_households": 3, "num_people": 3, "duplicates": 3}
+    assert "Skipping duplicate person id 'chris'" in caplog.text
+    assert len(list(read.stream_matsim_persons(outpath))) == 3
+
+
+def test_stream_combine_prefixes_ids(path_population_A, tmp_path, caplog):
+    outpath = tmp_path / "combined.xml"
+    stats = combine.stream_pop_combine(
+        [path_population_A, path_population_A],
+        outpath,
+        prefixes=["a_", "b_"],
+        fast=True,
+        lazy_routes=True,
+    )
+    assert stats == {"num_households": 6, "num_people": 6, "duplicates": 0}
+    assert not caplog.text
+    population = read.read_matsim(outpath, household_key="hid", keep_non_selected=True)
+    assert sorted(population.households) == ["a_A", "a_B", "a_C", "b_A", "b_B", "b_C"]
+    assert population["b_A"]["b_chris"].plan == population["a_A"]["a_chris"].plan
+
+
+def test_stream_combine_warns_on_shared_household_ids(path_population_A, tmp_path, caplog):
+    # the same households, with different person ids
+    renamed = tmp_path / "renamed.xml"
+    with open(path_population_A) as f:
+        renamed.write_text(f.read().replace('<person id="', '<person id="x_'))
+    stats = combine.stream_pop_combine([path_population_A, renamed], tmp_path / "combined.xml")
+    assert stats == {"num_households": 3, "num_people": 6, "duplicates": 0}
+    assert "Household id 'A'" in caplog.text
+
+
+def test_stream_combine_checks_prefixes(path_population_A, tmp_path):
+    with pytest.raises(UserWarning):
+        combine.stream_pop_combine([path_population_A], tmp_path / "combined.xml", prefixes=[])
@@ -0,0 +1,133 @@
+import pandas as pd
+import pytest
+from pam.activity import Activity, Leg
+from pam.core import Household, Person, Population
+from pam.operations.convert import matsim_to_diary, matsim_to_parquet
+from pam.read import (
+    load_parquet_legs,
+    load_parquet_table,
+    load_parquet_trips,
+    read_matsim,
+    read_parquet,
+)
+from pam.utils import minutes_to_datetime as mtdt
+from pam.write import write_matsim, write_parquet
+from shapely.geometry import Point
+
+test_trips_path = pytest.test_data_dir / "test_matsim_plans.xml"
+test_tripsv12_path = pytest.test_data_dir / "test_matsim_plansv12.xml"
+test_attributes_path = pytest.test_data_dir / "test_matsim_attributes.xml"
+
+
+@pytest.fixture
+def parquet_dir(tmp_path):
+    dir = tmp_path / "parquet"
+    matsim_to_parquet(test_tripsv12_path, dir, household_key="hid", keep_non_selected=True)
+    return dir
+
+
+def test_matsim_to_parquet_writes_tables(parquet_dir):
+    for table in ["persons", "plans", "activities", "legs", "routes"]:
+        assert (parquet_dir / table / "part-00000.parquet").exists()
+    persons = load_parquet_table(parquet_dir, "persons")
+    assert list(persons.pid) == ["chris", "fatema", "fred", "gerry", "nick"]
+    assert list(persons.hid) == ["A", "B", "B", "B", "A"]
+
+
+def test_matsim_to_parquet_batches(tmp_path):
+    matsim_to_parquet(test_tripsv12_path, tmp_path, batch_size=2)
+    assert sorted(p.name for p in (tmp_path / "legs").iterdir()) == [
+        "part-00000.parquet",
+        "part-00001.parquet",
+        "part-00002.parquet",
+    ]
+    assert len(load_parquet_table(tmp_path, "persons")) == 5
+
+
+def test_matsim_to_parquet_empty_population(tmp_path):
+    empty_path = tmp_path / "empty.xml"
+    empty_path.write_text('<?xml version="1.0" encoding="utf-8"?><population></population>')
+    matsim_to_parquet(empty_path, tmp_path / "parquet")
+    assert load_parquet_table(tmp_path / "parquet", "legs").empty
+
+
+def test_read_parquet_matches_read_matsim(parquet_dir):
+    expected = read_matsim(test_tripsv12_path, household_key="hid", keep_non_selected=True)
+    population = read_parquet(parquet_dir, keep_non_selected=True)
+    assert population == expected
+    for hid, pid, person in population.people():
+        expected_person = expected[hid][pid]
+        assert person.attributes == expected_person.attributes
+        assert len(person.plans_non_selected) == len(expected_person.plans_non_selected)
+        assert person.plan.score == expected_person.plan.score
+        for leg, expected_leg in zip(person.legs, expected_person.legs):
+            assert leg.purp == expected_leg.purp
+            assert leg.distance == expected_leg.distance
+            assert leg.attributes == expected_leg.attributes
+            assert leg.route.network_route == expected_leg.route.network_route
+            assert leg.route.transit == expected_leg.route.transit
+
+
+def test_read_parquet_round_trip_to_matsim(parquet_dir, tmp_path):
+    written = []
+    for name, population in [
+        ("matsim", read_matsim(test_tripsv12_path, household_key="hid")),
+        ("parquet", read_parquet(parquet_dir)),
+    ]:
+        path = tmp_path / f"{name}.xml"
+        write_matsim(population, path)
+        written.append(read_matsim(path, household_key="hid"))
+    assert written[0] == written[1]
+
+
+def test_write_parquet_population(tmp_path):
+    population = read_matsim(test_trips_path, test_attributes_path, version=11)
+    write_parquet(population, tmp_path)
+    assert read_parquet(tmp_path) == population
+
+
+@pytest.mark.parametrize(
+    ["load", "method"], [(load_parquet_legs, "legs_df"), (load_parquet_trips, "trips_df")]
+)
+def test_load_parquet_frames_match_population_frames(parquet_dir, load, method):
+    population = read_matsim(test_tripsv12_path, household_key="hid")
+    # frames are in file order rather than grouped by household
+    expected = getattr(population, method)().sort_values(["pid", "seq"], ignore_index=True)
+    df = load(parquet_dir).sort_values(["pid", "seq"], ignore_index=True)
+    assert len(df) == len(expected)
+    for column in ["pid", "hid", "seq", "mode", "purp", "tst", "tet", "freq", "subpopulation"]:
+        assert list(df[column]) == list(expected[column]), column
+    for column in ["duration", "euclidean_distance", "personhrs"]:
+        pd.testing.assert_series_equal(df[column], expected[column], check_names=False)
+    assert list(df.ox) == [loc.x for loc in expected.oloc]
+
+
+def test_matsim_to_diary_batches(tmp_path):
+    matsim_to_diary(test_tripsv12_path, tmp_path, format="parquet", batch_size=2)
+    assert len(list((tmp_path / "legs").iterdir())) == 3
+    population = read_matsim(test_tripsv12_path)
+    legs = pd.read_parquet(tmp_path / "legs")
+    assert len(legs) == sum(person.num_legs for _, _, person in population.people())
+    assert list(legs.hid) == list(legs.pid)
+    trips = pd.read_parquet(tmp_path / "trips")
+    assert len(trips) == len(population.trips_df())
+
+
+def test_read_parquet_missing_times_and_household_freq(tmp_path):
+    population = Population()
+    household = Household("A", freq=10)
+    person = Person("1", freq=2)
+    person.add(Activity(1, "home", loc=Point(0, 0), end_time=mtdt(480)))
+    person.add(Leg(1, "car", start_time=mtdt(480), end_time=mtdt(510)))
+    person.add(Activity(2, "work", loc=Point(1, 1), start_time=mtdt(510)))
+    household.add(person)
+    household.add(Person("2", freq=4))
+    population.add(household)
+    write_parquet(population, tmp_path)
+
+    loaded = read_parquet(tmp_path)
+    plan = loaded["A"]["1"].plan
+    assert plan[0].start_time is None
+    assert plan[2].end_time is None
+    assert loaded["A"].hh_freq is None
+    assert loaded["A"].freq == 3
@@ -0,0 +1,143 @@
+import numpy as np
+import pytest
+from lxml import etree as et
+from pam import PAMSnapshotError
+from pam.activity import Activity, LazyRoute, Leg
+from pam.core import Household, Person, Population
+from pam.location import Location
+from pam.read import load_snapshot, read_matsim
+from pam.snapshot import Snapshot
+from pam.utils import minutes_to_datetime as mtdt
+from pam.write import write_matsim
+
+test_tripsv12_path = pytest.test_data_dir / "test_matsim_plansv12.xml"
+test_experienced_path = pytest.test_data_dir / "test_matsim_experienced_plans_v12.xml"
+test_vehicles_dir = pytest.test_data_dir / "vehicles"
+
+
+@pytest.fixture
+def population():
+    return read_matsim(test_tripsv12_path, household_key="hid", keep_non_selected=True)
+
+
+def test_snapshot_round_trip(population, tmp_path):
+    path = tmp_path / "population.snap"
+    population.save_snapshot(path)
+    loaded = Population.load_snapshot(path)
+    assert loaded == population
+    assert list(loaded.households) == list(population.households)
+    for hid, pid, person in population.people():
+        loaded_person = loaded[hid][pid]
+        assert loaded_person.attributes == person.attributes
+        assert len(loaded_person.plans_non_selected) == len(person.plans_non_selected)
+        assert loaded_person.plan.score == person.plan.score
+        for component, loaded_component in zip(person.plan, loaded_person.plan):
+            assert loaded_component.start_time == component.start_time
+            assert loaded_component.end_time == component.end_time
+            if isinstance(component, Leg):
+                assert loaded_component.attributes == component.attributes
+                assert loaded_component.distance == component.distance
+                assert loaded_component.route.attrib == component.route.attrib
+                assert loaded_component.route.text == component.route.text
+
+
+def test_snapshot_round_trip_writes_same_matsim(population, tmp_path):
+    population.save_snapshot(tmp_path / "population.snap")
+    loaded = load_snapshot(tmp_path / "population.snap", mmap=True)
+    parser = et.XMLParser(remove_blank_text=True, remove_comments=True)
+    written = []
+    for name, pop in [("expected", population), ("loaded", loaded)]:
+        write_matsim(pop, tmp_path / f"{name}.xml")
+        written.append(et.tostring(et.parse(str(tmp_path / f"{name}.xml"), parser)))
+    assert written[0] == written[1]
+
+
+def test_snapshot_loads_routes_lazily(population, tmp_path):
+    population.save_snapshot(tmp_path / "population.snap")
+    loaded = load_snapshot(tmp_path / "population.snap")
+    routes = [leg.route for _, _, person in loaded.people() for leg in person.legs]
+    assert routes and all(isinstance(route, LazyRoute) for route in routes if route.exists)
+
+
+def test_snapshot_preserves_shared_locations(tmp_path):
+    population = Population()
+    household = Household("A", location=Location(area="a"), freq=2)
+    person = Person("1", attributes={"age": np.int64(20)}, home_location=household.location)
+    person.add(Activity(1, "home", "a", start_time=mtdt(0), end_time=mtdt(60)))
+    person.add(Leg(1, "car", "a", "b", start_time=mtdt(60), end_time=mtdt(90)))
+    person.add(Activity(2, "work", "b", start_time=mtdt(90), end_time=mtdt(24 * 60)))
+    person.plan[1].start_location = person.plan[0].location
+    person.plan[1].end_location = person.plan[2].location
+    household.add(person)
+    population.add(household)
+    population.save_snapshot(tmp_path / "population.snap")
+
+    loaded = Population.load_snapshot(tmp_path / "population.snap")
+    person = loaded["A"]["1"]
+    assert person.attributes == {"age": 20}
+    assert loaded["A"].hh_freq == 2
+    assert person.home_location is loaded["A"].location
+    assert person.plan.home_location is person.home_location
+    assert person.plan[0].location.area == "a"
+    assert person.plan[1].start_location is person.plan[0].location
+    assert person.plan[1].end_location is person.plan[2].location
+
+
+def test_snapshot_round_trip_typed_attribute_values(tmp_path):
+    population = Population()
+    for pid, attributes in enumerate(
+        [
+            {"a": 1, "b": "1", "c": True, "d": 1.5, "e": [1, "x"], "f": None},
+            {"a": "1", "b": 1, "c": False, "d": float("inf"), "e": [1, "x"], "f": {"g": 1}},
+        ]
+    ):
+        population.add(Person(str(pid), attributes=attributes))
+    population.save_snapshot(tmp_path / "population.snap")
+    loaded = Population.load_snapshot(tmp_path / "population.snap")
+    for hid, pid, person in population.people():
+        loaded_attributes = loaded[hid][pid].attributes
+        assert loaded_attributes == person.attributes
+        assert [type(v) for v in loaded_attributes.values()] == [
+            type(v) for v in person.attributes.values()
+        ]
+    loaded["0"]["0"].attributes["e"].append(2)
+    assert loaded["1"]["1"].attributes["e"] == [1, "x"]
+
+
+def test_snapshot_round_trip_vehicles(tmp_path):
+    population = read_matsim(
+        test_vehicles_dir / "ev_population.xml",
+        all_vehicles_path=test_vehicles_dir / "all_vehicles.xml",
+        electric_vehicles_path=test_vehicles_dir / "electric_vehicles.xml",
+    )
+    population.rebuild_vehicles_manager()
+    population.save_snapshot(tmp_path / "population.snap")
+    loaded = Population.load_snapshot(tmp_path / "population.snap")
+    assert loaded._vehicles_manager == population._vehicles_manager
+    for hid, pid, person in population.people():
+        assert loaded[hid][pid].vehicles == person.vehicles
+        for vehicle in loaded[hid][pid].vehicles.values():
+            assert vehicle == loaded._vehicles_manager[vehicle.vid]
+
+
+def test_snapshot_household_access(population, tmp_path):
+    population.save_snapshot(tmp_path / "population.snap")
+    snapshot = Snapshot(tmp_path / "population.snap")
+    assert len(snapshot) == 2
+    household = snapshot.household("B")
+    assert household == population["B"]
+    assert list(household.people) == list(population["B"].people)
+
+
+def test_snapshot_rejects_non_json_attributes(tmp_path):
+    population = Population()
+    population.add(Household("A", attributes={"bad": object()}))
+    with pytest.raises(TypeError):
+        population.save_snapshot(tmp_path / "population.snap")
+
+
+def test_snapshot_rejects_other_files(tmp_path):
+    path = tmp_path / "population.pkl"
+    Population().pickle(path)
+    with pytest.raises(PAMSnapshotError):
+        Population.load_snapshot(path)
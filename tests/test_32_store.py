@@ -0,0 +1,135 @@
+import pandas as pd
+import pytest
+from pam.activity import EMPTY_ATTRIBUTES, Activity, Leg
+from pam.core import Household, Person, Population
+from pam.location import Location
+from pam.operations.convert import matsim_to_store
+from pam.read import read_matsim
+from pam.store import ActivityView, LegView, PopulationStore
+from pam.utils import minutes_to_datetime as mtdt
+
+test_tripsv12_path = pytest.test_data_dir / "test_matsim_plansv12.xml"
+
+
+@pytest.fixture
+def population():
+    return read_matsim(test_tripsv12_path, household_key="hid")
+
+
+@pytest.fixture
+def store(population):
+    return population.to_store()
+
+
+def assert_travel_frames_equal(expected, result):
+    assert list(result.columns) == list(expected.columns)
+    for name in ["hzone", "oloc", "dloc"]:
+        expected[name] = expected[name].map(str)
+        result[name] = result[name].map(str)
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+def test_store_aggregates_match_population(population, store):
+    assert len(store) == len(population)
+    assert store.stats == population.stats
+    assert store.activity_classes == population.activity_classes
+    assert store.mode_classes == population.mode_classes
+    assert store.subpopulations == population.subpopulations
+
+
+def test_store_legs_df_matches_population(population, store):
+    assert_travel_frames_equal(population.legs_df(), store.legs_df())
+
+
+def test_store_trips_df_matches_population(population, store):
+    assert_travel_frames_equal(population.trips_df(), store.trips_df())
+
+
+def test_store_mode_counts(population, store):
+    modes = [leg.mode for _, _, person in population.people() for leg in person.legs]
+    counts = store.mode_counts()
+    assert counts.to_dict() == {mode: modes.count(mode) for mode in set(modes)}
+    assert counts.sum() == store.stats["num_legs"]
+
+
+def test_store_views_follow_population(population, store):
+    assert [hid for hid, _ in store] == list(population.households)
+    for hid, pid, person in population.people():
+        view = store[hid][pid]
+        assert view.pid == pid
+        assert view.hid == hid
+        assert view.attributes == person.attributes
+        assert view.freq == person.freq
+        assert view.num_activities == person.num_activities
+        assert view.num_legs == person.num_legs
+        assert len(view.plan) == len(person.plan)
+        for component, component_view in zip(person.plan, view.plan):
+            view_class = ActivityView if isinstance(component, Activity) else LegView
+            assert isinstance(component_view, view_class)
+            assert component_view.seq == component.seq
+            assert component_view.start_time == component.start_time
+            assert component_view.end_time == component.end_time
+            if isinstance(component, Leg):
+                assert component_view.mode == component.mode
+                assert component_view.purp == component.purp
+                assert component_view.distance == component.distance
+                assert component_view.start_location.link == component.start_location.link
+            else:
+                assert component_view.act == component.act
+                assert component_view.location == component.location
+
+
+def test_store_round_trip(population, store):
+    assert store.to_population() == population
+
+
+def test_store_from_persons_assigns_households(population):
+    persons = [person for _, _, person in population.people()]
+    store = PopulationStore.from_persons(persons, household_key="hid")
+    assert set(store.household_index) == set(population.households)
+    for hid, household in population:
+        assert sorted(pid for pid, _ in store[hid]) == sorted(household.people)
+
+
+def test_matsim_to_store_matches_population(population):
+    store = matsim_to_store(test_tripsv12_path, household_key="hid")
+    assert store.stats == population.stats
+    # persons are stored in file order rather than grouped by household
+    expected, result = (
+        df.sort_values(["pid", "seq"]).reset_index(drop=True)
+        for df in (population.trips_df(), store.trips_df())
+    )
+    assert_travel_frames_equal(expected, result)
+
+
+def test_store_keeps_shared_locations_and_empty_values():
+    household = Household("A", freq=2)
+    person = Person("1", home_area="a")
+    person.add(Activity(1, "home", "a", start_time=mtdt(0), end_time=mtdt(60)))
+    person.add(Leg(1, None, "a", "b", start_time=mtdt(60), end_time=mtdt(90)))
+    person.add(Activity(2, "work", "b", start_time=mtdt(90)))
+    person.plan[1].start_location = person.plan[0].location
+    household.add(person)
+    population = Population()
+    population.add(household)
+
+    store = population.to_store()
+    assert len(store.columns["locations_area"]) == 4
+    assert store.mode_classes == {None}
+    view = store["A"]["1"]
+    assert view.home.area == "a"
+    assert view.plan[2].end_time is None
+    assert view.plan[1].attributes is EMPTY_ATTRIBUTES
+
+    loaded = store.to_population()["A"]["1"]
+    assert store.to_population()["A"].hh_freq == 2
+    assert loaded.plan[1].start_location is loaded.plan[0].location
+    assert loaded.plan[1].mode is None
+    assert loaded.plan[2].end_time is None
+
+
+def test_store_rejects_non_point_locations():
+    person = Person("1")
+    person.add(Activity(1, "home", loc=Location(area="a")))
+    with pytest.raises(TypeError):
+        PopulationStore.from_persons([person])
@@ -0,0 +1,31 @@
+from pam.categories import CategoryRegistry
+
+
+def test_intern_returns_canonical_string():
+    categories = CategoryRegistry()
+    home = categories.intern("act", "home")
+    assert categories.intern("act", "".join(["ho", "me"])) is home
+    assert categories.values("act") == {"home"}
+    assert categories.values("mode") == set()
+
+
+def test_intern_passes_non_strings():
+    categories = CategoryRegistry()
+    assert categories.intern("zone", None) is None
+    assert categories.intern("zone", 1) == 1
+    assert len(categories) == 0
+
+
+def test_attributes_interns_keys_and_selected_values():
+    categories = CategoryRegistry()
+    first = categories.attributes(
+        {"routingMode": "car", "time": "".join(["0", "1"])}, ("routingMode",)
+    )
+    second = categories.attributes(
+        {"routingMode": "".join(["c", "ar"]), "time": "".join(["0", "1"])}
+    )
+    assert first == {"routingMode": "car", "time": "01"}
+    assert [k for k in first][0] is [k for k in second][0]
+    assert first["routingMode"] is second["routingMode"]
+    assert first["time"] is not second["time"]
+    assert categories.values("value") == {"car", "01"}
@@ -1,5 +1,6 @@
 import os
 
+import pandas as pd
 import pytest
 from click.testing import CliRunner
 from pam import read
@@ -174,3 +175,41 @@ def test_cli_link_wipe_selected_only(path_test_plan, tmp_path):
             assert "3-4" not in leg.route.network_route
         for act in person.acts:
             assert act.location.link != "3-4"
+
+
+def test_cli_to_parquet(path_test_plan, tmp_path):
+    runner = CliRunner()
+    result = runner.invoke(
+        cli, ["to-parquet", path_test_plan, str(tmp_path), "-h", "hid", "--batch_size", "2"]
+    )
+    if result.exit_code != 0:
+        print(result.output)
+    assert result.exit_code == 0
+    population = read.read_parquet(str(tmp_path))
+    assert population == read.read_matsim(path_test_plan, household_key="hid", weight=1)
+
+
+def test_cli_to_diary(path_test_plan, tmp_path):
+    runner = CliRunner()
+    result = runner.invoke(
+        cli, ["to-diary", path_test_plan, str(tmp_path), "-h", "hid", "--batch_size", "2"]
+    )
+    if result.exit_code != 0:
+        print(result.output)
+    assert result.exit_code == 0
+    population = read.read_matsim(path_test_plan, household_key="hid")
+    legs = pd.read_csv(tmp_path / "legs.csv")
+    assert len(legs) == sum(person.num_legs for _, _, person in population.people())
+    assert sorted(set(legs.hid)) == sorted(population.households)
+
+
+def test_cli_selected_plans(path_test_plan, tmp_path):
+    path_output = str(tmp_path / "plans.xml.gz")
+    runner = CliRunner()
+    result = runner.invoke(cli, ["selected-plans", path_test_plan, path_output])
+    if result.exit_code != 0:
+        print(result.output)
+    assert result.exit_code == 0
+    population = read.read_matsim(path_output, keep_non_selected=True)
+    assert population == read.read_matsim(path_test_plan)
+    assert not any(person.plans_non_selected for _, _, person in population.people())